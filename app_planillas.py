@@ -6,213 +6,235 @@ Extrae datos de PDFs de planillas usando OCR local (sin Google)
 import streamlit as st
 import pandas as pd
 import io
-import json
-import re
-from pathlib import Path
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+import os
+import time
+from concurrent.futures import (
+    BrokenExecutor, FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+)
+
+from utils.procesador_planillas import (
+    completar_con_bases,
+    construir_resultado,
+    extraer_datos_planilla,
+    es_cacheable,
+    VERSION_EXTRACTOR,
+)
+from utils.cache_extraccion import CacheExtraccion
+from utils.carga_bases import CargadorBases
+from utils.fuentes import fuentes_de_subidas, listar_fuentes
+from utils.metricas import Medicion, activar, ejecutar_medido, emitir, resumen_documento
+from utils.modelo_planillas import TablaPlanillas
 
 # Importar validador de base local
 try:
-    from utils.validador_base_local import cargar_bases_locales, buscar_en_base
+    from utils.validador_base_local import (
+        cargar_bases_locales, buscar_en_base, buscar_afiliado_por_nombre, historial_afiliado
+    )
 except ImportError:
     cargar_bases_locales = None
     buscar_en_base = None
+    buscar_afiliado_por_nombre = None
+    historial_afiliado = None
 
 
-# Caché para las bases locales
+# Bases locales compartidas por todas las sesiones
 @st.cache_resource
+def obtener_cargador_bases():
+    """
+    Carga las bases en segundo plano (una vez por servidor) y las vuelve a
+    cargar si cambian los archivos DETALLE AFILIADOS *.xlsx
+    """
+    return CargadorBases(cargar=cargar_bases_locales).iniciar()
+
+
 def obtener_bases_locales():
-    """Carga las bases locales una sola vez"""
+    """Bases vigentes (solo espera si la carga inicial no terminó)"""
     if cargar_bases_locales:
-        return cargar_bases_locales()
+        return obtener_cargador_bases().obtener()
     return {}
 
 
-def generar_excel_local(df):
-    """Genera archivo Excel localmente (función respaldo)"""
+@st.cache_resource
+def obtener_cache_extracciones():
+    """Caché persistente de extracciones (evita re-parsear PDFs repetidos)"""
     try:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Datos"
-        
-        # Título principal
-        ws.merge_cells('A1:I1')
-        titulo = ws['A1']
-        titulo.value = "PLANTILLA PAGOS REDIRECCIONAMIENTO"
-        titulo.font = Font(bold=True, size=14, color="FFFFFF")
-        titulo.fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-        titulo.alignment = Alignment(horizontal="center", vertical="center")
-        ws.row_dimensions[1].height = 25
-        
-        # Reordenar columnas: RAZON_SOCIAL primero
-        columnas_orden = ['Archivo', 'RAZON_SOCIAL']
-        columnas_restantes = [col for col in df.columns if col not in columnas_orden]
-        df_ordenado = df[columnas_orden + columnas_restantes] if 'RAZON_SOCIAL' in df.columns else df
-        
-        # Encabezados (fila 2)
-        for col_idx, column_title in enumerate(df_ordenado.columns, 1):
-            cell = ws.cell(row=2, column=col_idx)
-            cell.value = column_title
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Datos (a partir de fila 3)
-        for r_idx, row in enumerate(df_ordenado.values, 3):
-            for c_idx, value in enumerate(row, 1):
-                cell = ws.cell(row=r_idx, column=c_idx)
-                cell.value = value
-                cell.alignment = Alignment(horizontal="left", vertical="center")
-        
-        # Ajustar ancho de columnas (evitar celdas mergeadas)
-        for col_idx in range(1, len(df_ordenado.columns) + 1):
-            max_length = 0
-            column_letter = chr(64 + col_idx) if col_idx < 27 else 'A' + chr(64 + col_idx - 26)
-            
-            for row_idx in range(2, len(df_ordenado) + 3):
-                try:
-                    cell = ws.cell(row=row_idx, column=col_idx)
-                    if cell.value and not isinstance(cell, type(None)):
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        return buffer.getvalue()
+        return CacheExtraccion()
     except Exception as e:
+        print(f"⚠️ Caché de extracciones no disponible: {e}")
         return None
 
 
-def extraer_texto_pdf(pdf_content):
-    """Extrae texto del PDF usando PyPDF2 o pdfplumber"""
-    try:
-        # Intentar 1: PyPDF2 (extrae texto directo si está incrustado)
-        try:
-            from PyPDF2 import PdfReader
-            
-            pdf_file = io.BytesIO(pdf_content)
-            reader = PdfReader(pdf_file)
-            
-            texto_completo = ""
-            for pagina in reader.pages[:10]:  # Primeras 10 páginas
-                texto = pagina.extract_text()
-                if texto:
-                    texto_completo += texto + "\n"
-            
-            if texto_completo and len(texto_completo.strip()) > 50:
-                return texto_completo
-        except Exception as e_pypdf:
-            pass
-        
-        # Intentar 2: pdfplumber (alternativa robusta)
-        try:
-            import pdfplumber
-            
-            pdf_file = io.BytesIO(pdf_content)
-            
-            with pdfplumber.open(pdf_file) as pdf:
-                texto_completo = ""
-                for pagina in pdf.pages[:10]:  # Primeras 10 páginas
-                    texto = pagina.extract_text()
-                    if texto:
-                        texto_completo += texto + "\n"
-                
-                if texto_completo and len(texto_completo.strip()) > 50:
-                    return texto_completo
-        except Exception as e_pdfplumber:
-            pass
-        
-        return ""
-    
-    except Exception as e:
-        st.error(f"Error extrayendo texto: {e}")
-        return ""
+@st.cache_resource
+def obtener_pool_excel():
+    """Hilo compartido que arma los Excel en segundo plano (fuera de los reruns)"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='excel')
 
 
-def limpiar_periodo(periodo_str):
-    """Elimina guiones del período: '2012-12' -> '201212'"""
-    if periodo_str == "No detectado" or not periodo_str:
-        return "No detectado"
-    return periodo_str.replace('-', '').replace(' ', '')
+def excel_en_segundo_plano(df, huella, nombre_archivo, generar):
+    """
+    Futuro con el Excel de `df`, reutilizado mientras no cambien el resultado ni el nombre
+    El Excel se empieza a armar apenas termina el procesamiento; solo se guarda el último
+    """
+    clave = (huella, nombre_archivo)
+    excel_sesion = st.session_state.setdefault('excel_por_huella', {})
+    futuro = excel_sesion.get(clave)
+    if futuro is None:
+        for anterior in excel_sesion.values():
+            anterior.cancel()
+        excel_sesion.clear()
+        futuro = obtener_pool_excel().submit(generar, df)
+        excel_sesion[clave] = futuro
+    return futuro
 
 
-def extraer_campo(texto, patron):
-    """Extrae un campo del texto usando regex"""
-    try:
-        match = re.search(patron, texto, re.IGNORECASE | re.MULTILINE | re.DOTALL)
-        if match:
-            valor = match.group(1).strip()
-            return valor if valor else "No detectado"
-        return "No detectado"
-    except:
-        return "No detectado"
+def _revisar_excel(futuro):
+    """Aviso mientras se arma el Excel; al terminar vuelve a ejecutar la app para mostrar el botón"""
+    if futuro.done():
+        st.rerun()
+    st.info("⏳ Armando el Excel...")
+
+
+# Revisión automática cada segundo en versiones de Streamlit con fragmentos
+_revisar_excel_periodicamente = st.fragment(run_every=1)(_revisar_excel) if hasattr(st, 'fragment') else None
+
+
+def esperar_excel(futuro):
+    """Placeholder del botón de Excel mientras se arma en segundo plano"""
+    if _revisar_excel_periodicamente is not None:
+        _revisar_excel_periodicamente(futuro)
+    else:
+        st.info("⏳ Armando el Excel...")
+        st.button("🔄 Actualizar", key="actualizar_excel")
 
 
-def extraer_afiliados(texto):
+def exportacion_de_sesion(df, huella, formato, generar):
     """
-    Extrae TODOS los afiliados de la tabla en el PDF
-    Retorna lista de diccionarios con datos de cada afiliado
+    Bytes de `df` en `formato` (CSV, Parquet), armados una sola vez por resultado
+    Los reruns reutilizan los de la misma huella; se guardan solo los del último resultado
     """
-    try:
-        # Patrón para encontrar filas de afiliados en la tabla
-        # Estructura: Nro | CUSPP | Nombre | Remuneración | ...
-        patron = r'^\s*(\d+)\s+([0-9]{6}[A-Z]{5}\d)\s+([A-Z\s,\.]+?)(?=\s+[SN]\s)'
-        
-        afiliados = []
-        lineas = texto.split('\n')
-        
-        for i, linea in enumerate(lineas):
-            match = re.match(patron, linea.strip())
-            if match:
-                afiliados.append({
-                    'nro': match.group(1).strip(),
-                    'cussp': match.group(2).strip(),
-                    'nombre': match.group(3).strip()
-                })
-        
-        return afiliados if afiliados else []
-    except:
-        return []
+    exportaciones = st.session_state.setdefault('exportaciones_por_huella', {})
+    if any(clave[0] != huella for clave in exportaciones):
+        exportaciones.clear()
+    clave = (huella, formato)
+    if clave not in exportaciones:
+        try:
+            exportaciones[clave] = generar(df)
+        except Exception as e:
+            # El error también se recuerda: no se reintenta en cada rerun
+            exportaciones[clave] = e
+    contenido = exportaciones[clave]
+    if isinstance(contenido, Exception):
+        raise contenido
+    return contenido
+
+
+def resultados_de_sesion():
+    """
+    Resultados por archivo ya procesados en esta sesión
+    Streamlit vuelve a ejecutar el script en cada interacción; con esto solo
+    se procesan los archivos nuevos (o los que cambiaron)
+    """
+    if 'resultados_por_archivo' not in st.session_state:
+        st.session_state['resultados_por_archivo'] = {}
+    return st.session_state['resultados_por_archivo']
 
 
-def calcular_monto_total_planilla(texto):
+def hashes_de_sesion():
     """
-    Calcula el MONTO TOTAL de la planilla (suma de todos los afiliados)
-    Retorna número float (el formato de moneda se aplica en Excel)
+    Hash (clave de caché) de los PDFs ya leídos en esta sesión, por identidad de su fuente
+    Con esto un rerun no vuelve a leer ni a hashear los archivos que siguen cargados
+    (ver FuentePdf.identidad)
     """
+    return st.session_state.setdefault('hash_por_fuente', {})
+
+
+def clave_resultado(nombre, clave_pdf, perfilar=False):
+    """Clave de un resultado: archivo, hash del PDF + versión del extractor y versión de las bases"""
+    version_bases = obtener_cargador_bases().recargas if cargar_bases_locales else 0
+    return (nombre, clave_pdf, version_bases, perfilar)
+
+
+def numero_workers():
+    """Número de procesos de extracción (variable de entorno LECTOR_WORKERS o todos los núcleos)"""
+    return int(os.environ.get('LECTOR_WORKERS', 0)) or os.cpu_count() or 1
+
+
+@st.cache_resource
+def obtener_pool_procesos():
+    """
+    Pool de procesos compartido entre reruns para extraer PDFs en paralelo
+    Número de procesos configurable con la variable de entorno LECTOR_WORKERS
+    """
+    workers = numero_workers()
+    try:
+        return ProcessPoolExecutor(max_workers=workers)
+    except Exception as e:
+        print(f"⚠️ Pool de procesos no disponible, usando hilos: {e}")
+        return ThreadPoolExecutor(max_workers=workers)
+
+
+def generar_excel_local(df):
+    """Genera archivo Excel localmente (función respaldo, en modo write-only)"""
     try:
-        monto_fondo = extraer_campo(texto, r'Total\s+Fondo\s+Pensiones[\s\n]+S/\.[\s\n]+([\d.]+)')
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Datos")
         
-        matches = re.findall(r'Retenciones(?:\s+y)?\s+Retribuciones[\s\n]+S/\.[\s\n]+([\d.]+)', texto, re.IGNORECASE | re.MULTILINE | re.DOTALL)
-        monto_retenciones = matches[-1] if matches else "No detectado"
+        # Reordenar columnas: RAZON_SOCIAL primero
+        columnas_orden = ['Archivo', 'RAZON_SOCIAL']
+        columnas_restantes = [col for col in df.columns if col not in columnas_orden]
+        df_ordenado = df[columnas_orden + columnas_restantes] if 'RAZON_SOCIAL' in df.columns else df
         
-        def limpiar_monto(monto_str):
-            if monto_str == "No detectado" or not monto_str:
-                return 0.0
-            try:
-                monto_limpio = monto_str.replace(' ', '').replace('\n', '').strip()
-                return float(monto_limpio)
-            except:
-                return 0.0
+        # Ajustar ancho de columnas (longitudes vectorizadas, antes de escribir filas)
+        for col_idx, columna in enumerate(df_ordenado.columns, 1):
+            serie = df_ordenado[columna]
+            max_length = len(str(columna))
+            if len(serie):
+                longitudes = serie.astype(str).str.len().where(serie.astype(bool), 0)
+                max_length = max(max_length, int(longitudes.max()))
+            ws.column_dimensions[get_column_letter(col_idx)].width = min(max_length + 2, 50)
+        ws.merged_cells.add('A1:I1')
+        ws.row_dimensions[1].height = 25
         
-        valor_fondo = limpiar_monto(monto_fondo)
-        valor_retenciones = limpiar_monto(monto_retenciones)
+        # Título principal
+        titulo = WriteOnlyCell(ws, value="PLANTILLA PAGOS REDIRECCIONAMIENTO")
+        titulo.font = Font(bold=True, size=14, color="FFFFFF")
+        titulo.fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
+        titulo.alignment = Alignment(horizontal="center", vertical="center")
+        ws.append([titulo])
         
-        total = valor_fondo + valor_retenciones
-        if total > 0:
-            return total  # Retorna número float en lugar de string
+        # Encabezados (fila 2), con un solo juego de estilos compartido
+        fuente = Font(bold=True, color="FFFFFF")
+        relleno = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        centrado = Alignment(horizontal="center", vertical="center")
+        encabezados = []
+        for column_title in df_ordenado.columns:
+            cell = WriteOnlyCell(ws, value=column_title)
+            cell.font = fuente
+            cell.fill = relleno
+            cell.alignment = centrado
+            encabezados.append(cell)
+        ws.append(encabezados)
         
-        return 0.0  # Retorna 0.0 en lugar de string
-    except:
-        return 0.0
-
+        # Datos (a partir de fila 3)
+        izquierda = Alignment(horizontal="left", vertical="center")
+        for row in df_ordenado.itertuples(index=False, name=None):
+            celdas = []
+            for value in row:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.alignment = izquierda
+                celdas.append(cell)
+            ws.append(celdas)
+        
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.getvalue()
+    except Exception as e:
+        return None
 
 
 # Configurar página
@@ -239,10 +261,32 @@ campos_a_mostrar = st.sidebar.multiselect(
     "Selecciona los campos que deseas ver:",
     [
         "RUC", "RAZON_SOCIAL", "PERIODO", "CUSSP", "AFILIADO",
-        "FECHA_PAGO", "N_PLANILLA", "MONTO", "OBSERVACION"
+        "FECHA_PAGO", "N_PLANILLA", "MONTO", "MONTO_AFILIADO", "OBSERVACION"
     ],
     default=["RUC", "RAZON_SOCIAL", "PERIODO", "CUSSP", "AFILIADO",
-             "FECHA_PAGO", "N_PLANILLA", "MONTO", "OBSERVACION"]
+             "FECHA_PAGO", "N_PLANILLA", "MONTO", "MONTO_AFILIADO", "OBSERVACION"]
+)
+
+# Bases locales (se empiezan a cargar apenas se abre la app)
+if cargar_bases_locales:
+    st.sidebar.markdown("## 🗄️ Bases locales")
+    estado_bases = obtener_cargador_bases().estado()
+    if estado_bases['lista'] and estado_bases['registros']:
+        for nombre_base, registros in estado_bases['registros'].items():
+            st.sidebar.caption(f"✅ {nombre_base}: {registros:,} registros")
+        if estado_bases['cargando']:
+            st.sidebar.caption("🔄 Recargando (se siguen usando las bases actuales)...")
+    elif estado_bases['lista']:
+        st.sidebar.caption("⚠️ No se encontraron bases locales")
+    else:
+        st.sidebar.caption("⏳ Cargando bases en segundo plano...")
+
+# Diagnóstico de rendimiento
+st.sidebar.markdown("## ⏱️ Diagnóstico")
+perfilar_documentos = st.sidebar.checkbox(
+    "Perfilar cada documento (cProfile)",
+    value=False,
+    help="Agrega al debug las funciones más costosas de la extracción de cada PDF (más lento)"
 )
 
 # Área principal
@@ -252,164 +296,250 @@ st.markdown("---")
 st.markdown("### 📁 Carga tus Planillas (PDF)")
 
 archivos_cargados = st.file_uploader(
-    "Selecciona PDF(s) de planillas",
-    type=["pdf"],
+    "Selecciona PDF(s) o ZIP(s) de planillas",
+    type=["pdf", "zip"],
     accept_multiple_files=True,
-    help="Puedes cargar múltiples archivos PDF"
+    help="Puedes cargar múltiples archivos PDF o ZIPs con PDFs (se descomprimen de a uno)"
 )
 
-if archivos_cargados:
+# Carpetas o ZIPs que ya están en el servidor (solo dentro de LECTOR_RAIZ_SERVIDOR)
+raiz_servidor = os.environ.get('LECTOR_RAIZ_SERVIDOR')
+ruta_servidor = ""
+if raiz_servidor:
+    ruta_servidor = st.text_input(
+        "O ingresa una carpeta o ZIP del servidor:",
+        "",
+        help=f"Ruta dentro de {raiz_servidor}"
+    ).strip()
+
+fuentes = []
+for archivo in archivos_cargados or []:
+    try:
+        fuentes.extend(fuentes_de_subidas([archivo]))
+    except Exception as e:
+        st.error(f"❌ No se pudo abrir {archivo.name}: {str(e)}")
+
+if ruta_servidor:
+    raiz_absoluta = os.path.realpath(raiz_servidor)
+    ruta_absoluta = os.path.realpath(os.path.join(raiz_absoluta, ruta_servidor))
+    if os.path.commonpath([raiz_absoluta, ruta_absoluta]) != raiz_absoluta:
+        st.error(f"❌ La ruta debe estar dentro de {raiz_servidor}")
+    else:
+        try:
+            fuentes.extend(listar_fuentes(ruta_absoluta, recursivo=True))
+        except Exception as e:
+            st.error(f"❌ No se pudo leer {ruta_servidor}: {str(e)}")
+
+if fuentes:
     st.markdown("---")
     st.markdown("### 🔄 Procesando...")
     
-    datos_extraidos = []
+    total_archivos = len(fuentes)
     progress_bar = st.progress(0)
     status_text = st.empty()
+    tabla_parcial = st.empty()
+    
+    # Resultados por posición de carga (el orden final no depende de cuál termina primero)
+    resultados = [None] * total_archivos
+    completados = 0
+    ultimo_refresco = 0.0
+    
+    # Tiempos por etapa de cada archivo (ver utils.metricas)
+    mediciones = {}
+    
+    # Resultados de reruns anteriores (los archivos sin cambios no se vuelven a procesar)
+    resultados_sesion = resultados_de_sesion()
+    claves_resultado = {}
+    hashes_sesion = hashes_de_sesion()
+    
+    def registrar_resultado(idx, resultado, datos=None, memorizar=True):
+        """Guarda el resultado de un archivo y actualiza progreso y tabla parcial"""
+        global completados, ultimo_refresco
+        if idx in mediciones:
+            resultado['metricas'] = resumen_documento(mediciones[idx], datos, resultado.get('desde_cache', False))
+            emitir(resultado['metricas'])
+        if memorizar and idx in claves_resultado:
+            resultados_sesion[claves_resultado[idx]] = resultado
+        resultados[idx] = resultado
+        completados += 1
+        progress_bar.progress(completados / total_archivos)
+        status_text.text(f"Procesado {completados}/{total_archivos}: {resultado['archivo']}")
+        
+        # Refrescar la tabla parcial como máximo dos veces por segundo
+        ahora = time.monotonic()
+        if completados == total_archivos or ahora - ultimo_refresco >= 0.5:
+            ultimo_refresco = ahora
+            parcial = TablaPlanillas.concatenar(r['tabla'] for r in resultados if r)
+            if len(parcial):
+                tabla_parcial.dataframe(parcial.a_dataframe())
+    
+    def resultado_error(nombre, e):
+        return {'archivo': nombre, 'tabla': None, 'debug': None, 'desde_cache': False,
+                'mensajes': [('error', f"❌ Error procesando {nombre}: {str(e)}")]}
     
-    for idx, archivo in enumerate(archivos_cargados):
+    cache_extracciones = obtener_cache_extracciones()
+    pool = obtener_pool_procesos()
+    obtener_bases = obtener_bases_locales if buscar_en_base else None
+    futuros = {}
+    claves_cache = {}
+    # PDFs leídos pero aún sin procesar; acotado para que la memoria no crezca con el lote
+    max_pendientes = 2 * numero_workers()
+    
+    def recoger_resultado(futuro):
+        """Registra el resultado de un PDF procesado en el pool"""
+        idx = futuros.pop(futuro)
+        nombre = fuentes[idx].nombre
+        medicion = mediciones[idx]
         try:
-            # Actualizar progreso
-            progreso = (idx + 1) / len(archivos_cargados)
-            progress_bar.progress(progreso)
-            status_text.text(f"Procesando {idx+1}/{len(archivos_cargados)}: {archivo.name}")
-            
-            # Leer contenido del PDF
-            pdf_content = archivo.read()
+            datos, metricas_worker = futuro.result()
+            medicion.incorporar(metricas_worker)
+            clave_cache = claves_cache.pop(idx, None)
+            with activar(medicion):
+                if cache_extracciones is not None and es_cacheable(datos):
+                    with medicion.tramo('guardar_cache'):
+                        cache_extracciones.guardar(clave_cache, datos)
+                # La consulta a bases locales (fallback) se hace aquí, donde están cargadas
+                with medicion.tramo('construir_resultado'):
+                    resultado = construir_resultado(nombre, datos, obtener_bases, buscar_en_base,
+                                                    diferir_bases=True)
+            registrar_resultado(idx, resultado, datos)
+        except Exception as e:
+            if isinstance(e, BrokenExecutor):
+                # Recrear el pool en el próximo rerun
+                obtener_pool_procesos.clear()
+            registrar_resultado(idx, resultado_error(nombre, e), memorizar=False)
+    
+    # Enviar al pool solo los PDFs que no se procesaron en esta sesión ni están en la caché de extracciones
+    for idx, fuente in enumerate(fuentes):
+        medicion = Medicion(fuente.nombre)
+        try:
+            pdf_content = None
+            with activar(medicion):
+                # Una fuente ya leída en un rerun anterior no se vuelve a leer ni a hashear
+                clave_pdf = hashes_sesion.get(fuente.identidad) if fuente.identidad else None
+                if clave_pdf is None:
+                    # Leer contenido del PDF (los miembros de un ZIP se descomprimen de a uno)
+                    with medicion.tramo('leer'):
+                        pdf_content = fuente.leer()
+                    
+                    with medicion.tramo('hash'):
+                        clave_pdf = CacheExtraccion.clave(pdf_content, VERSION_EXTRACTOR)
+                    if fuente.identidad:
+                        hashes_sesion[fuente.identidad] = clave_pdf
+                claves_resultado[idx] = clave_resultado(fuente.nombre, clave_pdf, perfilar_documentos)
+                anterior = resultados_sesion.get(claves_resultado[idx])
             
-            # Intentar extraer texto
-            texto = extraer_texto_pdf(pdf_content)
+            if anterior is not None:
+                # Mismo archivo, extractor y bases que en un rerun anterior: solo se vuelve a mostrar
+                registrar_resultado(idx, anterior)
+                continue
             
-            if texto and len(texto.strip()) > 50:
-                st.success(f"✅ Texto extraído de {archivo.name}")
-                
-                # Extraer datos generales de la planilla
-                ruc_val = extraer_campo(texto, r'RUC[:\s]+(\d{11})')
-                periodo_val = limpiar_periodo(extraer_campo(texto, r'Periodo\s+(?:de\s+Devengue)?[:\s]+(\d{4}-\d{2})'))
-                
-                monto_total = calcular_monto_total_planilla(texto)
+            mediciones[idx] = medicion
+            with activar(medicion):
+                datos = None
+                if cache_extracciones is not None:
+                    with medicion.tramo('cache'):
+                        claves_cache[idx] = clave_pdf
+                        datos = cache_extracciones.obtener(clave_pdf)
                 
-                # DEBUG: Mostrar valores extraídos
-                with st.expander(f"🔍 Debug - {archivo.name}", expanded=False):
-                    st.write(f"**RUC extraído:** {ruc_val}")
-                    st.write(f"**PERÍODO (limpio):** {periodo_val}")
-                    st.write(f"**MONTO:** {monto_total}")
-                    
-                    # Extraer AFILIADOS para debug
-                    afiliados_debug = extraer_afiliados(texto)
-                    st.write(f"**Afiliados encontrados en PDF:** {len(afiliados_debug)}")
-                    if afiliados_debug:
-                        for aff in afiliados_debug:
+                if datos is not None:
+                    with medicion.tramo('construir_resultado'):
+                        resultado = construir_resultado(fuente.nombre, datos, obtener_bases, buscar_en_base,
+                                                        diferir_bases=True)
+            
+            if datos is not None:
+                resultado['desde_cache'] = True
+                registrar_resultado(idx, resultado, datos)
+            else:
+                if pdf_content is None:
+                    with activar(medicion), medicion.tramo('leer'):
+                        pdf_content = fuente.leer()
+                # Los tramos de la extracción vuelven del worker junto con los datos
+                futuros[pool.submit(ejecutar_medido, extraer_datos_planilla, pdf_content,
+                                    perfilar=perfilar_documentos)] = idx
+        except Exception as e:
+            mediciones[idx] = medicion
+            registrar_resultado(idx, resultado_error(fuente.nombre, e), memorizar=False)
+        
+        while len(futuros) >= max_pendientes:
+            listos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                recoger_resultado(futuro)
+    
+    # Recoger los resultados restantes a medida que terminan
+    for futuro in as_completed(list(futuros)):
+        recoger_resultado(futuro)
+    
+    # Caso 2b (PDFs sin afiliados) de todos los archivos en una sola búsqueda en las bases
+    if obtener_bases:
+        completar_con_bases(resultados, obtener_bases)
+    
+    tabla_parcial.empty()
+    
+    # Olvidar los archivos que ya no están cargados
+    vigentes = set(claves_resultado.values())
+    for clave in [clave for clave in resultados_sesion if clave not in vigentes]:
+        del resultados_sesion[clave]
+    identidades = {fuente.identidad for fuente in fuentes}
+    for identidad in [identidad for identidad in hashes_sesion if identidad not in identidades]:
+        del hashes_sesion[identidad]
+    
+    # Mensajes y debug en el orden de carga
+    for resultado in resultados:
+        # DEBUG: Mostrar valores extraídos y tiempos por etapa
+        debug = resultado['debug']
+        metricas = resultado.get('metricas')
+        if debug or metricas:
+            with st.expander(f"🔍 Debug - {resultado['archivo']}", expanded=False):
+                if debug:
+                    st.write(f"**RUC extraído:** {debug['ruc']}")
+                    st.write(f"**PERÍODO (limpio):** {debug['periodo']}")
+                    st.write(f"**MONTO:** {debug['monto']}")
+                    st.write(f"**Afiliados encontrados en PDF:** {len(debug['afiliados'])}")
+                    if debug['afiliados']:
+                        for aff in debug['afiliados']:
                             st.write(f"  - {aff['nombre']} ({aff['cussp']})")
                     else:
                         st.write("❌ No se encontraron afiliados en tabla")
                 
-                datos_base = {
-                    "Archivo": archivo.name,
-                    "RUC": ruc_val,
-                    "RAZON_SOCIAL": extraer_campo(texto, r'(?:Nombre\s+o\s+)?Razón\s+Social[:\s]+([^\n]+?)(?:\s*RUC|$)'),
-                    "PERIODO": periodo_val,
-                    "FECHA_PAGO": extraer_campo(texto, r'Fecha\s+de\s+Pago[:\s]*\n?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{4})'),
-                    "N_PLANILLA": extraer_campo(texto, r'(?:Número\s+de\s+)?Planilla[:\s]+(\d+)'),
-                    "MONTO": monto_total,  # MONTO TOTAL COMPARTIDO ENTRE AFILIADOS
-                    "OBSERVACION": ""
-                }
-                
-                # Cargar bases locales para validación (solo como fallback)
-                bases_locales = obtener_bases_locales() if buscar_en_base else None
-                
-                # Extraer TODOS los afiliados del PDF
-                afiliados = extraer_afiliados(texto)
-                
-                if afiliados:
-                    # Caso 1: Se encontraron afiliados en el PDF
-                    # Crear una fila por cada afiliado con MONTO compartido (sin validación)
-                    st.info(f"✅ Se encontraron {len(afiliados)} afiliado(s) en {archivo.name}")
-                    
-                    for idx, afiliado in enumerate(afiliados):
-                        fila = datos_base.copy()
-                        fila["CUSSP"] = afiliado['cussp']
-                        fila["AFILIADO"] = afiliado['nombre']
-                        # OBSERVACION vacío porque se encontraron datos en el PDF
-                        fila["OBSERVACION"] = ""
-                        # MONTO solo en la primera fila, vacío (0.0) en las demás
-                        if idx > 0:
-                            fila["MONTO"] = 0.0
-                        datos_extraidos.append(fila)
-                else:
-                    # Caso 2: No se encontró tabla de afiliados
-                    # Intentar extraer CUSSP y AFILIADO del PDF
-                    cussp_value = extraer_campo(texto, r'^\s*1\s+([0-9]{6}[A-Z]{5}\d)') or \
-                                  extraer_campo(texto, r'CUSPP[\s\S]*?(\d{6}[A-Z]{5}\d)')
-                    afiliado_name = extraer_campo(texto, r'[0-9]{6}[A-Z]{5}\d\s+([A-Z\s,\.]+?)(?=\s+S\s|\s+N\s)')
-                    
-                    if cussp_value != "No detectado" and afiliado_name != "No detectado":
-                        # Caso 2a: CUSSP y AFILIADO encontrados en el PDF
-                        datos_base["CUSSP"] = cussp_value
-                        datos_base["AFILIADO"] = afiliado_name
-                        datos_base["OBSERVACION"] = ""
-                        datos_extraidos.append(datos_base)
-                        st.info(f"✅ Se extrajo 1 afiliado de {archivo.name}")
-                    else:
-                        # Caso 2b: NO se encontraron CUSSP y AFILIADO en el PDF
-                        # FALLBACK: Buscar en la base local
-                        if bases_locales:
-                            try:
-                                # Buscar todos los registros que coincidan con DOCUMENTO y PERIODO
-                                validacion = buscar_en_base(
-                                    ruc=ruc_val,
-                                    documento=ruc_val,
-                                    periodo=periodo_val,
-                                    cussp="",
-                                    afiliado_pdf="",
-                                    bases=bases_locales
-                                )
-                                
-                                if validacion['encontrado'] and validacion.get('afiliados'):
-                                    # Se encontraron múltiples afiliados en la base local
-                                    # Crear una fila por cada afiliado con MONTO compartido
-                                    for idx, aff in enumerate(validacion['afiliados']):
-                                        fila = datos_base.copy()
-                                        fila["CUSSP"] = aff['cussp']
-                                        fila["AFILIADO"] = aff['afiliado']
-                                        fila["OBSERVACION"] = aff['observacion']
-                                        # MONTO solo en la primera fila
-                                        if idx > 0:
-                                            fila["MONTO"] = 0.0
-                                        datos_extraidos.append(fila)
-                                    st.info(f"✅ Se obtuvieron {len(validacion['afiliados'])} afiliado(s) de la base local para {archivo.name}")
-                                else:
-                                    # No se encontró en bases
-                                    datos_base["CUSSP"] = "No detectado"
-                                    datos_base["AFILIADO"] = "No detectado"
-                                    datos_base["OBSERVACION"] = "No se encontró en PDF ni en bases locales"
-                                    datos_extraidos.append(datos_base)
-                                    st.warning(f"⚠️ No se pudieron extraer datos de {archivo.name}")
-                            except Exception as e:
-                                datos_base["CUSSP"] = "No detectado"
-                                datos_base["AFILIADO"] = "No detectado"
-                                datos_base["OBSERVACION"] = f"Error consultando bases: {str(e)}"
-                                datos_extraidos.append(datos_base)
-                                st.warning(f"⚠️ Error al buscar en bases para {archivo.name}")
-                        else:
-                            # Sin bases locales disponibles
-                            datos_base["CUSSP"] = "No detectado"
-                            datos_base["AFILIADO"] = "No detectado"
-                            datos_base["OBSERVACION"] = "No se encontró en PDF y bases locales no disponibles"
-                            datos_extraidos.append(datos_base)
-                            st.warning(f"⚠️ No se encontraron datos en {archivo.name}")
-            else:
-                st.warning(f"⚠️ No se extrajo texto de {archivo.name}")
+                if metricas:
+                    origen = "caché" if metricas['desde_cache'] else (metricas['backend'] or "sin texto")
+                    st.write(f"**⏱️ Tiempo total:** {metricas['total_segundos'] * 1000:.1f} ms "
+                             f"(backend: {origen})")
+                    st.dataframe(pd.DataFrame(
+                        [{'Etapa': t['etapa'], 'ms': round(t['segundos'] * 1000, 2), 'Veces': t['veces']}
+                         for t in metricas['tramos']]
+                    ))
+                    if metricas['perfil']:
+                        st.write("**Funciones más costosas (cProfile):**")
+                        st.dataframe(pd.DataFrame(metricas['perfil']))
         
-        except Exception as e:
-            st.error(f"❌ Error procesando {archivo.name}: {str(e)}")
+        for tipo, mensaje in resultado['mensajes']:
+            getattr(st, tipo)(mensaje)
+    
+    # Cabeceras y afiliados normalizados; se combinan solo al construir el DataFrame
+    tabla_resultado = TablaPlanillas.concatenar(r['tabla'] for r in resultados)
     
     # Mostrar resultados
-    if datos_extraidos:
+    if len(tabla_resultado):
         st.markdown("---")
-        st.success(f"✅ Se procesaron {len(datos_extraidos)} fila(s) en total")
+        st.success(f"✅ Se procesaron {len(tabla_resultado)} fila(s) en total")
         
         # DataFrame
-        df = pd.DataFrame(datos_extraidos)
+        df = tabla_resultado.a_dataframe()
+        
+        # Huella del resultado: las exportaciones se arman una vez por resultado
+        from utils.exportadores import huella_dataframe
+        huella = huella_dataframe(df)
+        
+        # El Excel se arma en segundo plano mientras se muestra la tabla
+        try:
+            from utils.excel_generator import generar_excel
+        except ImportError:
+            generar_excel = generar_excel_local
+        
+        nombre_exportacion = f"PLANTILLA_PAGOS_REDIRECCIONAMIENTO_{datos_cliente['nombre'].replace(' ', '_') if datos_cliente['nombre'] else 'exportacion'}"
+        futuro_excel = excel_en_segundo_plano(df, huella, f"{nombre_exportacion}.xlsx", generar_excel)
         
         # Mostrar tabla
         st.markdown("### 📋 Datos Extraídos")
@@ -419,21 +549,46 @@ if archivos_cargados:
         else:
             st.dataframe(df)
         
-        # Descargar Excel
-        try:
-            from utils.excel_generator import generar_excel
-        except ImportError:
-            generar_excel = generar_excel_local
+        col1, col2, col3 = st.columns(3)
         
-        col1, col2 = st.columns(2)
+        # Formatos planos (sin estilos) para cargar en otros sistemas
+        with col1:
+            try:
+                from utils.exportadores import generar_csv
+                st.download_button(
+                    label="📄 Descargar CSV",
+                    data=exportacion_de_sesion(df, huella, 'csv', generar_csv),
+                    file_name=f"{nombre_exportacion}.csv",
+                    mime="text/csv"
+                )
+            except Exception as e:
+                st.warning(f"⚠️ CSV no disponible: {e}")
         
         with col2:
-            excel_file = generar_excel(df)
-            if excel_file:
+            try:
+                from utils.exportadores import generar_parquet
+                st.download_button(
+                    label="🗃️ Descargar Parquet",
+                    data=exportacion_de_sesion(df, huella, 'parquet', generar_parquet),
+                    file_name=f"{nombre_exportacion}.parquet",
+                    mime="application/vnd.apache.parquet"
+                )
+            except Exception as e:
+                st.warning(f"⚠️ Parquet no disponible: {e}")
+        
+        with col3:
+            # El botón aparece recién cuando el Excel está armado (nunca se espera aquí)
+            if not futuro_excel.done():
+                esperar_excel(futuro_excel)
+            elif futuro_excel.exception() is not None:
+                st.warning(f"⚠️ Excel no disponible: {futuro_excel.exception()}")
+            elif not futuro_excel.result():
+                st.warning("⚠️ Excel no disponible")
+            else:
                 st.download_button(
                     label="📥 Descargar Excel",
-                    data=excel_file,
-                    file_name=f"PLANTILLA_PAGOS_REDIRECCIONAMIENTO_{datos_cliente['nombre'].replace(' ', '_') if datos_cliente['nombre'] else 'exportacion'}.xlsx",
+                    data=futuro_excel.result(),
+                    file_name=f"{nombre_exportacion}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
     else:
@@ -441,6 +596,43 @@ if archivos_cargados:
 else:
     st.info("👆 Carga archivos PDF para comenzar")
 
+# Consulta directa de las bases locales (índices construidos al cargarlas)
+if cargar_bases_locales and obtener_cargador_bases().lista():
+    with st.expander("🔎 Consultar bases locales", expanded=False):
+        nombre_consulta = st.text_input(
+            "Buscar afiliado por nombre:",
+            "",
+            help="Tolera tildes, puntuación, orden de los nombres y errores de OCR"
+        )
+        if nombre_consulta.strip():
+            candidatos = buscar_afiliado_por_nombre(nombre_consulta, obtener_bases_locales(), k=10)
+            if candidatos:
+                st.dataframe(pd.DataFrame([
+                    {'AFILIADO': c['afiliado'], 'CUSSP': c['cussp'], 'DOCUMENTO': c['documento'],
+                     'PERIODO': c['periodo'], 'BASE': c['origen'], 'REGISTROS': c['registros'],
+                     'SIMILITUD': f"{c['similitud'] * 100:.0f}%"}
+                    for c in candidatos
+                ]))
+            else:
+                st.write("❌ Ningún afiliado con un nombre parecido")
+        
+        cussp_consulta = st.text_input(
+            "Historial por CUSSP:",
+            "",
+            help="Todas las apariciones del afiliado en REDIRECCIONAMIENTO y PRESUNTA (periodos y empleadores)"
+        )
+        if cussp_consulta.strip():
+            historial = historial_afiliado(cussp_consulta.strip().upper(), obtener_bases_locales())
+            if historial:
+                st.write(f"**{len(historial)} registro(s) de {historial[-1]['afiliado']}**")
+                st.dataframe(pd.DataFrame([
+                    {'PERIODO': h['periodo'], 'DOCUMENTO': h['documento'], 'BASE': h['origen'],
+                     'AFILIADO': h['afiliado']}
+                    for h in historial
+                ]))
+            else:
+                st.write("❌ El CUSSP no aparece en las bases locales")
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,3 @@
+"""
+Benchmarks del lector de planillas (datos sintéticos, sin archivos reales)
+"""
@@ -0,0 +1,384 @@
+"""
+Benchmarks del lector de planillas con datos sintéticos
+Mide tiempo, rendimiento y memoria pico de cada etapa y escribe el resultado
+en JSON para comparar entre versiones
+
+Uso:
+    python -m benchmarks.ejecutar -o resultados.json
+    python -m benchmarks.ejecutar --planillas 1x1,500x50 --bases 10000,1000000 --repeticiones 5
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.sinteticos import escribir_base_excel, generar_base, generar_planilla
+
+
+# Escenarios por defecto: afiliados x páginas
+PLANILLAS_DEFECTO = "1x1,50x2,500x12,500x50"
+BASES_DEFECTO = "10000,100000"
+FILAS_EXCEL_DEFECTO = 10000
+BUSQUEDAS_DEFECTO = 2000
+
+# Filas máximas de una hoja de Excel (sin contar el encabezado)
+MAX_FILAS_EXCEL = 1_048_575
+
+VERSION_FORMATO = 1
+
+
+def medir(funcion, repeticiones=3, memoria=True):
+    """
+    Ejecuta `funcion` varias veces y retorna (último resultado, dict de medidas)
+
+    Los tiempos se toman sin tracemalloc; la memoria pico se mide en una
+    ejecución adicional, porque tracemalloc hace más lento el código medido.
+    """
+    tiempos = []
+    resultado = None
+    for _ in range(max(1, repeticiones)):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    medidas = {
+        'repeticiones': len(tiempos),
+        'segundos_min': round(min(tiempos), 6),
+        'segundos_mediana': round(statistics.median(tiempos), 6),
+        'memoria_pico_mb': None,
+    }
+    if memoria:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            funcion()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        medidas['memoria_pico_mb'] = round(pico / 1024 ** 2, 3)
+    return resultado, medidas
+
+
+def _registro(etapa, escenario, medidas, unidades, unidad):
+    segundos = medidas['segundos_mediana']
+    return {
+        'etapa': etapa,
+        'escenario': escenario,
+        **medidas,
+        'unidades': unidades,
+        'unidad': unidad,
+        'por_segundo': round(unidades / segundos, 3) if segundos > 0 else None,
+    }
+
+
+def _imprimir(registro):
+    memoria = registro['memoria_pico_mb']
+    memoria = f"{memoria:9.1f} MB" if memoria is not None else "        -   "
+    print(
+        f"⏱️ {registro['etapa']:<24} {registro['escenario']:<18} "
+        f"{registro['segundos_mediana'] * 1000:10.1f} ms  "
+        f"{registro['por_segundo'] or 0:12.1f} {registro['unidad']}/s  {memoria}",
+        file=sys.stderr
+    )
+
+
+def _lista_enteros(texto):
+    return [int(valor) for valor in texto.split(',') if valor.strip()]
+
+
+def _lista_planillas(texto):
+    escenarios = []
+    for valor in texto.split(','):
+        if not valor.strip():
+            continue
+        afiliados, _, paginas = valor.lower().partition('x')
+        escenarios.append((int(afiliados), int(paginas or 1)))
+    return escenarios
+
+
+# ==================== Planillas ====================
+
+class ExtraccionIncorrecta(Exception):
+    """La extracción de una planilla sintética no coincide con lo que se generó"""
+
+
+def verificar_planilla(escenario, datos, meta):
+    """
+    Compara una extracción con los metadatos del generador: cabecera, MONTO
+    de la planilla y afiliados (CUSSP y MONTO de cada uno, en orden)
+
+    Raises:
+        ExtraccionIncorrecta: con todas las diferencias encontradas
+    """
+    cabecera = datos['cabecera'] or {}
+    esperados = {
+        'RUC': meta['ruc'],
+        'RAZON_SOCIAL': meta['razon_social'],
+        'PERIODO': meta['periodo'],
+        'N_PLANILLA': meta['n_planilla'],
+        'FECHA_PAGO': meta['fecha_pago'],
+    }
+    diferencias = [
+        f"{campo} {cabecera.get(campo)!r} (esperado {esperado!r})"
+        for campo, esperado in esperados.items() if cabecera.get(campo) != esperado
+    ]
+    monto = cabecera.get('MONTO')
+    if monto is None or abs(monto - meta['monto']) > 0.005:
+        diferencias.append(f"MONTO {monto!r} (esperado {meta['monto']!r})")
+
+    extraidos = [(fila['cussp'], fila.get('monto')) for fila in datos['afiliados']]
+    generados = [(fila['cussp'], fila['montos'][3]) for fila in meta['afiliados']]
+    if extraidos != generados:
+        distintos = sum(1 for extraido, generado in zip(extraidos, generados) if extraido != generado)
+        diferencias.append(
+            f"afiliados: {len(extraidos)} extraídos de {len(generados)}, {distintos} con CUSSP o MONTO distinto"
+        )
+
+    if diferencias:
+        raise ExtraccionIncorrecta(f"{escenario}: " + "; ".join(diferencias))
+
+
+def benchmark_planillas(escenarios, repeticiones, memoria=True):
+    """
+    Extracción de texto, de campos y completa sobre planillas sintéticas
+
+    Cada extracción se verifica contra los metadatos del generador (ver
+    verificar_planilla); el rendimiento se reporta por página efectivamente leída.
+    """
+    from utils.motor_campos import extraer_campos
+    from utils.procesador_planillas import extraer_datos_planilla, extraer_texto_pdf, iterar_paginas_texto
+
+    # Importaciones perezosas y cachés de módulos fuera de la medición
+    pdf, _ = generar_planilla(1, 1)
+    extraer_datos_planilla(pdf)
+
+    registros = []
+    extraidos = []
+    for afiliados, paginas in escenarios:
+        pdf, meta = generar_planilla(afiliados, paginas, semilla=afiliados * 1000 + paginas)
+        escenario = f"{afiliados}af_{meta['paginas']}p"
+        leidas = sum(1 for _ in iterar_paginas_texto(pdf))
+
+        texto, medidas = medir(lambda: extraer_texto_pdf(pdf), repeticiones, memoria)
+        registros.append(_registro('extraer_texto_pdf', escenario, medidas, leidas, 'paginas'))
+
+        _, medidas = medir(lambda: extraer_campos(texto), repeticiones, memoria)
+        registros.append(_registro('extraer_campos', escenario, medidas, afiliados, 'afiliados'))
+
+        datos, medidas = medir(lambda: extraer_datos_planilla(pdf), repeticiones, memoria)
+        registros.append(_registro('extraer_datos_planilla', escenario, medidas, leidas, 'paginas'))
+
+        verificar_planilla(escenario, datos, meta)
+        extraidos.append((f"{escenario}.pdf", datos))
+
+    return registros, extraidos
+
+
+def _dataframe_resultado(extraidos, filas):
+    """DataFrame de resultado con al menos `filas` filas, repitiendo las planillas extraídas"""
+    from utils.modelo_planillas import TablaPlanillas
+    from utils.procesador_planillas import construir_resultado
+
+    tablas = [construir_resultado(nombre, datos)['tabla'] for nombre, datos in extraidos]
+    por_vuelta = sum(len(tabla) for tabla in tablas)
+    if not por_vuelta:
+        return None
+    vueltas = max(1, -(-filas // por_vuelta))
+    return TablaPlanillas.concatenar(tablas * vueltas).a_dataframe()
+
+
+def benchmark_excel(extraidos, filas, repeticiones, memoria=True):
+    """generar_excel sobre el resultado de las planillas extraídas"""
+    from utils.excel_generator import generar_excel
+
+    df = _dataframe_resultado(extraidos, filas)
+    if df is None:
+        return []
+    _, medidas = medir(lambda: generar_excel(df), repeticiones, memoria)
+    return [_registro('generar_excel', f"{len(df)}filas", medidas, len(df), 'filas')]
+
+
+# ==================== Bases ====================
+
+def _configurar_bases(carpeta, ruta_redi, ruta_pres):
+    """Apunta el validador a las bases sintéticas y a una carpeta de snapshots propia"""
+    from utils import validador_base_local as validador
+
+    validador.BASE_REDIRECCIONAMIENTO = ruta_redi
+    validador.BASE_PRESUNTA = ruta_pres
+    validador.GITHUB_REDI_DEFAULT = None
+    validador.GITHUB_PRES_DEFAULT = None
+    validador.CARPETA_SNAPSHOTS = os.path.join(carpeta, 'snapshots')
+    return validador
+
+
+def _borrar_snapshots(validador):
+    carpeta = validador.CARPETA_SNAPSHOTS
+    if os.path.isdir(carpeta):
+        for nombre in os.listdir(carpeta):
+            os.remove(os.path.join(carpeta, nombre))
+
+
+def _claves_busqueda(bases, busquedas, semilla=0):
+    """Mitad de claves existentes (DOCUMENTO, PERIODO) y mitad inexistentes"""
+    import numpy as np
+
+    aleatorio = np.random.default_rng(semilla)
+    base = bases['REDIRECCIONAMIENTO']
+    posiciones = aleatorio.integers(0, len(base), size=busquedas // 2)
+    claves = list(zip(base['DOCUMENTO'].to_numpy()[posiciones], base['PERIODO'].to_numpy()[posiciones]))
+    claves += [(f"10{n:09d}", "199001") for n in range(busquedas - len(claves))]
+    return claves
+
+
+def benchmark_bases(tamanos, busquedas, repeticiones, memoria=True):
+    """cargar_bases_locales (desde Excel y desde snapshot) y buscar_en_base"""
+    registros = []
+    with tempfile.TemporaryDirectory(prefix='bench-bases-') as carpeta:
+        for filas in tamanos:
+            escenario = f"{filas}filas"
+            ruta_redi = os.path.join(carpeta, f"REDIRECCIONAMIENTO_{filas}.xlsx")
+            ruta_pres = os.path.join(carpeta, f"PRESUNTA_{filas}.xlsx")
+            validador = _configurar_bases(carpeta, ruta_redi, ruta_pres)
+
+            df_redi = generar_base(filas, semilla=1)
+            df_pres = generar_base(filas, semilla=2)
+
+            if filas <= MAX_FILAS_EXCEL:
+                print(f"🔄 Escribiendo bases sintéticas de {filas} filas...", file=sys.stderr)
+                escribir_base_excel(df_redi, ruta_redi)
+                escribir_base_excel(df_pres, ruta_pres)
+                del df_redi, df_pres
+
+                # Carga en frío: leer el Excel, preparar los índices y guardar el snapshot
+                def cargar_en_frio():
+                    _borrar_snapshots(validador)
+                    return validador.cargar_bases_locales()
+
+                # Una sola vez: en frío lo que domina es leer el Excel
+                _, medidas = medir(cargar_en_frio, 1, memoria=False)
+                registros.append(_registro('cargar_bases_excel', escenario, medidas, 2 * filas, 'filas'))
+            else:
+                # Excel no admite tantas filas: se crea el snapshot directamente
+                print(f"ℹ️ {filas} filas superan el límite de Excel: solo se mide la carga desde snapshot",
+                      file=sys.stderr)
+                for nombre, ruta, df in (('REDIRECCIONAMIENTO', ruta_redi, df_redi),
+                                         ('PRESUNTA', ruta_pres, df_pres)):
+                    with open(ruta, 'wb') as f:
+                        f.write(nombre.encode('ascii'))
+                    validador.guardar_snapshot(nombre, ruta, validador.preparar_base(df))
+                del df_redi, df_pres, df
+
+            bases, medidas = medir(validador.cargar_bases_locales, repeticiones, memoria)
+            registros.append(_registro('cargar_bases_snapshot', escenario, medidas, 2 * filas, 'filas'))
+
+            claves = _claves_busqueda(bases, busquedas)
+
+            def buscar_todas():
+                validador.MEMO_BUSQUEDAS.limpiar()
+                for documento, periodo in claves:
+                    validador.buscar_en_base(documento, documento, periodo, "", "", bases)
+
+            _, medidas = medir(buscar_todas, repeticiones, memoria)
+            registros.append(_registro('buscar_en_base', escenario, medidas, len(claves), 'busquedas'))
+
+            del bases
+            gc.collect()
+    return registros
+
+
+# ==================== Ejecución ====================
+
+def ejecutar(planillas, bases, filas_excel, busquedas, repeticiones, memoria=True):
+    """Ejecuta todos los benchmarks y retorna el informe como dict serializable a JSON"""
+    from utils.procesador_planillas import VERSION_EXTRACTOR
+
+    inicio = time.perf_counter()
+    resultados = []
+
+    registros, extraidos = benchmark_planillas(planillas, repeticiones, memoria)
+    resultados.extend(registros)
+    resultados.extend(benchmark_excel(extraidos, filas_excel, repeticiones, memoria))
+    if bases:
+        resultados.extend(benchmark_bases(bases, busquedas, repeticiones, memoria))
+
+    return {
+        'formato': VERSION_FORMATO,
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'version_extractor': VERSION_EXTRACTOR,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parametros': {
+            'planillas': [f"{a}x{p}" for a, p in planillas],
+            'bases': bases,
+            'filas_excel': filas_excel,
+            'busquedas': busquedas,
+            'repeticiones': repeticiones,
+            'memoria': memoria,
+        },
+        'duracion_segundos': round(time.perf_counter() - inicio, 3),
+        'resultados': resultados,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='benchmarks.ejecutar',
+        description='Mide las etapas del lector de planillas con PDFs y bases sintéticas'
+    )
+    parser.add_argument('-o', '--salida', default=None,
+                        help='Archivo JSON de resultados (por defecto, salida estándar)')
+    parser.add_argument('--planillas', default=PLANILLAS_DEFECTO,
+                        help='Escenarios AFILIADOSxPAGINAS separados por comas (1 a 500 afiliados, 1 a 50 páginas)')
+    parser.add_argument('--bases', default=BASES_DEFECTO,
+                        help='Filas de cada base sintética separadas por comas (hasta 10000000); vacío para omitir')
+    parser.add_argument('--filas-excel', type=int, default=FILAS_EXCEL_DEFECTO,
+                        help='Filas del resultado usadas para medir generar_excel')
+    parser.add_argument('--busquedas', type=int, default=BUSQUEDAS_DEFECTO,
+                        help='Búsquedas en base por escenario (mitad existentes, mitad no)')
+    parser.add_argument('-n', '--repeticiones', type=int, default=3,
+                        help='Repeticiones por medición (se reporta la mediana)')
+    parser.add_argument('--sin-memoria', action='store_true',
+                        help='No medir la memoria pico (tracemalloc)')
+    args = parser.parse_args(argv)
+
+    # Los mensajes de los módulos medidos no deben mezclarse con el JSON
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            informe = ejecutar(
+                planillas=_lista_planillas(args.planillas),
+                bases=_lista_enteros(args.bases),
+                filas_excel=args.filas_excel,
+                busquedas=args.busquedas,
+                repeticiones=args.repeticiones,
+                memoria=not args.sin_memoria,
+            )
+    except ExtraccionIncorrecta as e:
+        # Un tiempo sobre una extracción equivocada no sirve para comparar versiones
+        print(f"❌ Extracción incorrecta en {e}", file=sys.stderr)
+        return 1
+    for registro in informe['resultados']:
+        _imprimir(registro)
+
+    contenido = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(contenido + "\n")
+        print(f"✅ Resultados en {args.salida} ({informe['duracion_segundos']:.1f}s)", file=sys.stderr)
+    else:
+        print(contenido)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
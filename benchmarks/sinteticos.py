@@ -0,0 +1,298 @@
+"""
+Datos sintéticos para los benchmarks: planillas PDF y bases de afiliados
+Los PDFs se escriben directamente en sintaxis PDF (fuente Helvetica estándar),
+sin dependencias adicionales, con el mismo diseño que leen los extractores:
+cabecera, tabla de afiliados con montos por columna y bloque de totales
+"""
+import os
+import random
+
+import numpy as np
+import pandas as pd
+
+
+ANCHO_PAGINA = 595
+ALTO_PAGINA = 842
+TAMANO_FUENTE = 9
+INTERLINEA = 11
+
+APELLIDOS = ("PEREZ", "GOMEZ", "QUISPE", "MAMANI", "TORRES", "FLORES", "ROJAS",
+             "VILLANUEVA", "HUAMAN", "CHAVEZ", "RAMIREZ", "SANCHEZ")
+NOMBRES = ("JUAN", "MARIA", "LUIS", "ROSA", "CARLOS JOSE", "ANA LUCIA",
+           "MARIA DEL CARMEN", "JOSE ANTONIO", "PEDRO", "CARMEN ROSA")
+
+# Columnas de la tabla: (título, subtítulo, x, alineada a la derecha)
+COLUMNAS_TABLA = (
+    ("Nro", "", 30, False),
+    ("CUSPP", "", 50, False),
+    ("Apellidos y", "Nombres", 132, False),
+    ("Rel.", "Lab.", 290, False),
+    ("Remuneración", "Asegurable", 318, True),
+    ("Aporte", "Obligatorio", 392, True),
+    ("Aporte", "Voluntario", 458, True),
+    ("Total", "Aporte", 524, True),
+)
+ANCHO_COLUMNA_MONTO = 55
+
+# Caracteres del nombre que caben en su columna antes de pasar a una segunda línea
+MAX_CARACTERES_NOMBRE = 22
+
+# Anchos de Helvetica (milésimas del tamaño de fuente) para alinear montos
+_ANCHOS_HELVETICA = {c: 556 for c in "0123456789"}
+_ANCHOS_HELVETICA.update({'.': 278, ',': 278, '-': 333, ' ': 278})
+
+
+def _ancho_texto(texto, tamano=TAMANO_FUENTE):
+    return sum(_ANCHOS_HELVETICA.get(c, 556) for c in texto) * tamano / 1000
+
+
+def _escapar(texto):
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+class _Pagina:
+    """Operadores de contenido de una página"""
+
+    def __init__(self):
+        self.operaciones = []
+
+    def texto(self, x, y, texto, tamano=TAMANO_FUENTE):
+        self.operaciones.append(
+            f"BT /F1 {tamano} Tf {x:.2f} {y:.2f} Td ({_escapar(texto)}) Tj ET"
+        )
+
+    def texto_derecha(self, x_derecha, y, texto, tamano=TAMANO_FUENTE):
+        self.texto(x_derecha - _ancho_texto(texto, tamano), y, texto, tamano)
+
+    def contenido(self):
+        return "\n".join(self.operaciones).encode('cp1252')
+
+
+def escribir_pdf(paginas, productor="Benchmark Lector de Planillas"):
+    """Arma un PDF mínimo válido (catálogo, páginas, fuente y tabla xref) y retorna sus bytes"""
+    objetos = []
+
+    def agregar(cuerpo):
+        objetos.append(cuerpo)
+        return len(objetos)
+
+    catalogo = agregar(None)
+    raiz_paginas = agregar(None)
+    fuente = agregar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    info = agregar(f"<< /Producer ({_escapar(productor)}) >>".encode('latin-1'))
+
+    hijos = []
+    for pagina in paginas:
+        contenido = pagina.contenido()
+        flujo = agregar(b"<< /Length %d >>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+        hijos.append(agregar(
+            f"<< /Type /Page /Parent {raiz_paginas} 0 R /MediaBox [0 0 {ANCHO_PAGINA} {ALTO_PAGINA}] "
+            f"/Resources << /Font << /F1 {fuente} 0 R >> >> /Contents {flujo} 0 R >>".encode('latin-1')
+        ))
+
+    objetos[catalogo - 1] = f"<< /Type /Catalog /Pages {raiz_paginas} 0 R >>".encode('latin-1')
+    referencias = " ".join(f"{hijo} 0 R" for hijo in hijos)
+    objetos[raiz_paginas - 1] = f"<< /Type /Pages /Kids [{referencias}] /Count {len(hijos)} >>".encode('latin-1')
+
+    salida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posiciones = []
+    for numero, cuerpo in enumerate(objetos, start=1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n" % numero + cuerpo + b"\nendobj\n"
+
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b"%010d 00000 n \n" % posicion
+    salida += (
+        b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objetos) + 1, catalogo, info, inicio_xref)
+    )
+    return bytes(salida)
+
+
+def _cussp(aleatorio):
+    letras = "".join(aleatorio.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(5))
+    return f"{aleatorio.randint(100000, 999999)}{letras}{aleatorio.randint(0, 9)}"
+
+
+def _nombre(aleatorio):
+    return f"{aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}, {aleatorio.choice(NOMBRES)}"
+
+
+def _partir_nombre(nombre):
+    """Divide el nombre en dos líneas si no cabe en la columna"""
+    if len(nombre) <= MAX_CARACTERES_NOMBRE:
+        return [nombre]
+    corte = nombre.rfind(' ', 0, MAX_CARACTERES_NOMBRE)
+    return [nombre[:corte], nombre[corte + 1:]]
+
+
+def _encabezado_tabla(pagina, y):
+    for titulo, subtitulo, x, _ in COLUMNAS_TABLA:
+        pagina.texto(x, y, titulo)
+        if subtitulo:
+            pagina.texto(x, y - INTERLINEA, subtitulo)
+    return y - 2 * INTERLINEA - 4
+
+
+def generar_planilla(afiliados=50, paginas=1, semilla=0):
+    """
+    Genera una planilla PDF sintética
+
+    Los afiliados se reparten entre al menos `paginas` páginas (se agregan
+    las que hagan falta si no caben). Cada página repite el encabezado de la
+    tabla y lleva pie de página; los nombres largos ocupan dos líneas.
+
+    Returns:
+        (bytes del PDF, dict con 'afiliados' (nro, cussp, nombre, montos),
+        'paginas', 'ruc', 'razon_social', 'periodo' (sin guion), 'n_planilla',
+        'fecha_pago' y 'monto' (Total Fondo Pensiones + Retenciones))
+    """
+    aleatorio = random.Random(semilla)
+    ruc = f"20{aleatorio.randint(100000000, 999999999)}"
+    periodo = f"{aleatorio.randint(2010, 2024)}-{aleatorio.randint(1, 12):02d}"
+    n_planilla = str(aleatorio.randint(100000, 999999))
+    razon_social = f"EMPRESA SINTETICA {semilla} S.A.C."
+    fecha_pago = None
+
+    por_pagina = max(1, -(-afiliados // max(1, paginas)))
+    filas = []
+    for nro in range(1, afiliados + 1):
+        remuneracion = round(aleatorio.uniform(930, 12000), 2)
+        obligatorio = round(remuneracion * 0.10, 2)
+        voluntario = aleatorio.choice((0.0, 0.0, 0.0, 50.0, 100.0))
+        filas.append({
+            'nro': str(nro),
+            'cussp': _cussp(aleatorio),
+            'nombre': _nombre(aleatorio),
+            'montos': (remuneracion, obligatorio, voluntario, round(obligatorio + voluntario, 2)),
+        })
+
+    lista_paginas = []
+    pagina = None
+    y = 0
+    en_pagina = 0
+
+    def nueva_pagina():
+        nonlocal pagina, y, en_pagina, fecha_pago
+        pagina = _Pagina()
+        lista_paginas.append(pagina)
+        y = ALTO_PAGINA - 42
+        en_pagina = 0
+        if len(lista_paginas) == 1:
+            fecha_pago = f"{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 12):02d}/{periodo[:4]}"
+            for linea in (
+                "SISTEMA PRIVADO DE PENSIONES - PLANILLA DE APORTES PREVISIONALES",
+                f"Nombre o Razón Social: {razon_social} RUC: {ruc}",
+                f"Periodo de Devengue: {periodo}",
+                f"Número de Planilla: {n_planilla}",
+                "Fecha de Pago:",
+                fecha_pago,
+            ):
+                pagina.texto(30, y, linea)
+                y -= 14
+            y -= 6
+        y = _encabezado_tabla(pagina, y)
+
+    nueva_pagina()
+    for fila in filas:
+        partes = _partir_nombre(fila['nombre'])
+        alto = INTERLINEA * len(partes) + 3
+        if en_pagina >= por_pagina or y - alto < 60:
+            nueva_pagina()
+        pagina.texto(COLUMNAS_TABLA[0][2], y, fila['nro'])
+        pagina.texto(COLUMNAS_TABLA[1][2], y, fila['cussp'])
+        pagina.texto(COLUMNAS_TABLA[2][2], y, partes[0])
+        pagina.texto(COLUMNAS_TABLA[3][2], y, "S")
+        for (_, _, x, _), monto in zip(COLUMNAS_TABLA[4:], fila['montos']):
+            pagina.texto_derecha(x + ANCHO_COLUMNA_MONTO, y, f"{monto:.2f}")
+        for parte in partes[1:]:
+            y -= INTERLINEA
+            pagina.texto(COLUMNAS_TABLA[2][2], y, parte)
+        y -= INTERLINEA + 3
+        en_pagina += 1
+
+    while len(lista_paginas) < paginas:
+        nueva_pagina()
+
+    total_fondo = round(sum(fila['montos'][3] for fila in filas), 2)
+    retenciones = round(total_fondo * 0.0174, 2)
+    if y < 120:
+        nueva_pagina()
+    y -= 10
+    for linea in ("Total Fondo Pensiones", "S/.", f"{total_fondo:.2f}",
+                  "Retenciones y Retribuciones", "S/.", f"{retenciones:.2f}"):
+        pagina.texto(30, y, linea)
+        y -= 14
+
+    for numero, hoja in enumerate(lista_paginas, start=1):
+        hoja.texto(260, 30, f"Página {numero} de {len(lista_paginas)}", tamano=7)
+
+    metadatos = {
+        'afiliados': filas,
+        'paginas': len(lista_paginas),
+        'ruc': ruc,
+        'razon_social': razon_social,
+        'periodo': periodo.replace('-', ''),
+        'n_planilla': n_planilla,
+        'fecha_pago': fecha_pago,
+        'monto': round(total_fondo + retenciones, 2),
+    }
+    return escribir_pdf(lista_paginas), metadatos
+
+
+def generar_base(filas, semilla=0, filas_por_documento=20):
+    """
+    Base sintética de afiliados con las columnas de DETALLE AFILIADOS
+    (DOCUMENTO, PERIODO, CUSSP, AFILIADO), generada de forma vectorizada
+
+    Cada DOCUMENTO (RUC) tiene en promedio `filas_por_documento` filas
+    repartidas entre varios periodos.
+    """
+    aleatorio = np.random.default_rng(semilla)
+    documentos = max(1, filas // filas_por_documento)
+
+    rucs = 20_000_000_000 + aleatorio.choice(999_999_999, size=documentos, replace=False)
+    documento = rucs[aleatorio.integers(0, documentos, size=filas)].astype(str)
+
+    anios = aleatorio.integers(2010, 2025, size=filas)
+    meses = aleatorio.integers(1, 13, size=filas)
+    periodo = (anios * 100 + meses).astype(str)
+
+    digitos = aleatorio.integers(100_000, 1_000_000, size=filas).astype(str)
+    letras = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))[aleatorio.integers(0, 26, size=(filas, 5))]
+    letras = np.char.add(np.char.add(np.char.add(letras[:, 0], letras[:, 1]), np.char.add(letras[:, 2], letras[:, 3])), letras[:, 4])
+    control = aleatorio.integers(0, 10, size=filas).astype(str)
+    cussp = np.char.add(np.char.add(digitos, letras), control)
+
+    apellidos = np.array(APELLIDOS)
+    nombres = np.array(NOMBRES)
+    afiliado = np.char.add(
+        np.char.add(apellidos[aleatorio.integers(0, len(apellidos), size=filas)], " "),
+        np.char.add(
+            np.char.add(apellidos[aleatorio.integers(0, len(apellidos), size=filas)], ", "),
+            nombres[aleatorio.integers(0, len(nombres), size=filas)]
+        )
+    )
+
+    return pd.DataFrame({
+        'DOCUMENTO': documento,
+        'PERIODO': periodo,
+        'CUSSP': cussp,
+        'AFILIADO': afiliado,
+    })
+
+
+def escribir_base_excel(df, ruta):
+    """Escribe la base como Excel (modo write-only de openpyxl, fila por fila)"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for fila in df.itertuples(index=False, name=None):
+        ws.append(fila)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    wb.save(temporal)
+    os.replace(temporal, ruta)
@@ -23,6 +23,7 @@ setup(
     entry_points={
         "console_scripts": [
             "lector-planillas=app_planillas:main",
+            "lector-planillas-lote=utils.lote:main",
         ],
     },
 )
@@ -0,0 +1,16 @@
+"""
+Datos compartidos por las pruebas: bases sintéticas ya preparadas e indexadas
+"""
+import pytest
+
+from benchmarks.sinteticos import generar_base
+
+
+@pytest.fixture(scope='session')
+def bases():
+    from utils.validador_base_local import preparar_base
+
+    return {
+        'REDIRECCIONAMIENTO': preparar_base(generar_base(2000, semilla=1)),
+        'PRESUNTA': preparar_base(generar_base(500, semilla=2)),
+    }
@@ -0,0 +1,42 @@
+"""
+Pruebas de la verificación de los benchmarks contra los metadatos del generador
+"""
+import pytest
+
+from benchmarks.ejecutar import ExtraccionIncorrecta, verificar_planilla
+from benchmarks.sinteticos import generar_planilla
+from utils.procesador_planillas import extraer_datos_planilla
+
+
+def test_extraccion_correcta_pasa_la_verificacion():
+    pdf, meta = generar_planilla(30, 3, semilla=4)
+    verificar_planilla("30af_3p", extraer_datos_planilla(pdf), meta)
+
+
+def test_diferencias_de_cabecera_monto_y_afiliados_fallan():
+    pdf, meta = generar_planilla(30, 3, semilla=4)
+    datos = extraer_datos_planilla(pdf)
+    datos['cabecera']['MONTO'] = 0.0
+    datos['cabecera']['FECHA_PAGO'] = "No detectado"
+    datos['afiliados'] = datos['afiliados'][:-1]
+
+    with pytest.raises(ExtraccionIncorrecta) as error:
+        verificar_planilla("30af_3p", datos, meta)
+    assert "MONTO" in str(error.value)
+    assert "FECHA_PAGO" in str(error.value)
+    assert "29 extraídos de 30" in str(error.value)
+
+
+def test_el_benchmark_termina_con_error_si_la_extraccion_no_coincide(monkeypatch, tmp_path):
+    import benchmarks.ejecutar as ejecutar
+
+    def sin_afiliados(pdf_content):
+        datos = extraer_datos_planilla(pdf_content)
+        datos['afiliados'] = []
+        return datos
+
+    monkeypatch.setattr('utils.procesador_planillas.extraer_datos_planilla', sin_afiliados)
+    salida = tmp_path / "resultado.json"
+    codigo = ejecutar.main(['--planillas', '5x1', '--bases', '', '-n', '1', '--sin-memoria', '-o', str(salida)])
+    assert codigo == 1
+    assert not salida.exists()
@@ -0,0 +1,99 @@
+"""
+Pruebas de las búsquedas en las bases locales (utils.validador_base_local)
+"""
+from utils.procesador_planillas import completar_con_bases, construir_resultado
+from utils.validador_base_local import buscar_en_base, buscar_en_base_lote
+
+
+def _claves(bases):
+    redi = bases['REDIRECCIONAMIENTO']
+    pres = bases['PRESUNTA']
+    return [
+        (redi['DOCUMENTO'].iloc[0], redi['PERIODO'].iloc[0]),
+        (pres['DOCUMENTO'].iloc[3], pres['PERIODO'].iloc[3]),
+        ("10999999999", "199001"),
+        (redi['DOCUMENTO'].iloc[0], redi['PERIODO'].iloc[0]),
+    ]
+
+
+def test_busqueda_por_lote_igual_a_una_por_una(bases):
+    claves = _claves(bases)
+
+    por_lote = buscar_en_base_lote(claves, bases)
+
+    una_por_una = [buscar_en_base(doc, doc, per, "", "", bases) for doc, per in claves]
+    assert por_lote == una_por_una
+    assert [r['encontrado'] for r in por_lote] == [True, True, False, True]
+
+
+def test_busqueda_por_lote_sin_bases():
+    assert buscar_en_base_lote([("1", "2")], {}) == [{'encontrado': False, 'afiliados': []}]
+
+
+def _datos_sin_afiliados(ruc, periodo):
+    return {
+        'cabecera': {'RUC': ruc, 'RAZON_SOCIAL': "EMPRESA", 'PERIODO': periodo,
+                     'FECHA_PAGO': "01/01/2020", 'N_PLANILLA': "1", 'MONTO': 10.0},
+        'afiliados': [],
+        'afiliado_unico': None,
+    }
+
+
+def test_caso_2b_diferido_se_resuelve_en_una_busqueda(bases):
+    claves = _claves(bases)
+    resultados = [
+        construir_resultado(f"{n}.pdf", _datos_sin_afiliados(doc, per), lambda: bases, buscar_en_base,
+                            diferir_bases=True)
+        for n, (doc, per) in enumerate(claves)
+    ]
+    assert all('pendiente_base' in resultado for resultado in resultados)
+
+    completar_con_bases(resultados, lambda: bases)
+
+    inmediatos = [
+        construir_resultado(f"{n}.pdf", _datos_sin_afiliados(doc, per), lambda: bases, buscar_en_base)
+        for n, (doc, per) in enumerate(claves)
+    ]
+    for diferido, inmediato in zip(resultados, inmediatos):
+        assert 'pendiente_base' not in diferido
+        assert diferido['mensajes'] == inmediato['mensajes']
+        assert diferido['tabla'].a_dataframe().equals(inmediato['tabla'].a_dataframe())
+
+
+def test_indice_de_nombres_se_arma_al_cargar(bases):
+    from utils.indices_bases import obtener_indice
+
+    indice = obtener_indice(bases['REDIRECCIONAMIENTO'])
+    assert indice.indice_nombres is not None
+    assert len(indice.indice_nombres.nombres) == len(set(indice.nombre_norm))
+
+
+def test_buscar_afiliado_por_nombre_tolera_orden_tildes_y_errores(bases):
+    from utils.validador_base_local import buscar_afiliado_por_nombre
+
+    pres = bases['PRESUNTA']
+    nombre = pres['AFILIADO'].iloc[7]
+    palabras = nombre.replace(',', ' ').split()
+    variante = " ".join(reversed(palabras)).replace("A", "Á", 1).lower()
+
+    candidatos = buscar_afiliado_por_nombre(variante, bases, k=3)
+
+    # El orden de los nombres no cuenta: puede empatar con otro afiliado de mismas palabras
+    assert nombre in [c['afiliado'] for c in candidatos if c['similitud'] == 1.0]
+    assert len(candidatos) <= 3
+    assert buscar_afiliado_por_nombre("", bases) == []
+
+
+def test_validacion_cae_al_nombre_si_no_esta_la_clave(bases):
+    redi = bases['REDIRECCIONAMIENTO']
+    nombre, cussp = redi['AFILIADO'].iloc[5], redi['CUSSP'].iloc[5]
+
+    resultado = buscar_en_base("10999999999", "10999999999", "199001", "", nombre, bases)
+
+    assert resultado['encontrado']
+    assert resultado['afiliado_base'] == nombre
+    assert resultado['cussp'] == cussp
+    assert "solo por nombre" in resultado['observacion']
+
+    ausente = buscar_en_base("10999999999", "10999999999", "199001", "", "ZZZ QQQ XXX", bases)
+    assert not ausente['encontrado']
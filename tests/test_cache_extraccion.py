@@ -0,0 +1,53 @@
+"""
+Pruebas de la caché de extracciones (utils.cache_extraccion)
+"""
+import sqlite3
+
+from utils.cache_extraccion import CacheExtraccion
+
+
+def _suma_real(cache):
+    with sqlite3.connect(cache.ruta) as conexion:
+        return conexion.execute('SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM extracciones').fetchone()
+
+
+def test_totales_siguen_a_inserciones_reemplazos_y_limpieza(tmp_path):
+    cache = CacheExtraccion(tmp_path / "cache.sqlite", max_bytes=0, comprimir=False)
+    for n in range(20):
+        cache.guardar(f"clave{n}", {'texto': "x" * n})
+    cache.guardar("clave3", {'texto': "y" * 500})
+    cache.obtener("clave5")
+
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['entradas'], estadisticas['bytes']) == _suma_real(cache)
+    assert estadisticas['entradas'] == 20
+
+    cache.limpiar()
+    assert (cache.estadisticas()['entradas'], cache.estadisticas()['bytes']) == (0, 0)
+
+
+def test_desalojo_respeta_el_limite_y_quita_las_menos_usadas(tmp_path):
+    cache = CacheExtraccion(tmp_path / "cache.sqlite", max_bytes=2000, comprimir=False)
+    for n in range(30):
+        cache.guardar(f"clave{n}", {'texto': "x" * 200})
+
+    entradas, total = _suma_real(cache)
+    assert total <= 2000
+    assert cache.estadisticas()['bytes'] == total
+    assert cache.obtener("clave0") is None
+    assert cache.obtener("clave29") == {'texto': "x" * 200}
+
+
+def test_cache_de_version_anterior_inicializa_sus_totales(tmp_path):
+    ruta = tmp_path / "cache.sqlite"
+    with sqlite3.connect(ruta) as conexion:
+        conexion.execute(
+            'CREATE TABLE extracciones (clave TEXT PRIMARY KEY, datos BLOB NOT NULL,'
+            ' comprimido INTEGER NOT NULL, tamano INTEGER NOT NULL, ultimo_acceso REAL NOT NULL)'
+        )
+        conexion.execute("INSERT INTO extracciones VALUES ('a', x'00', 0, 123, 1.0)")
+
+    cache = CacheExtraccion(ruta, max_bytes=0)
+
+    assert cache.estadisticas()['entradas'] == 1
+    assert cache.estadisticas()['bytes'] == 123
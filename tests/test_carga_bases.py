@@ -0,0 +1,54 @@
+"""
+Pruebas de la carga de bases en segundo plano (utils.carga_bases)
+"""
+import time
+
+import pytest
+
+from benchmarks.sinteticos import escribir_base_excel, generar_base
+from utils import validador_base_local as validador
+from utils.carga_bases import CargadorBases
+
+
+@pytest.fixture
+def carpeta_bases(tmp_path, monkeypatch):
+    """Carpeta actual con las bases (rutas buscadas en disco) y snapshots propios"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(validador, 'BASE_REDIRECCIONAMIENTO', None)
+    monkeypatch.setattr(validador, 'BASE_PRESUNTA', None)
+    monkeypatch.setattr(validador, 'GITHUB_REDI_DEFAULT', None)
+    monkeypatch.setattr(validador, 'GITHUB_PRES_DEFAULT', None)
+    monkeypatch.setattr(validador, 'CARPETA_SNAPSHOTS', str(tmp_path / "snapshots"))
+    return tmp_path
+
+
+def _esperar(condicion, segundos=20):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_rutas_bases_se_buscan_en_cada_llamada(carpeta_bases):
+    escribir_base_excel(generar_base(100, semilla=1), "DETALLE AFILIADOS REDIRECCIONAMIENTO.xlsx")
+    assert validador.rutas_bases()[1] == validador.RUTA_PRES_RESPALDO
+
+    escribir_base_excel(generar_base(100, semilla=2), "DETALLE AFILIADOS PRESUNTA.xlsx")
+    assert validador.rutas_bases()[1] == "DETALLE AFILIADOS PRESUNTA.xlsx"
+
+
+def test_base_agregada_despues_de_arrancar_se_carga(carpeta_bases):
+    escribir_base_excel(generar_base(300, semilla=1), "DETALLE AFILIADOS REDIRECCIONAMIENTO.xlsx")
+    cargador = CargadorBases(intervalo=0.05).iniciar()
+    try:
+        assert set(cargador.obtener()) == {'REDIRECCIONAMIENTO'}
+
+        escribir_base_excel(generar_base(200, semilla=2), "DETALLE AFILIADOS PRESUNTA.xlsx")
+
+        assert _esperar(lambda: 'PRESUNTA' in cargador.obtener())
+        assert cargador.estado()['registros'] == {'REDIRECCIONAMIENTO': 300, 'PRESUNTA': 200}
+        assert cargador.recargas == 1
+    finally:
+        cargador.detener()
@@ -0,0 +1,88 @@
+"""
+Pruebas de la lectura adaptativa de páginas (utils.procesador_planillas._ControlPaginas)
+"""
+import pytest
+from PyPDF2 import PageObject, PdfReader
+
+from benchmarks.sinteticos import generar_planilla
+from utils.procesador_planillas import _ControlPaginas, extraer_datos_planilla, iterar_paginas_texto
+
+
+CABECERA = (
+    "Nombre o Razón Social: EMPRESA S.A.C. RUC: 20123456789\n"
+    "Periodo de Devengue: 2019-02\n"
+    "Número de Planilla: 123456\n"
+    "Fecha de Pago:\n01/03/2019\n"
+)
+TABLA = "Nro CUSPP Apellidos y Nombres\n1 123456ABCDE1 PEREZ PEREZ, JUAN S 1000.00\n"
+TOTALES = "Total Fondo Pensiones\nS/.\n100.00\nRetenciones y Retribuciones\nS/.\n1.74\n"
+
+
+def monto_esperado(meta):
+    total_fondo = round(sum(fila['montos'][3] for fila in meta['afiliados']), 2)
+    return round(total_fondo + round(total_fondo * 0.0174, 2), 2)
+
+
+def test_se_detiene_con_cabecera_tabla_y_totales():
+    control = _ControlPaginas()
+    assert control.continuar(CABECERA + TABLA)
+    assert not control.continuar(TABLA + TOTALES)
+
+
+def test_sigue_si_la_tabla_continua_despues_de_los_totales():
+    control = _ControlPaginas()
+    # Resumen de totales arriba de la tabla: no prueba que la tabla terminó
+    assert control.continuar(CABECERA + TOTALES + TABLA)
+    assert control.continuar(TABLA)
+    assert not control.continuar(TABLA + TOTALES)
+
+
+def test_sin_tabla_lee_todas_las_paginas():
+    control = _ControlPaginas()
+    assert control.continuar(CABECERA + TOTALES)
+    assert control.continuar("Página 2 de 2")
+
+
+def test_filas_con_nro_pegado_al_cuspp_cuentan_como_tabla():
+    control = _ControlPaginas()
+    assert control.continuar(CABECERA)
+    assert not control.continuar("31220693TVACN0 MAMANI MAMANI, CARMEN S 10093.39\n" + TOTALES)
+
+
+@pytest.mark.parametrize("afiliados, paginas", [(200, 20), (500, 50)])
+def test_planilla_multipagina_con_totales_en_la_ultima_pagina(afiliados, paginas):
+    pdf, meta = generar_planilla(afiliados, paginas, semilla=1)
+
+    assert sum(1 for _ in iterar_paginas_texto(pdf, usar_ocr=False)) == meta['paginas']
+
+    datos = extraer_datos_planilla(pdf)
+    assert len(datos['afiliados']) == afiliados
+    assert datos['cabecera']['MONTO'] == pytest.approx(monto_esperado(meta))
+    assert datos['cabecera']['RUC'] == meta['ruc']
+    assert datos['cabecera']['PERIODO'] == meta['periodo']
+
+
+def test_extraccion_reutiliza_lo_que_leyo_el_triaje(monkeypatch):
+    lectores = []
+    extraidas = []
+    original_init = PdfReader.__init__
+    original_extract = PageObject.extract_text
+
+    def init_contado(self, *args, **kwargs):
+        lectores.append(1)
+        original_init(self, *args, **kwargs)
+
+    def extract_contado(self, *args, **kwargs):
+        extraidas.append(1)
+        return original_extract(self, *args, **kwargs)
+
+    monkeypatch.setattr(PdfReader, '__init__', init_contado)
+    monkeypatch.setattr(PageObject, 'extract_text', extract_contado)
+    pdf, meta = generar_planilla(30, 3, semilla=2)
+
+    datos = extraer_datos_planilla(pdf)
+
+    assert len(datos['afiliados']) == 30
+    assert datos['extraccion']['backend'] == 'pypdf2'
+    assert len(lectores) == 1
+    assert len(extraidas) == meta['paginas']
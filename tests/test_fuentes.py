@@ -0,0 +1,54 @@
+"""
+Pruebas de la identidad de las fuentes de PDF (utils.fuentes)
+"""
+import io
+import os
+import zipfile
+
+from utils.fuentes import fuentes_de_subidas, listar_fuentes
+
+
+class _Subida(io.BytesIO):
+    """Archivo subido como lo entrega st.file_uploader (nombre, id de la subida y tamaño)"""
+
+    def __init__(self, nombre, datos, id_subida):
+        super().__init__(datos)
+        self.name = nombre
+        self.file_id = id_subida
+        self.size = len(datos)
+
+
+def _zip(miembros):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as contenedor:
+        for nombre, datos in miembros.items():
+            contenedor.writestr(nombre, datos)
+    return buffer.getvalue()
+
+
+def test_identidad_de_subidas_sin_leer_el_contenido():
+    pdf = _Subida("a.pdf", b"%PDF-1 a", "id-1")
+    comprimido = _Subida("lote.zip", _zip({"b.pdf": b"%PDF-1 b", "c.pdf": b"%PDF-1 c"}), "id-2")
+
+    fuentes = fuentes_de_subidas([pdf, comprimido])
+
+    assert pdf.tell() == 0
+    assert fuentes[0].identidad == ('subida', "id-1", pdf.size)
+    assert fuentes[1].identidad[:3] == ('subida', "id-2", comprimido.size)
+    assert len({fuente.identidad for fuente in fuentes}) == 3
+
+    # Sin id de subida no hay identidad (se lee y se hashea el contenido)
+    sin_id = io.BytesIO(b"%PDF-1 d")
+    sin_id.name = "d.pdf"
+    assert fuentes_de_subidas([sin_id])[0].identidad is None
+
+
+def test_identidad_de_archivos_en_disco_cambia_al_modificarlos(tmp_path):
+    ruta = tmp_path / "a.pdf"
+    ruta.write_bytes(b"%PDF-1 a")
+    antes = listar_fuentes(tmp_path)[0].identidad
+
+    ruta.write_bytes(b"%PDF-1 otro contenido")
+    os.utime(ruta, ns=(0, 10**9))
+
+    assert listar_fuentes(tmp_path)[0].identidad != antes
@@ -0,0 +1,103 @@
+"""
+Pruebas del cliente de Google Vision (utils.google_ocr) con un ImageAnnotatorClient simulado
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('google.cloud.vision')
+
+from google.api_core import exceptions
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import vision
+
+from utils import google_ocr
+from utils.cache_extraccion import CacheExtraccion
+
+
+class ClienteSimulado:
+    """Responde el contenido de cada imagen como texto; falla la primera solicitud si se pide"""
+
+    creados = []
+
+    def __init__(self, **opciones):
+        self.opciones = opciones
+        self.lotes = []
+        self.fallas_pendientes = 0
+        self.lock = threading.Lock()
+        ClienteSimulado.creados.append(self)
+
+    def batch_annotate_images(self, requests, retry=None):
+        def anotar():
+            with self.lock:
+                if self.fallas_pendientes:
+                    self.fallas_pendientes -= 1
+                    raise exceptions.ServiceUnavailable("servidor ocupado")
+                self.lotes.append(len(requests))
+            return SimpleNamespace(responses=[
+                SimpleNamespace(
+                    error=SimpleNamespace(message=""),
+                    full_text_annotation=SimpleNamespace(text=solicitud.image.content.decode()),
+                    text_annotations=[],
+                )
+                for solicitud in requests
+            ])
+
+        return retry(anotar)() if retry is not None else anotar()
+
+
+@pytest.fixture
+def cliente(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('GOOGLE_APPLICATION_CREDENTIALS', raising=False)
+    monkeypatch.setattr(google_ocr, 'ENDPOINT_VISION', 'http://127.0.0.1:8080')
+    monkeypatch.setattr(google_ocr, 'ESPERA_INICIAL', 0.01)
+    monkeypatch.setattr(google_ocr, '_CLIENTE', None)
+    monkeypatch.setattr(google_ocr, '_CACHE', CacheExtraccion(tmp_path / "vision.sqlite"))
+    monkeypatch.setattr(vision, 'ImageAnnotatorClient', ClienteSimulado)
+    ClienteSimulado.creados = []
+    yield
+    google_ocr.reiniciar_cliente()
+
+
+def _imagenes(cantidad, prefijo="pagina"):
+    return [f"{prefijo} numero {n:04d}".encode() for n in range(cantidad)]
+
+
+def test_un_solo_cliente_y_lotes_de_hasta_16_imagenes(cliente):
+    imagenes = _imagenes(40)
+    assert google_ocr.extraer_textos_google_vision(imagenes) == [i.decode() for i in imagenes]
+    assert google_ocr.extraer_textos_google_vision(_imagenes(5, "otra")) == [i.decode() for i in _imagenes(5, "otra")]
+
+    assert len(ClienteSimulado.creados) == 1
+    simulado = ClienteSimulado.creados[0]
+    assert sorted(simulado.lotes) == [5, 8, 16, 16]
+    assert max(simulado.lotes) <= google_ocr.MAX_IMAGENES_POR_LOTE
+
+
+def test_endpoint_local_con_credenciales_anonimas(cliente):
+    google_ocr.obtener_cliente_vision()
+
+    opciones = ClienteSimulado.creados[0].opciones
+    assert opciones['client_options'] == {'api_endpoint': 'http://127.0.0.1:8080'}
+    assert opciones['transport'] == 'rest'
+    assert isinstance(opciones['credentials'], AnonymousCredentials)
+
+
+def test_error_transitorio_se_reintenta(cliente):
+    google_ocr.obtener_cliente_vision().fallas_pendientes = 1
+
+    imagenes = _imagenes(3)
+    assert google_ocr.extraer_textos_google_vision(imagenes) == [i.decode() for i in imagenes]
+    assert ClienteSimulado.creados[0].lotes == [3]
+
+
+def test_imagen_repetida_se_responde_desde_la_cache(cliente):
+    imagen = _imagenes(1)
+    primero = google_ocr.extraer_textos_google_vision(imagen)
+    simulado = ClienteSimulado.creados[0]
+    assert simulado.lotes == [1]
+
+    assert google_ocr.extraer_textos_google_vision(imagen) == primero
+    assert simulado.lotes == [1]
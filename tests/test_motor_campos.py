@@ -0,0 +1,156 @@
+"""
+Pruebas de la extracción de campos y filas de afiliados del texto plano
+"""
+import pytest
+
+from benchmarks.sinteticos import generar_planilla
+from utils import procesador_planillas
+from utils.motor_campos import iterar_afiliados
+
+
+def test_fila_con_espacios():
+    filas = list(iterar_afiliados("1 123456ABCDE1 PEREZ PEREZ, JUAN S 1000.00 100.00"))
+    assert filas == [{'nro': '1', 'cussp': '123456ABCDE1', 'nombre': 'PEREZ PEREZ, JUAN',
+                      'importes': ['1000.00', '100.00']}]
+
+
+def test_fila_con_nro_pegado_al_cuspp():
+    filas = list(iterar_afiliados("31220693TVACN0 MAMANI MAMANI, CARMEN S 10093.39 1009.34"))
+    assert filas == [{'nro': '31', 'cussp': '220693TVACN0', 'nombre': 'MAMANI MAMANI, CARMEN',
+                      'importes': ['10093.39', '1009.34']}]
+
+
+def test_nombre_en_dos_lineas():
+    texto = (
+        "48480318KLCKO2 VILLANUEVA S 10412.53 1041.25 0.00 1041.25\n"
+        "VILLANUEVA, CARLOS JOSE\n"
+        "49442073WOUGI2 GOMEZ MAMANI, JOSE S 6033.95 603.39 0.00 603.39\n"
+        "Total Fondo Pensiones\n"
+    )
+    filas = list(iterar_afiliados(texto))
+    assert [fila['nombre'] for fila in filas] == ['VILLANUEVA VILLANUEVA, CARLOS JOSE', 'GOMEZ MAMANI, JOSE']
+    assert filas[0]['importes'][-1] == '1041.25'
+
+
+def test_planilla_de_20_paginas_solo_con_texto_plano(monkeypatch):
+    monkeypatch.setattr(procesador_planillas, 'TABLA_POR_COORDENADAS', False)
+    pdf, meta = generar_planilla(200, 20, semilla=1)
+
+    datos = procesador_planillas.extraer_datos_planilla(pdf)
+
+    assert [fila['cussp'] for fila in datos['afiliados']] == [fila['cussp'] for fila in meta['afiliados']]
+    total_fondo = round(sum(fila['montos'][3] for fila in meta['afiliados']), 2)
+    assert datos['cabecera']['MONTO'] == pytest.approx(total_fondo + round(total_fondo * 0.0174, 2))
+
+
+def test_tabla_por_coordenadas_solo_si_el_texto_no_cuadra(monkeypatch):
+    llamadas = []
+    original = procesador_planillas.extraer_tabla_afiliados
+
+    def contada(pdf_content):
+        llamadas.append(1)
+        return original(pdf_content)
+
+    monkeypatch.setattr(procesador_planillas, 'extraer_tabla_afiliados', contada)
+    pdf, meta = generar_planilla(60, 3, semilla=2)
+
+    datos = procesador_planillas.extraer_datos_planilla(pdf)
+
+    # Los importes del texto cuadran con el Total Fondo: no se abre el PDF con pdfplumber
+    assert llamadas == []
+    assert [(fila['cussp'], fila['nombre'], fila['monto']) for fila in datos['afiliados']] == [
+        (fila['cussp'], fila['nombre'], fila['montos'][3]) for fila in meta['afiliados']
+    ]
+
+
+def test_conciliacion_de_importes_con_el_total_fondo():
+    pdf, meta = generar_planilla(60, 3, semilla=2)
+    total_fondo = round(sum(fila['montos'][3] for fila in meta['afiliados']), 2)
+    afiliados = list(iterar_afiliados(procesador_planillas.extraer_texto_pdf(pdf)))
+
+    # Si falta una fila, la suma no cuadra y se recurre a la tabla por coordenadas
+    assert not procesador_planillas._conciliar_con_totales(afiliados[1:], total_fondo)
+    assert 'monto' not in afiliados[1]
+    assert procesador_planillas._conciliar_con_totales(afiliados, total_fondo)
+    assert [fila['monto'] for fila in afiliados] == [fila['montos'][3] for fila in meta['afiliados']]
+
+
+def test_afiliados_del_pdf_se_generan_a_medida_que_se_leen_las_paginas(monkeypatch):
+    leidas = []
+    original = procesador_planillas.iterar_paginas_texto
+
+    def contadas(*args, **kwargs):
+        for texto in original(*args, **kwargs):
+            leidas.append(1)
+            yield texto
+
+    monkeypatch.setattr(procesador_planillas, 'iterar_paginas_texto', contadas)
+    pdf, meta = generar_planilla(200, 20, semilla=1)
+
+    filas = procesador_planillas.iterar_afiliados_pdf(pdf)
+    primera = next(filas)
+    assert len(leidas) == 1
+    assert primera['cussp'] == meta['afiliados'][0]['cussp']
+
+    restantes = list(filas)
+    assert [fila['cussp'] for fila in [primera] + restantes] == [fila['cussp'] for fila in meta['afiliados']]
+    assert len(leidas) == meta['paginas']
+
+
+def test_monto_exportado_suma_el_total_de_la_planilla():
+    from utils.exportadores import preparar_exportacion
+    from utils.modelo_planillas import CabeceraPlanilla, TablaPlanillas
+
+    tabla = TablaPlanillas()
+    montos = []
+    for semilla in (5, 6):
+        pdf, meta = generar_planilla(12, 1, semilla=semilla)
+        datos = procesador_planillas.extraer_datos_planilla(pdf)
+        assert all(fila['monto'] is not None for fila in datos['afiliados'])
+        montos.append(datos['cabecera']['MONTO'])
+        tabla.extender(procesador_planillas.construir_resultado(f"{semilla}.pdf", datos)['tabla'])
+    # Planilla que solo trae el total: su afiliado queda sin aporte propio
+    id_cabecera = tabla.agregar_cabecera(CabeceraPlanilla("total.pdf", "20123456789", "EMPRESA", "201902",
+                                                          "01/03/2019", "1", 150.0))
+    tabla.agregar_afiliado(id_cabecera, "123456ABCDE1", "PEREZ PEREZ, JUAN")
+    montos.append(150.0)
+
+    df = preparar_exportacion(tabla.a_dataframe())
+    assert list(df.groupby("Archivo", sort=False)["MONTO"].sum()) == pytest.approx(montos)
+    assert df["MONTO"].sum() == pytest.approx(sum(montos))
+    assert df["MONTO_AFILIADO"].iloc[:-1].notna().all()
+    assert df["MONTO_AFILIADO"].isna().iloc[-1]
+
+
+def test_tabla_por_coordenadas_con_nro_pegado_y_lineas_intermedias():
+    from benchmarks.sinteticos import ALTO_PAGINA, _Pagina, _encabezado_tabla, escribir_pdf
+    from utils.tabla_afiliados import extraer_tabla_afiliados
+
+    pagina = _Pagina()
+    y = _encabezado_tabla(pagina, ALTO_PAGINA - 60)
+    filas = (("1", "123456ABCDE1", "PEREZ PEREZ, JUAN", "100.00"),
+             ("2", "654321EDCBA2", "GOMEZ ROJAS, ANA", "200.00"),
+             ("3", "111111AAAAA3", "FLORES HUAMAN, LUIS", "300.00"))
+    for nro, cussp, nombre, total in filas:
+        if nro == "1":
+            # Nro pegado al CUSPP: una sola palabra
+            pagina.texto(30, y, nro + cussp)
+        else:
+            pagina.texto(30, y, nro)
+            pagina.texto(50, y, cussp)
+        pagina.texto(132, y, nombre)
+        pagina.texto(290, y, "S")
+        pagina.texto(540, y, total)
+        y -= 14
+        if nro == "2":
+            pagina.texto(30, y, "Subtotal de la hoja 300.00")
+            y -= 14
+    for linea in ("Total Fondo Pensiones", "S/.", "600.00"):
+        pagina.texto(30, y, linea)
+        y -= 14
+
+    afiliados = extraer_tabla_afiliados(escribir_pdf([pagina]))
+
+    assert [(fila['nro'], fila['cussp'], fila['nombre'], fila['monto']) for fila in afiliados] == [
+        (nro, cussp, nombre, float(total)) for nro, cussp, nombre, total in filas
+    ]
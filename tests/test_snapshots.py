@@ -0,0 +1,62 @@
+"""
+Pruebas de la invalidación de los snapshots de las bases (utils.validador_base_local)
+"""
+import json
+import os
+
+import pytest
+
+from benchmarks.sinteticos import generar_base
+from utils import validador_base_local as validador
+
+
+@pytest.fixture
+def origen(tmp_path, monkeypatch):
+    """Excel de origen (solo importan su contenido y su fecha) y carpeta de snapshots propia"""
+    monkeypatch.setattr(validador, 'CARPETA_SNAPSHOTS', str(tmp_path / "snapshots"))
+    ruta = tmp_path / "DETALLE AFILIADOS REDIRECCIONAMIENTO.xlsx"
+    ruta.write_bytes(b"contenido original")
+    os.utime(ruta, ns=(10**18, 10**18))
+    return ruta
+
+
+@pytest.fixture
+def base():
+    return validador.preparar_base(generar_base(300, semilla=3))
+
+
+def test_snapshot_se_reutiliza_si_el_origen_no_cambio(origen, base):
+    validador.guardar_snapshot('REDIRECCIONAMIENTO', str(origen), base)
+
+    df = validador.cargar_snapshot('REDIRECCIONAMIENTO', str(origen))
+
+    assert df is not None
+    assert df[['DOCUMENTO', 'PERIODO', 'CUSSP', 'AFILIADO']].equals(base[['DOCUMENTO', 'PERIODO', 'CUSSP', 'AFILIADO']])
+    doc, per = base['DOCUMENTO'].iloc[0], base['PERIODO'].iloc[0]
+    assert validador.buscar_en_base(doc, doc, per, "", "", {'REDIRECCIONAMIENTO': df})['encontrado']
+
+
+def test_mismo_contenido_con_otra_fecha_reutiliza_el_snapshot(origen, base):
+    validador.guardar_snapshot('REDIRECCIONAMIENTO', str(origen), base)
+    os.utime(origen, ns=(2 * 10**18, 2 * 10**18))
+
+    assert validador.cargar_snapshot('REDIRECCIONAMIENTO', str(origen)) is not None
+
+    # Los metadatos quedan con la fecha nueva (la próxima vez no se vuelve a hashear)
+    _, ruta_meta, _ = validador._rutas_snapshot('REDIRECCIONAMIENTO')
+    with open(ruta_meta, encoding='utf-8') as f:
+        assert json.load(f)['mtime_ns'] == 2 * 10**18
+
+
+def test_origen_modificado_invalida_el_snapshot(origen, base):
+    validador.guardar_snapshot('REDIRECCIONAMIENTO', str(origen), base)
+    origen.write_bytes(b"contenido modificado")
+
+    assert validador.cargar_snapshot('REDIRECCIONAMIENTO', str(origen)) is None
+
+
+def test_otra_version_de_snapshot_lo_invalida(origen, base, monkeypatch):
+    validador.guardar_snapshot('REDIRECCIONAMIENTO', str(origen), base)
+    monkeypatch.setattr(validador, 'VERSION_SNAPSHOT', validador.VERSION_SNAPSHOT + 1)
+
+    assert validador.cargar_snapshot('REDIRECCIONAMIENTO', str(origen)) is None
@@ -1,3 +1,34 @@
-# Módulo utils para el Lector de Pagosfrom .excel_generator import generar_excel
+# Módulo utils para el Lector de Pagos
+# Núcleo del lector sin dependencia de Streamlit; los submódulos se importan
+# al pedir cada nombre (importar `utils` no carga pandas, openpyxl ni los lectores de PDF)
+import importlib
 
-__all__ = ['generar_excel']
\ No newline at end of file
+_EXPORTADOS = {
+    'generar_excel': 'utils.excel_generator',
+    'escribir_excel': 'utils.excel_generator',
+    'procesar_planilla': 'utils.procesador_planillas',
+    'extraer_datos_planilla': 'utils.procesador_planillas',
+    'iterar_afiliados_pdf': 'utils.procesador_planillas',
+    'construir_resultado': 'utils.procesador_planillas',
+    'VERSION_EXTRACTOR': 'utils.procesador_planillas',
+    'TablaPlanillas': 'utils.modelo_planillas',
+    'CacheExtraccion': 'utils.cache_extraccion',
+    'cargar_bases_locales': 'utils.validador_base_local',
+    'buscar_en_base': 'utils.validador_base_local',
+    'procesar_lote': 'utils.lote',
+}
+
+__all__ = list(_EXPORTADOS)
+
+
+def __getattr__(nombre):
+    modulo = _EXPORTADOS.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module 'utils' has no attribute '{nombre}'")
+    valor = getattr(importlib.import_module(modulo), nombre)
+    globals()[nombre] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,212 @@
+"""
+Caché persistente de extracciones de planillas
+Indexa por SHA-256 del PDF + versión del extractor para no volver a parsear documentos repetidos
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+
+# Ubicación por defecto (configurable con la variable de entorno LECTOR_CACHE_DIR)
+CARPETA_CACHE_DEFECTO = os.environ.get(
+    'LECTOR_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'lector-planillas')
+)
+RUTA_CACHE_DEFECTO = os.path.join(CARPETA_CACHE_DEFECTO, 'extracciones.sqlite')
+
+# Tamaño máximo por defecto: 512 MB
+MAX_BYTES_DEFECTO = 512 * 1024 * 1024
+
+
+def calcular_hash_pdf(pdf_content):
+    """Retorna el SHA-256 (hex) del contenido del PDF"""
+    return hashlib.sha256(pdf_content).hexdigest()
+
+
+class CacheExtraccion:
+    """
+    Caché de extracciones en SQLite con desalojo LRU acotado por tamaño
+
+    Cada entrada guarda el texto extraído, la cabecera y los afiliados de una
+    planilla. La clave es el SHA-256 del PDF más la versión del extractor, de
+    modo que un cambio en la lógica de extracción invalida las entradas viejas.
+    Es seguro usarla desde varios hilos y procesos (cada proceso abre su conexión).
+    """
+
+    def __init__(self, ruta=RUTA_CACHE_DEFECTO, max_bytes=MAX_BYTES_DEFECTO, comprimir=True):
+        self.ruta = str(ruta)
+        self.max_bytes = max_bytes
+        self.comprimir = comprimir
+        self.aciertos = 0
+        self.fallos = 0
+        self._local = threading.local()
+        Path(self.ruta).parent.mkdir(parents=True, exist_ok=True)
+        self._crear_tabla()
+
+    def __getstate__(self):
+        # Las conexiones no se pueden enviar a otros procesos
+        estado = self.__dict__.copy()
+        del estado['_local']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._local = threading.local()
+
+    def _conexion(self):
+        """Conexión SQLite por hilo y por proceso"""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or getattr(self._local, 'pid', None) != os.getpid():
+            conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return conexion
+
+    def _crear_tabla(self):
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS extracciones ('
+                ' clave TEXT PRIMARY KEY,'
+                ' datos BLOB NOT NULL,'
+                ' comprimido INTEGER NOT NULL,'
+                ' tamano INTEGER NOT NULL,'
+                ' ultimo_acceso REAL NOT NULL)'
+            )
+            conexion.execute(
+                'CREATE INDEX IF NOT EXISTS idx_extracciones_acceso ON extracciones (ultimo_acceso)'
+            )
+            # Entradas y bytes ocupados en una sola fila, mantenidos por triggers en la
+            # misma transacción que cada cambio (así guardar no suma toda la tabla)
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS totales ('
+                ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+                ' entradas INTEGER NOT NULL,'
+                ' bytes INTEGER NOT NULL)'
+            )
+            # Cachés creadas por versiones anteriores: se suman una sola vez
+            conexion.execute(
+                'INSERT OR IGNORE INTO totales (id, entradas, bytes) '
+                'SELECT 0, COUNT(*), COALESCE(SUM(tamano), 0) FROM extracciones'
+            )
+            conexion.execute(
+                'CREATE TRIGGER IF NOT EXISTS totales_insertar AFTER INSERT ON extracciones BEGIN'
+                ' UPDATE totales SET entradas = entradas + 1, bytes = bytes + NEW.tamano WHERE id = 0;'
+                ' END'
+            )
+            conexion.execute(
+                'CREATE TRIGGER IF NOT EXISTS totales_borrar AFTER DELETE ON extracciones BEGIN'
+                ' UPDATE totales SET entradas = entradas - 1, bytes = bytes - OLD.tamano WHERE id = 0;'
+                ' END'
+            )
+            conexion.execute(
+                'CREATE TRIGGER IF NOT EXISTS totales_actualizar AFTER UPDATE OF tamano ON extracciones BEGIN'
+                ' UPDATE totales SET bytes = bytes - OLD.tamano + NEW.tamano WHERE id = 0;'
+                ' END'
+            )
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def clave(pdf_content, version):
+        """Clave de caché: SHA-256 del PDF + versión del extractor"""
+        return f"{calcular_hash_pdf(pdf_content)}:{version}"
+
+    def obtener(self, clave):
+        """Retorna los datos guardados para `clave` o None si no existen"""
+        try:
+            conexion = self._conexion()
+            fila = conexion.execute(
+                'SELECT datos, comprimido FROM extracciones WHERE clave = ?', (clave,)
+            ).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+
+            conexion.execute(
+                'UPDATE extracciones SET ultimo_acceso = ? WHERE clave = ?', (time.time(), clave)
+            )
+            datos, comprimido = fila
+            if comprimido:
+                datos = zlib.decompress(datos)
+            self.aciertos += 1
+            return json.loads(datos.decode('utf-8'))
+        except Exception as e:
+            print(f"⚠️ Error leyendo caché de extracciones: {e}")
+            self.fallos += 1
+            return None
+
+    def guardar(self, clave, datos):
+        """Guarda `datos` (serializable a JSON) y aplica el límite de tamaño"""
+        try:
+            contenido = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+            if self.comprimir:
+                contenido = zlib.compress(contenido, 6)
+
+            conexion = self._conexion()
+            conexion.execute('BEGIN IMMEDIATE')
+            try:
+                # UPSERT (no INSERT OR REPLACE): el reemplazo no dispara el trigger de borrado
+                conexion.execute(
+                    'INSERT INTO extracciones (clave, datos, comprimido, tamano, ultimo_acceso) '
+                    'VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (clave) DO UPDATE SET datos = excluded.datos, '
+                    'comprimido = excluded.comprimido, tamano = excluded.tamano, '
+                    'ultimo_acceso = excluded.ultimo_acceso',
+                    (clave, sqlite3.Binary(contenido), int(self.comprimir), len(contenido), time.time())
+                )
+                self._desalojar()
+                conexion.execute('COMMIT')
+            except Exception:
+                conexion.execute('ROLLBACK')
+                raise
+        except Exception as e:
+            print(f"⚠️ Error guardando en caché de extracciones: {e}")
+
+    def _desalojar(self):
+        """Elimina las entradas menos usadas recientemente hasta respetar max_bytes"""
+        if not self.max_bytes:
+            return
+        conexion = self._conexion()
+        total = conexion.execute('SELECT bytes FROM totales WHERE id = 0').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        exceso = total - self.max_bytes
+        liberado = 0
+        claves = []
+        for clave, tamano in conexion.execute(
+            'SELECT clave, tamano FROM extracciones ORDER BY ultimo_acceso ASC'
+        ):
+            claves.append((clave,))
+            liberado += tamano
+            if liberado >= exceso:
+                break
+        conexion.executemany('DELETE FROM extracciones WHERE clave = ?', claves)
+
+    def estadisticas(self):
+        """Retorna aciertos, fallos, número de entradas y bytes ocupados"""
+        conexion = self._conexion()
+        entradas, total = conexion.execute(
+            'SELECT entradas, bytes FROM totales WHERE id = 0'
+        ).fetchone()
+        return {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'entradas': entradas,
+            'bytes': total,
+        }
+
+    def limpiar(self):
+        """Elimina todas las entradas"""
+        self._conexion().execute('DELETE FROM extracciones')
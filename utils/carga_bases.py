@@ -0,0 +1,164 @@
+"""
+Carga de las bases locales en segundo plano
+Las bases se cargan en un hilo al arrancar y se vuelven a cargar cuando cambian
+los archivos DETALLE AFILIADOS *.xlsx; las consultas nunca esperan una recarga
+ni ven un índice a medio construir (las bases nuevas se publican de una sola vez)
+"""
+import glob
+import os
+import threading
+import time
+
+
+# Archivos vigilados en las carpetas de las bases
+PATRON_BASES = 'DETALLE AFILIADOS *.xlsx'
+
+# Segundos entre revisiones de los archivos (0 desactiva la vigilancia)
+INTERVALO_VIGILANCIA = float(os.environ.get('LECTOR_BASES_INTERVALO', 5))
+
+
+def _cargar_bases_locales():
+    from utils.validador_base_local import cargar_bases_locales
+    return cargar_bases_locales()
+
+
+def _carpetas_bases():
+    """Carpetas donde están (o se esperan) los Excel de las bases"""
+    from utils.validador_base_local import rutas_bases
+    return sorted({os.path.dirname(os.path.abspath(ruta)) for ruta in rutas_bases() if ruta})
+
+
+class CargadorBases:
+    """
+    Bases locales cargadas por un hilo propio
+
+    `obtener()` retorna siempre el último juego completo de bases: solo la
+    primera carga puede hacer esperar (si una búsqueda llega antes de que
+    termine); las recargas se arman aparte y reemplazan la referencia al final.
+    """
+
+    def __init__(self, cargar=None, carpetas=None, intervalo=INTERVALO_VIGILANCIA):
+        """
+        Args:
+            cargar: Función sin argumentos que retorna el dict de bases
+                (por defecto cargar_bases_locales)
+            carpetas: Carpetas a vigilar (por defecto las de rutas_bases)
+            intervalo: Segundos entre revisiones de los archivos (0 no vigila)
+        """
+        self._cargar = cargar or _cargar_bases_locales
+        self._carpetas = carpetas
+        self.intervalo = intervalo
+        self._bases = None
+        self._lista = threading.Event()
+        self._detener = threading.Event()
+        self._lock_inicio = threading.Lock()
+        self._hilo = None
+        self._firma = None
+        self.cargando = False
+        self.error = None
+        self.ultima_carga = None
+        self.segundos_carga = None
+        self.recargas = 0
+
+    def iniciar(self):
+        """Lanza la carga inicial (y la vigilancia de los archivos) en un hilo daemon"""
+        with self._lock_inicio:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ejecutar, name='cargador-bases', daemon=True)
+                self._hilo.start()
+        return self
+
+    def detener(self):
+        """Detiene la vigilancia (las bases ya cargadas se conservan)"""
+        self._detener.set()
+
+    def obtener(self, esperar=True):
+        """
+        Bases vigentes (dict vacío si no hay ninguna)
+
+        Args:
+            esperar: Si la primera carga no terminó, esperarla (False retorna {})
+        """
+        if self._bases is None:
+            self.iniciar()
+            if esperar:
+                self._lista.wait()
+        return self._bases or {}
+
+    def lista(self):
+        """True cuando terminó la primera carga"""
+        return self._lista.is_set()
+
+    def estado(self):
+        """Resumen para la interfaz: si están listas, registros por base y última carga"""
+        bases = self._bases or {}
+        return {
+            'lista': self.lista(),
+            'cargando': self.cargando,
+            'error': self.error,
+            'registros': {nombre: len(df) for nombre, df in bases.items()},
+            'ultima_carga': self.ultima_carga,
+            'segundos_carga': self.segundos_carga,
+            'recargas': self.recargas,
+        }
+
+    def _ejecutar(self):
+        # La firma se toma antes de cargar: un cambio durante la carga provoca otra
+        self._firma = self._firma_archivos()
+        self._recargar()
+
+        if not self.intervalo:
+            return
+        pendiente = None
+        while not self._detener.wait(self.intervalo):
+            firma = self._firma_archivos()
+            if firma == self._firma:
+                pendiente = None
+                continue
+            if firma != pendiente:
+                # Esperar una revisión más sin cambios (el archivo puede estar copiándose)
+                pendiente = firma
+                continue
+            self._firma = firma
+            pendiente = None
+            print("🔄 Cambiaron las bases locales, recargando en segundo plano...")
+            self._recargar()
+
+    def _recargar(self):
+        """Arma un juego nuevo de bases y lo publica reemplazando la referencia"""
+        self.cargando = True
+        inicio = time.perf_counter()
+        try:
+            bases = self._cargar()
+            self.error = None
+        except Exception as e:
+            print(f"⚠️ No se pudieron cargar las bases locales: {e}")
+            self.error = str(e)
+            bases = None
+        finally:
+            self.cargando = False
+
+        # Una recarga fallida o vacía no reemplaza bases que ya funcionaban
+        if bases or self._bases is None:
+            if self._bases is not None:
+                self.recargas += 1
+            self._bases = bases or {}
+            self.ultima_carga = time.time()
+            self.segundos_carga = time.perf_counter() - inicio
+        self._lista.set()
+
+    def _firma_archivos(self):
+        """(ruta, mtime, tamaño) de los Excel de las bases, para detectar cambios"""
+        firma = []
+        try:
+            carpetas = self._carpetas if self._carpetas is not None else _carpetas_bases()
+            for carpeta in carpetas:
+                for ruta in sorted(glob.glob(os.path.join(glob.escape(carpeta), PATRON_BASES))):
+                    try:
+                        estado = os.stat(ruta)
+                    except OSError:
+                        continue
+                    firma.append((ruta, estado.st_mtime_ns, estado.st_size))
+        except Exception as e:
+            print(f"⚠️ No se pudieron revisar los archivos de las bases: {e}")
+        return tuple(firma)
@@ -1,101 +1,149 @@
 """
 Generador de archivos Excel
+Escribe en modo write-only (filas en streaming con estilos compartidos),
+de modo que la memoria no crece con el número de filas
 """
-import pandas as pd
 import io
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+from openpyxl.utils import get_column_letter
+
+
+TITULO_EXCEL = "PLANTILLA PAGOS REDIRECCIONAMIENTO"
+
+# Orden de columnas del Excel (las que no estén aquí, como Archivo, van al final)
+ORDEN_COLUMNAS = [
+    'RUC', 'RAZON_SOCIAL', 'PERIODO', 'CUSSP', 'AFILIADO',
+    'FECHA_PAGO', 'N_PLANILLA', 'MONTO', 'MONTO_AFILIADO', 'OBSERVACION'
+]
+
+FORMATO_MONEDA = '_("S/. "* #,##0.00_);_("S/. "* (#,##0.00);_("S/. "* "-"??_);_(@_)'
+
+ANCHO_MAXIMO = 50
+
+
+def _crear_estilos():
+    """Estilos con nombre; cada celda solo referencia uno (no se crean objetos por celda)"""
+    titulo = NamedStyle(name="planilla_titulo")
+    titulo.font = Font(bold=True, size=14, color="FFFFFF")
+    titulo.fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
+    titulo.alignment = Alignment(horizontal="center", vertical="center")
+
+    encabezado = NamedStyle(name="planilla_encabezado")
+    encabezado.font = Font(bold=True, color="FFFFFF")
+    encabezado.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    encabezado.alignment = Alignment(horizontal="center", vertical="center")
+
+    dato = NamedStyle(name="planilla_dato")
+    dato.alignment = Alignment(horizontal="left", vertical="center")
+
+    moneda = NamedStyle(name="planilla_moneda")
+    moneda.alignment = Alignment(horizontal="left", vertical="center")
+    moneda.number_format = FORMATO_MONEDA
+
+    return [titulo, encabezado, dato, moneda]
+
+
+def _arreglo_estilo(ws, nombre):
+    """Estilo resuelto (ids de fuente, relleno, alineación, formato) para reutilizar en muchas celdas"""
+    plantilla = WriteOnlyCell(ws)
+    plantilla.style = nombre
+    return plantilla._style
+
+
+def ordenar_columnas(df, orden=ORDEN_COLUMNAS):
+    """Retorna el DataFrame con las columnas de `orden` primero y el resto al final"""
+    columnas_existentes = [col for col in orden if col in df.columns]
+    columnas_restantes = [col for col in df.columns if col not in columnas_existentes]
+    return df[columnas_existentes + columnas_restantes]
+
+
+def calcular_anchos(df):
+    """
+    Ancho de cada columna a partir de la longitud de sus valores como texto
+    (vectorizado; los valores vacíos o cero no cuentan, igual que antes)
+    """
+    anchos = []
+    for columna in df.columns:
+        serie = df[columna]
+        max_length = len(str(columna))
+        if len(serie):
+            longitudes = serie.astype(str).str.len().where(serie.notna() & serie.astype(bool), 0)
+            max_length = max(max_length, int(longitudes.max()))
+        anchos.append(min(max_length + 2, ANCHO_MAXIMO))
+    return anchos
+
+
+def escribir_excel(df, destino, titulo=TITULO_EXCEL, columnas_moneda=('MONTO', 'MONTO_AFILIADO')):
+    """
+    Escribe el DataFrame en `destino` (ruta o archivo binario) fila por fila
+
+    Título combinado en la fila 1, encabezados en la fila 2 y datos desde la
+    fila 3. Los montos mayores a cero llevan formato de moneda; los valores
+    faltantes (NaN) quedan como celdas vacías.
+    """
+    wb = Workbook(write_only=True)
+    estilos = _crear_estilos()
+    for estilo in estilos:
+        wb.add_named_style(estilo)
+    estilo_titulo, estilo_encabezado, estilo_dato, estilo_moneda = (e.name for e in estilos)
+
+    ws = wb.create_sheet("Datos")
+    num_cols = max(len(df.columns), 1)
+
+    # En modo write-only los anchos y combinaciones se definen antes de escribir filas
+    for col_idx, ancho in enumerate(calcular_anchos(df), 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = ancho
+    ws.merged_cells.add(f'A1:{get_column_letter(num_cols)}1')
+    ws.row_dimensions[1].height = 25
+
+    # Título principal
+    celda = WriteOnlyCell(ws, value=titulo)
+    celda.style = estilo_titulo
+    ws.append([celda])
+
+    # Encabezados (fila 2)
+    encabezados = []
+    for column_title in df.columns:
+        celda = WriteOnlyCell(ws, value=column_title)
+        celda.style = estilo_encabezado
+        encabezados.append(celda)
+    ws.append(encabezados)
+
+    # Datos (a partir de fila 3): cada celda reutiliza el estilo ya resuelto
+    arreglo_dato = _arreglo_estilo(ws, estilo_dato)
+    arreglo_moneda = _arreglo_estilo(ws, estilo_moneda)
+    es_moneda = [col in columnas_moneda for col in df.columns]
+    for fila in df.itertuples(index=False, name=None):
+        celdas = []
+        for value, moneda in zip(fila, es_moneda):
+            if isinstance(value, float) and value != value:
+                value = None
+            if moneda and isinstance(value, (int, float)) and value > 0:
+                arreglo = arreglo_moneda
+            else:
+                arreglo = arreglo_dato
+            celdas.append(Cell(ws, row=1, column=1, value=value, style_array=arreglo))
+        ws.append(celdas)
+
+    wb.save(destino)
 
 
 def generar_excel(df):
     """
     Genera archivo Excel a partir de DataFrame
-    
+
     Args:
         df: DataFrame con los datos
-    
+
     Returns:
         bytes: Archivo Excel
     """
     try:
-        # Crear workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Datos"
-        
-        # Reordenar columnas según el orden deseado
-        orden_columnas = [
-            'RUC', 'RAZON_SOCIAL', 'PERIODO', 'CUSSP', 'AFILIADO',
-            'FECHA_PAGO', 'N_PLANILLA', 'MONTO', 'OBSERVACION'
-        ]
-        # Mantener solo las columnas que existan en el DataFrame
-        columnas_existentes = [col for col in orden_columnas if col in df.columns]
-        # Agregar columnas restantes (como Archivo)
-        columnas_restantes = [col for col in df.columns if col not in columnas_existentes]
-        df_ordenado = df[columnas_existentes + columnas_restantes]
-        
-        # Calcular el rango de columnas para el merge dinámicamente
-        num_cols = len(df_ordenado.columns)
-        col_letra_fin = chr(64 + num_cols) if num_cols < 27 else 'A' + chr(64 + num_cols - 26)
-        rango_merge = f'A1:{col_letra_fin}1'
-        
-        # Título principal
-        ws.merge_cells(rango_merge)
-        titulo = ws['A1']
-        titulo.value = "PLANTILLA PAGOS REDIRECCIONAMIENTO"
-        titulo.font = Font(bold=True, size=14, color="FFFFFF")
-        titulo.fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-        titulo.alignment = Alignment(horizontal="center", vertical="center")
-        ws.row_dimensions[1].height = 25
-        
-        # Encabezados (fila 2)
-        for col_idx, column_title in enumerate(df_ordenado.columns, 1):
-            cell = ws.cell(row=2, column=col_idx)
-            cell.value = column_title
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Datos (a partir de fila 3)
-        # Encontrar índice de columna MONTO para aplicar formato de moneda
-        monto_col_idx = None
-        for col_idx, col_name in enumerate(df_ordenado.columns, 1):
-            if col_name == 'MONTO':
-                monto_col_idx = col_idx
-                break
-        
-        for r_idx, row in enumerate(df_ordenado.values, 3):
-            for c_idx, value in enumerate(row, 1):
-                cell = ws.cell(row=r_idx, column=c_idx)
-                cell.value = value
-                cell.alignment = Alignment(horizontal="left", vertical="center")
-                
-                # Aplicar formato de moneda a la columna MONTO
-                if c_idx == monto_col_idx and isinstance(value, (int, float)) and value > 0:
-                    cell.number_format = '_("S/. "* #,##0.00_);_("S/. "* (#,##0.00);_("S/. "* "-"??_);_(@_)'
-        
-        # Ajustar ancho de columnas (evitar celdas mergeadas)
-        for col_idx in range(1, len(df_ordenado.columns) + 1):
-            max_length = 0
-            column_letter = chr(64 + col_idx) if col_idx < 27 else 'A' + chr(64 + col_idx - 26)
-            
-            for row_idx in range(2, len(df_ordenado) + 3):
-                try:
-                    cell = ws.cell(row=row_idx, column=col_idx)
-                    if cell.value and not isinstance(cell, type(None)):
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Guardar en bytes
         buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        escribir_excel(ordenar_columnas(df), buffer)
         return buffer.getvalue()
-    
+
     except Exception as e:
         raise Exception(f"Error al generar Excel: {str(e)}")
@@ -0,0 +1,94 @@
+"""
+Exportación del resultado a formatos planos (CSV y Parquet)
+Sin estilos: pensados para cargar los datos en otros sistemas
+"""
+import hashlib
+import io
+
+import pandas as pd
+
+from utils.modelo_planillas import COLUMNAS_RESULTADO
+
+
+# Filas por bloque al escribir CSV
+FILAS_POR_BLOQUE = 50_000
+
+
+def preparar_exportacion(df):
+    """
+    Retorna el DataFrame con el orden de columnas fijo del resultado y tipos estables
+
+    Columnas extra (si las hay) van al final. MONTO queda como float,
+    MONTO_AFILIADO como float vacío cuando no hay aporte por afiliado y el
+    resto como texto (PERIODO, RUC o N_PLANILLA no pierden ceros a la izquierda).
+    """
+    columnas = [col for col in COLUMNAS_RESULTADO if col in df.columns]
+    columnas += [col for col in df.columns if col not in columnas]
+    datos = df[columnas].copy()
+
+    for columna in columnas:
+        if columna == 'MONTO':
+            datos[columna] = pd.to_numeric(datos[columna], errors='coerce').fillna(0.0).astype('float64')
+        elif columna == 'MONTO_AFILIADO':
+            datos[columna] = pd.to_numeric(datos[columna], errors='coerce').astype('float64')
+        else:
+            datos[columna] = datos[columna].fillna('').astype(str)
+    return datos
+
+
+def huella_dataframe(df):
+    """
+    Huella (SHA-256) del contenido de un DataFrame: columnas, índice y valores
+    Sirve para reutilizar una exportación mientras el resultado no cambie
+    """
+    sha = hashlib.sha256()
+    sha.update("\x1f".join(str(columna) for columna in df.columns).encode('utf-8'))
+    try:
+        hashes = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        # Columnas con valores no hasheables (p. ej. listas): se comparan como texto
+        hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    sha.update(hashes.to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+def escribir_csv(df, destino, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Escribe el resultado en CSV (UTF-8) en `destino` (ruta o archivo binario), por bloques"""
+    preparar_exportacion(df).to_csv(
+        destino, index=False, encoding='utf-8', chunksize=filas_por_bloque
+    )
+
+
+def escribir_parquet(df, destino, compresion='snappy'):
+    """Escribe el resultado en Parquet en `destino` (ruta o archivo binario); requiere pyarrow"""
+    preparar_exportacion(df).to_parquet(destino, index=False, engine='pyarrow', compression=compresion)
+
+
+def generar_csv(df):
+    """
+    Genera archivo CSV a partir de DataFrame
+
+    Returns:
+        bytes: Archivo CSV en UTF-8
+    """
+    try:
+        buffer = io.BytesIO()
+        escribir_csv(df, buffer)
+        return buffer.getvalue()
+    except Exception as e:
+        raise Exception(f"Error al generar CSV: {str(e)}")
+
+
+def generar_parquet(df):
+    """
+    Genera archivo Parquet a partir de DataFrame
+
+    Returns:
+        bytes: Archivo Parquet
+    """
+    try:
+        buffer = io.BytesIO()
+        escribir_parquet(df, buffer)
+        return buffer.getvalue()
+    except Exception as e:
+        raise Exception(f"Error al generar Parquet: {str(e)}")
@@ -0,0 +1,122 @@
+"""
+Registro de backends de extracción de texto de PDFs
+Cada backend genera el texto página por página; se mide su tiempo y su tasa
+de éxito por diseño de documento para probar primero el que suele funcionar
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class BackendTexto:
+    """
+    Backend registrado: una función (pdf_content, desde) -> generador de textos por página
+
+    Con `usa_lectura` la función recibe además la LecturaPdf del triaje (o None)
+    """
+
+    __slots__ = ('nombre', 'funcion', 'ocr', 'usa_lectura')
+
+    def __init__(self, nombre, funcion, ocr=False, usa_lectura=False):
+        self.nombre = nombre
+        self.funcion = funcion
+        # Los backends OCR solo se usan cuando ningún backend de texto funcionó
+        self.ocr = ocr
+        self.usa_lectura = usa_lectura
+
+    def textos(self, pdf_content, desde=0, medicion=None, lectura=None):
+        """Genera los textos de las páginas acumulando en `medicion` el tiempo dentro del backend"""
+        if self.usa_lectura:
+            generador = self.funcion(pdf_content, desde, lectura)
+        else:
+            generador = self.funcion(pdf_content, desde)
+        try:
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    texto = next(generador)
+                except StopIteration:
+                    return
+                finally:
+                    if medicion is not None:
+                        medicion['segundos'] += time.perf_counter() - inicio
+                yield texto
+        finally:
+            generador.close()
+
+
+_REGISTRO = OrderedDict()
+
+
+def registrar_backend(nombre, funcion, ocr=False, usa_lectura=False):
+    """
+    Registra (o reemplaza) un backend de extracción
+
+    El orden de registro es el orden por defecto en que se prueban.
+    """
+    _REGISTRO[nombre] = BackendTexto(nombre, funcion, ocr, usa_lectura)
+    return _REGISTRO[nombre]
+
+
+def backends_registrados(ocr=None):
+    """Backends en orden de registro (filtrados por tipo si `ocr` no es None)"""
+    return [b for b in _REGISTRO.values() if ocr is None or b.ocr == ocr]
+
+
+class EstadisticasBackends:
+    """
+    Intentos, éxitos y tiempo de cada backend por diseño de documento
+
+    El diseño identifica al emisor (productor del PDF, tamaño de página); con
+    esos datos se ordenan los backends para que el primero que se prueba sea
+    el que más veces funcionó a la primera en documentos del mismo diseño.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (diseño, backend) -> [intentos, éxitos, segundos]
+        self._datos = {}
+
+    def registrar(self, diseno, backend, exito, segundos):
+        with self._lock:
+            datos = self._datos.setdefault((diseno, backend), [0, 0, 0.0])
+            datos[0] += 1
+            datos[1] += int(bool(exito))
+            datos[2] += segundos
+
+    def _puntaje(self, diseno, backend):
+        intentos, exitos, segundos = self._datos.get((diseno, backend), (0, 0, 0.0))
+        # Tasa de éxito suavizada: sin datos todos empatan en 0.5
+        tasa = (exitos + 1) / (intentos + 2)
+        promedio = segundos / intentos if intentos else 0.0
+        return -tasa, promedio
+
+    def ordenar(self, diseno, backends):
+        """Ordena los backends por tasa de éxito y luego por tiempo medio (orden de registro al empatar)"""
+        with self._lock:
+            posiciones = {b.nombre: i for i, b in enumerate(backends)}
+            return sorted(backends, key=lambda b: (*self._puntaje(diseno, b.nombre), posiciones[b.nombre]))
+
+    def resumen(self):
+        """Retorna {backend: {'intentos', 'exitos', 'segundos'}} sumando todos los diseños"""
+        resumen = {}
+        with self._lock:
+            for (_, backend), (intentos, exitos, segundos) in self._datos.items():
+                total = resumen.setdefault(backend, {'intentos': 0, 'exitos': 0, 'segundos': 0.0})
+                total['intentos'] += intentos
+                total['exitos'] += exitos
+                total['segundos'] += segundos
+        return resumen
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+# Estadísticas del proceso actual (cada worker aprende con los documentos que procesa)
+ESTADISTICAS = EstadisticasBackends()
+
+
+def estadisticas_backends():
+    """Resumen de intentos, éxitos y tiempo por backend en este proceso"""
+    return ESTADISTICAS.resumen()
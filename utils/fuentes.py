@@ -0,0 +1,170 @@
+"""
+Fuentes de PDFs de planillas: archivos sueltos, carpetas del servidor y ZIPs
+Cada PDF se describe por su ubicación y se lee recién cuando se va a procesar,
+de modo que nunca se tienen en memoria todos los documentos a la vez
+"""
+import os
+import zipfile
+from pathlib import Path
+
+
+def es_pdf(nombre):
+    return str(nombre).lower().endswith('.pdf')
+
+
+def es_zip(nombre):
+    return str(nombre).lower().endswith('.zip')
+
+
+class FuentePdf:
+    """
+    Un PDF por leer: un archivo en disco, un archivo subido o un miembro de un ZIP
+
+    Solo guarda dónde está el documento. Las fuentes en disco (PDF o miembro
+    de un ZIP en disco) se pueden enviar a otros procesos, que leen el
+    contenido por su cuenta.
+
+    `identidad` identifica el contenido sin leerlo (id de la subida, ruta con
+    fecha de modificación, CRC del miembro del ZIP y tamaño), o es None si no
+    se conoce: sirve para reconocer en un rerun un PDF ya leído.
+    """
+
+    __slots__ = ('nombre', 'ruta', 'miembro', 'archivo', 'identidad')
+
+    def __init__(self, nombre, ruta=None, miembro=None, archivo=None, identidad=None):
+        self.nombre = nombre
+        self.ruta = ruta
+        self.miembro = miembro
+        # Archivo subido (PDF) o ZipFile ya abierto en memoria
+        self.archivo = archivo
+        self.identidad = identidad
+
+    def leer(self):
+        """Retorna el contenido del PDF (solo se descomprime este miembro)"""
+        if self.miembro is None:
+            if self.archivo is not None:
+                return self.archivo.read()
+            with open(self.ruta, 'rb') as f:
+                return f.read()
+
+        contenedor = self.archivo if self.archivo is not None else _zip_abierto(self.ruta)
+        return contenedor.read(self.miembro)
+
+    def __repr__(self):
+        return f"FuentePdf({self.nombre!r})"
+
+
+# ZIPs en disco abiertos por proceso: (pid, ruta) → ZipFile
+# (el pid evita compartir el descriptor de archivo entre procesos hijos)
+_ZIPS_ABIERTOS = {}
+
+
+def _zip_abierto(ruta):
+    clave = (os.getpid(), ruta)
+    contenedor = _ZIPS_ABIERTOS.get(clave)
+    if contenedor is None:
+        contenedor = zipfile.ZipFile(ruta)
+        _ZIPS_ABIERTOS[clave] = contenedor
+    return contenedor
+
+
+def _identidad_archivo(ruta):
+    """Identidad de un archivo en disco: ruta, fecha de modificación y tamaño"""
+    estado = os.stat(ruta)
+    return ('archivo', os.path.abspath(ruta), estado.st_mtime_ns, estado.st_size)
+
+
+def _identidad_subida(archivo):
+    """Identidad de un archivo subido (id de la subida y tamaño), o None si no la tiene"""
+    id_subida = getattr(archivo, 'file_id', None)
+    if id_subida is None:
+        return None
+    return ('subida', id_subida, getattr(archivo, 'size', None))
+
+
+def _identidad_miembro(identidad_zip, contenedor, miembro):
+    """Identidad de un miembro de ZIP: la del ZIP más nombre, CRC y tamaño del miembro"""
+    if identidad_zip is None:
+        return None
+    info = contenedor.getinfo(miembro)
+    return identidad_zip + (miembro, info.CRC, info.file_size)
+
+
+def miembros_pdf(contenedor):
+    """Nombres de los PDFs dentro de un ZipFile, en orden determinista"""
+    miembros = []
+    for info in contenedor.infolist():
+        nombre = info.filename
+        if info.is_dir() or not es_pdf(nombre):
+            continue
+        # Metadatos que agrega macOS al comprimir
+        if nombre.startswith('__MACOSX/') or os.path.basename(nombre).startswith('._'):
+            continue
+        miembros.append(nombre)
+    return sorted(miembros)
+
+
+def fuentes_de_zip(ruta):
+    """Fuentes de los PDFs de un ZIP en disco (no se descomprime nada todavía)"""
+    contenedor = _zip_abierto(str(ruta))
+    identidad_zip = _identidad_archivo(str(ruta))
+    return [
+        FuentePdf(miembro, ruta=str(ruta), miembro=miembro,
+                  identidad=_identidad_miembro(identidad_zip, contenedor, miembro))
+        for miembro in miembros_pdf(contenedor)
+    ]
+
+
+def listar_fuentes(rutas, recursivo=False):
+    """
+    Convierte rutas del servidor en fuentes de PDF
+
+    Args:
+        rutas: Rutas a carpetas, ZIPs o PDFs
+        recursivo: Incluir subcarpetas al recorrer carpetas
+
+    Returns:
+        list[FuentePdf]: En orden determinista (por ruta y luego por miembro)
+    """
+    if isinstance(rutas, (str, os.PathLike)):
+        rutas = [rutas]
+
+    fuentes = []
+    for ruta in rutas:
+        ruta = Path(ruta)
+        if ruta.is_dir():
+            patron = '**/*' if recursivo else '*'
+            archivos = sorted(str(p) for p in ruta.glob(patron) if p.is_file())
+        elif ruta.is_file():
+            archivos = [str(ruta)]
+        else:
+            raise FileNotFoundError(f"No existe la ruta: {ruta}")
+
+        for archivo in archivos:
+            if es_pdf(archivo):
+                fuentes.append(FuentePdf(os.path.basename(archivo), ruta=archivo,
+                                         identidad=_identidad_archivo(archivo)))
+            elif es_zip(archivo):
+                fuentes.extend(fuentes_de_zip(archivo))
+    return fuentes
+
+
+def fuentes_de_subidas(archivos):
+    """
+    Convierte archivos subidos (PDF o ZIP) en fuentes
+
+    De los ZIPs solo se lee el índice; cada miembro se descomprime al leerlo.
+    """
+    fuentes = []
+    for archivo in archivos:
+        if es_zip(archivo.name):
+            contenedor = zipfile.ZipFile(archivo)
+            identidad_zip = _identidad_subida(archivo)
+            fuentes.extend(
+                FuentePdf(miembro, miembro=miembro, archivo=contenedor,
+                          identidad=_identidad_miembro(identidad_zip, contenedor, miembro))
+                for miembro in miembros_pdf(contenedor)
+            )
+        else:
+            fuentes.append(FuentePdf(archivo.name, archivo=archivo, identidad=_identidad_subida(archivo)))
+    return fuentes
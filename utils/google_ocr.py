@@ -1,94 +1,276 @@
 """
 Módulo para usar Google Vision API para OCR
 Maneja PDF, JPG, PNG automáticamente
+
+Un solo cliente por proceso; las imágenes se envían en lotes (batch_annotate_images)
+con concurrencia acotada y reintentos, y las respuestas se guardan por hash de imagen
 """
+import hashlib
+import io
 import os
-import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import streamlit as st
 
+from utils.cache_extraccion import CARPETA_CACHE_DEFECTO, CacheExtraccion
 
-def obtener_cliente_vision():
+
+# Endpoint alternativo (p. ej. un servidor de prueba local: http://127.0.0.1:8080)
+ENDPOINT_VISION = os.environ.get('LECTOR_VISION_ENDPOINT')
+
+# Vision acepta hasta 16 imágenes por solicitud
+MAX_IMAGENES_POR_LOTE = 16
+# Solicitudes simultáneas a la API
+MAX_SOLICITUDES_CONCURRENTES = int(os.environ.get('LECTOR_VISION_CONCURRENCIA', 4))
+
+# Reintentos con espera exponencial ante errores transitorios
+ESPERA_INICIAL = 0.5
+ESPERA_MAXIMA = 10.0
+TIEMPO_MAXIMO_REINTENTOS = 60.0
+
+RUTA_CACHE_VISION = os.path.join(CARPETA_CACHE_DEFECTO, 'vision.sqlite')
+VERSION_RESPUESTA = "1"
+
+_CLIENTE = None
+_CLIENTE_LOCK = threading.Lock()
+_POOL = None
+_CACHE = None
+
+
+def _streamlit():
+    """Módulo streamlit si la app ya lo cargó (este módulo no depende de él)"""
+    return sys.modules.get('streamlit')
+
+
+def _avisar_error(mensaje):
+    """Muestra el error en la app si corre en Streamlit; si no, lo imprime"""
+    st = _streamlit()
+    if st is not None:
+        try:
+            st.error(mensaje)
+            return
+        except Exception:
+            pass
+    print(mensaje)
+
+
+def _credenciales():
     """
-    Obtiene cliente de Google Vision
-    Busca credenciales en:
-    1. Variable de entorno GOOGLE_APPLICATION_CREDENTIALS
+    Credenciales de la cuenta de servicio, sin escribirlas a disco
+    Busca en:
+    1. Variable de entorno GOOGLE_APPLICATION_CREDENTIALS (las usa el cliente por defecto)
     2. Archivo credentials.json en la carpeta del proyecto
     3. Secrets de Streamlit
+    Retorna (credenciales, encontradas)
     """
+    from google.oauth2 import service_account
+
+    # Opción 1: Variable de entorno
+    if os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
+        return None, True
+
+    # Opción 2: Archivo local
+    credentials_path = Path('credentials.json')
+    if credentials_path.exists():
+        return service_account.Credentials.from_service_account_file(str(credentials_path.absolute())), True
+
+    # Opción 3: Streamlit secrets
     try:
-        from google.cloud import vision
-        
-        # Opción 1: Variable de entorno
-        if os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
-            return vision.ImageAnnotatorClient()
-        
-        # Opción 2: Archivo local
-        credentials_path = Path('credentials.json')
-        if credentials_path.exists():
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = str(credentials_path.absolute())
-            return vision.ImageAnnotatorClient()
-        
-        # Opción 3: Streamlit secrets
-        if hasattr(st, 'secrets') and 'google_credentials' in st.secrets:
-            creds_dict = st.secrets['google_credentials']
-            with open('temp_credentials.json', 'w') as f:
-                json.dump(creds_dict, f)
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.path.abspath('temp_credentials.json')
-            return vision.ImageAnnotatorClient()
-        
-        return None
-    
-    except ImportError:
-        st.error("❌ Instala: pip install google-cloud-vision")
-        return None
-    except Exception as e:
-        st.error(f"❌ Error al configurar Google Vision: {str(e)}")
+        st = _streamlit()
+        if st is not None and 'google_credentials' in st.secrets:
+            return service_account.Credentials.from_service_account_info(dict(st.secrets['google_credentials'])), True
+    except Exception:
+        pass
+
+    # Servidor de prueba: no requiere credenciales
+    if ENDPOINT_VISION:
+        from google.auth.credentials import AnonymousCredentials
+        return AnonymousCredentials(), True
+
+    return None, False
+
+
+def obtener_cliente_vision():
+    """
+    Obtiene el cliente de Google Vision (uno solo por proceso)
+    """
+    global _CLIENTE
+    if _CLIENTE is not None:
+        return _CLIENTE
+
+    with _CLIENTE_LOCK:
+        if _CLIENTE is not None:
+            return _CLIENTE
+        try:
+            from google.cloud import vision
+
+            credenciales, encontradas = _credenciales()
+            if not encontradas:
+                return None
+
+            opciones = {}
+            if ENDPOINT_VISION:
+                opciones['client_options'] = {'api_endpoint': ENDPOINT_VISION}
+                if ENDPOINT_VISION.startswith('http://'):
+                    opciones['transport'] = 'rest'
+            if credenciales is not None:
+                opciones['credentials'] = credenciales
+
+            _CLIENTE = vision.ImageAnnotatorClient(**opciones)
+            return _CLIENTE
+
+        except ImportError:
+            _avisar_error("❌ Instala: pip install google-cloud-vision")
+            return None
+        except Exception as e:
+            _avisar_error(f"❌ Error al configurar Google Vision: {str(e)}")
+            return None
+
+
+def reiniciar_cliente():
+    """Descarta el cliente actual (p. ej. si cambiaron las credenciales)"""
+    global _CLIENTE
+    with _CLIENTE_LOCK:
+        _CLIENTE = None
+
+
+def _pool_solicitudes():
+    global _POOL
+    with _CLIENTE_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=MAX_SOLICITUDES_CONCURRENTES, thread_name_prefix='vision')
+        return _POOL
+
+
+def _cache_respuestas():
+    """Caché de textos por hash de imagen (SQLite, compartida entre procesos)"""
+    global _CACHE
+    if _CACHE is None:
+        try:
+            _CACHE = CacheExtraccion(RUTA_CACHE_VISION)
+        except Exception as e:
+            print(f"⚠️ Caché de Google Vision no disponible: {e}")
+            _CACHE = False
+    return _CACHE or None
+
+
+def _politica_reintentos():
+    from google.api_core import exceptions, retry
+
+    return retry.Retry(
+        predicate=retry.if_exception_type(
+            exceptions.TooManyRequests,
+            exceptions.ServiceUnavailable,
+            exceptions.InternalServerError,
+            exceptions.DeadlineExceeded,
+        ),
+        initial=ESPERA_INICIAL,
+        maximum=ESPERA_MAXIMA,
+        multiplier=2.0,
+        timeout=TIEMPO_MAXIMO_REINTENTOS,
+    )
+
+
+def _a_bytes(imagen):
+    """Imagen PIL (o bytes ya codificados) a bytes PNG"""
+    if isinstance(imagen, (bytes, bytearray)):
+        return bytes(imagen)
+    buffer = io.BytesIO()
+    imagen.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _texto_respuesta(respuesta):
+    if respuesta.error.message:
+        print(f"⚠️ Google Vision: {respuesta.error.message}")
         return None
+    if respuesta.full_text_annotation.text:
+        return respuesta.full_text_annotation.text
+    if respuesta.text_annotations:
+        return respuesta.text_annotations[0].description
+    return ""
+
+
+def _anotar_lote(cliente, contenidos):
+    """Una solicitud batch_annotate_images para hasta MAX_IMAGENES_POR_LOTE imágenes"""
+    from google.cloud import vision
+
+    feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+    solicitudes = [
+        vision.AnnotateImageRequest(image=vision.Image(content=contenido), features=[feature])
+        for contenido in contenidos
+    ]
+    respuesta = cliente.batch_annotate_images(requests=solicitudes, retry=_politica_reintentos())
+    return [_texto_respuesta(r) for r in respuesta.responses]
+
+
+def extraer_textos_google_vision(imagenes):
+    """
+    Texto de varias imágenes con Google Vision
+
+    Las imágenes repetidas (mismo hash) o ya consultadas antes se responden
+    desde la caché; el resto se envía en lotes, varios a la vez.
+
+    Args:
+        imagenes: Lista de imágenes PIL (o bytes PNG/JPG)
+
+    Returns:
+        list: Texto de cada imagen (None si no se obtuvo o tiene 10 caracteres o menos)
+    """
+    cliente = obtener_cliente_vision()
+    if not cliente:
+        return [None] * len(imagenes)
+
+    cache = _cache_respuestas()
+    contenidos = [_a_bytes(imagen) for imagen in imagenes]
+    hashes = [f"{hashlib.sha256(c).hexdigest()}:{VERSION_RESPUESTA}" for c in contenidos]
+
+    textos = {}
+    faltantes = {}
+    for clave, contenido in zip(hashes, contenidos):
+        if clave in textos or clave in faltantes:
+            continue
+        guardado = cache.obtener(clave) if cache else None
+        if guardado is not None:
+            textos[clave] = guardado
+        else:
+            faltantes[clave] = contenido
+
+    claves = list(faltantes)
+    lotes = [claves[i:i + MAX_IMAGENES_POR_LOTE] for i in range(0, len(claves), MAX_IMAGENES_POR_LOTE)]
+    futuros = [
+        (lote, _pool_solicitudes().submit(_anotar_lote, cliente, [faltantes[c] for c in lote]))
+        for lote in lotes
+    ]
+    for lote, futuro in futuros:
+        try:
+            for clave, texto in zip(lote, futuro.result()):
+                textos[clave] = texto
+                if cache and texto is not None:
+                    cache.guardar(clave, texto)
+        except Exception as e:
+            print(f"⚠️ Error en Google Vision: {e}")
+
+    resultado = []
+    for clave in hashes:
+        texto = textos.get(clave)
+        resultado.append(texto if texto and len(texto.strip()) > 10 else None)
+    return resultado
 
 
 def extraer_texto_google_vision_simple(imagen_pil):
     """
     Versión simplificada para imágenes PIL
-    
+
     Args:
         imagen_pil: Imagen PIL
-    
+
     Returns:
         str: Texto extraído
     """
     try:
-        from google.cloud import vision
-        import io
-        
-        cliente = obtener_cliente_vision()
-        if not cliente:
-            return None
-        
-        # Convertir PIL a bytes
-        buffer = io.BytesIO()
-        imagen_pil.save(buffer, format='PNG')
-        imagen_bytes = buffer.getvalue()
-        
-        # Usar Google Vision
-        image = vision.Image(content=imagen_bytes)
-        
-        request = vision.AnnotateImageRequest(
-            image=image,
-            features=[
-                vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
-            ]
-        )
-        
-        response = cliente.annotate_image(request)
-        
-        # Extraer texto
-        if response.text_annotations:
-            texto = response.text_annotations[0].description
-            return texto if len(texto.strip()) > 10 else None
-        
-        return None
-    
+        return extraer_textos_google_vision([imagen_pil])[0]
     except Exception as e:
         return None
 
@@ -96,20 +278,20 @@ def extraer_texto_google_vision_simple(imagen_pil):
 def verificar_credenciales():
     """
     Verifica si las credenciales de Google están configuradas
-    
+
     Returns:
         bool: True si están configuradas
     """
     try:
         from google.cloud import vision
-        
+
         # Intentar crear cliente
         cliente = obtener_cliente_vision()
-        
+
         if cliente:
             return True
-        
+
         return False
-    
+
     except:
         return False
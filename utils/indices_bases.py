@@ -0,0 +1,218 @@
+"""
+Índices en memoria sobre las bases REDIRECCIONAMIENTO/PRESUNTA
+Se construyen una vez por DataFrame y se reutilizan en todas las búsquedas
+"""
+import itertools
+import re
+import unicodedata
+import weakref
+from collections import defaultdict
+
+import numpy as np
+
+
+_SERIES = itertools.count(1)
+
+
+class IndiceBase:
+    """
+    Índice hash DOCUMENTO|PERIODO → rango de filas
+
+    Las filas se ordenan (de forma estable) por la clave una sola vez; cada
+    clave apunta a un rango contiguo [inicio, fin) de las columnas ordenadas,
+    así el costo de una búsqueda no depende del tamaño de la base. También
+    guarda los nombres de afiliados ya normalizados (ver normalizar_nombre)
+    con su índice de trigramas, y un índice secundario CUSSP → filas para
+    consultar el historial de un afiliado en todos los periodos y empleadores.
+    Todo se construye junto, al cargar la base (o su snapshot), para que
+    ninguna consulta pague el costo de construirlo.
+    """
+
+    __slots__ = ('serie', 'rangos', 'claves', 'cussp', 'afiliado', 'nombre_norm',
+                 'indice_nombres', 'orden_cussp', 'rangos_cussp', '__weakref__')
+
+    def __init__(self, df):
+        # Número único por índice (no se reutiliza aunque el DataFrame se libere)
+        self.serie = next(_SERIES)
+
+        claves = df['_doc_per'].to_numpy(dtype=object)
+        cussp = df['CUSSP'].to_numpy(dtype=object)
+        afiliado = df['AFILIADO'].to_numpy(dtype=object)
+        if '_afiliado_norm' in df.columns:
+            nombre_norm = df['_afiliado_norm'].to_numpy(dtype=object)
+        else:
+            nombre_norm = normalizar_nombres(df['AFILIADO']).to_numpy(dtype=object)
+
+        if len(claves) and not df['_doc_per'].is_monotonic_increasing:
+            orden = np.argsort(claves, kind='stable')
+            claves, cussp, afiliado, nombre_norm = claves[orden], cussp[orden], afiliado[orden], nombre_norm[orden]
+
+        self.claves = claves
+        self.cussp = cussp
+        self.afiliado = afiliado
+        self.nombre_norm = nombre_norm
+        self.rangos = _rangos_contiguos(claves)
+        self.indice_nombres = IndiceNombres(nombre_norm)
+
+        # Índice secundario: filas ordenadas por CUSSP, cada CUSSP con su rango
+        self.orden_cussp = np.argsort(cussp, kind='stable') if len(cussp) else np.empty(0, dtype=np.intp)
+        self.rangos_cussp = _rangos_contiguos(cussp[self.orden_cussp])
+
+    def posiciones(self, clave, cussp=""):
+        """Posiciones (en las columnas ordenadas) de las filas de `clave`, filtradas por CUSSP"""
+        rango = self.rangos.get(clave)
+        if rango is None:
+            return []
+        posiciones = range(*rango)
+        if cussp:
+            return [i for i in posiciones if self.cussp[i] == cussp]
+        return posiciones
+
+    def posiciones_cussp(self, cussp):
+        """Posiciones de todas las filas de un CUSSP (en cualquier periodo o documento)"""
+        rango = self.rangos_cussp.get(cussp)
+        if rango is None:
+            return []
+        return self.orden_cussp[rango[0]:rango[1]].tolist()
+
+
+def _rangos_contiguos(valores):
+    """Para un arreglo ordenado, retorna {valor: (inicio, fin)} de cada tramo de valores iguales"""
+    total = len(valores)
+    if not total:
+        return {}
+    cambios = np.flatnonzero(valores[1:] != valores[:-1]) + 1
+    inicios = np.concatenate(([0], cambios))
+    fines = np.concatenate((cambios, [total]))
+    return dict(zip(valores[inicios].tolist(), zip(inicios.tolist(), fines.tolist())))
+
+
+# id(DataFrame) → índice; la entrada se elimina cuando el DataFrame se libera
+_INDICES = {}
+
+
+def obtener_indice(df):
+    """Retorna (construyendo si hace falta) el IndiceBase de un DataFrame de base"""
+    clave = id(df)
+    indice = _INDICES.get(clave)
+    if indice is None:
+        indice = IndiceBase(df)
+        _INDICES[clave] = indice
+        weakref.finalize(df, _INDICES.pop, clave, None)
+    return indice
+
+
+# ==================== Nombres de afiliados ====================
+
+_NO_ALFANUMERICO = re.compile(r'[^A-Z0-9 ]+')
+
+
+def normalizar_nombre(nombre):
+    """
+    Normaliza un nombre para compararlo: sin tildes, sin puntuación,
+    en mayúsculas y con los tokens ordenados ("Pérez, José" -> "JOSE PEREZ")
+    """
+    if not nombre:
+        return ""
+    texto = unicodedata.normalize('NFKD', str(nombre))
+    texto = texto.encode('ascii', 'ignore').decode('ascii').upper()
+    texto = _NO_ALFANUMERICO.sub(' ', texto)
+    return ' '.join(sorted(texto.split()))
+
+
+def normalizar_nombres(serie):
+    """Versión vectorizada de normalizar_nombre para una columna completa"""
+    import pandas as pd
+
+    serie = pd.Series(serie, copy=False).fillna('').astype(str)
+    # Normalizar solo los nombres distintos y luego mapear a todas las filas
+    unicos = pd.Series(serie.unique())
+    limpios = (
+        unicos.str.normalize('NFKD')
+        .str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.upper()
+        .str.replace(_NO_ALFANUMERICO.pattern, ' ', regex=True)
+        .str.split()
+        .map(lambda tokens: ' '.join(sorted(tokens)))
+    )
+    return serie.map(dict(zip(unicos, limpios)))
+
+
+def trigramas(nombre_normalizado):
+    """Conjunto de trigramas de caracteres de un nombre normalizado"""
+    texto = f"  {nombre_normalizado} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def similitud_trigramas(trigramas_a, trigramas_b):
+    """Coeficiente de Dice entre dos conjuntos de trigramas (0-1)"""
+    if not trigramas_a or not trigramas_b:
+        return 0.0
+    return 2 * len(trigramas_a & trigramas_b) / (len(trigramas_a) + len(trigramas_b))
+
+
+class IndiceNombres:
+    """
+    Índice invertido de trigramas sobre los nombres normalizados de una base
+
+    Cada nombre distinto se indexa una sola vez. Una consulta cuenta los
+    trigramas compartidos con las listas de los trigramas menos frecuentes,
+    y solo los mejores candidatos se puntúan de forma exacta.
+    """
+
+    # Máximo de entradas de listas invertidas que se cuentan por consulta
+    MAX_POSTINGS = 20_000
+    # Candidatos que se puntúan de forma exacta
+    MAX_CANDIDATOS = 32
+
+    def __init__(self, nombres_normalizados):
+        nombres = np.asarray(nombres_normalizados, dtype=object)
+        self.nombres, self.fila_nombre = np.unique(nombres, return_inverse=True)
+
+        postings = defaultdict(list)
+        for id_nombre, nombre in enumerate(self.nombres.tolist()):
+            for trigrama in trigramas(nombre):
+                postings[trigrama].append(id_nombre)
+        self.postings = {trigrama: np.asarray(ids, dtype=np.int32) for trigrama, ids in postings.items()}
+
+        # Primera fila (en el orden del índice) de cada nombre distinto y cuántas filas tiene
+        orden = np.argsort(self.fila_nombre, kind='stable')
+        ids_ordenados = self.fila_nombre[orden]
+        inicios = np.flatnonzero(np.concatenate(([True], ids_ordenados[1:] != ids_ordenados[:-1])))
+        self.primera_fila = orden[inicios]
+        self.filas_por_nombre = np.diff(np.concatenate((inicios, [len(orden)])))
+
+    def buscar(self, nombre, k=5):
+        """
+        Retorna hasta `k` tuplas (id_nombre, similitud) ordenadas por similitud
+
+        `nombre` puede venir sin normalizar.
+        """
+        consulta = normalizar_nombre(nombre)
+        trigramas_consulta = trigramas(consulta)
+        listas = [self.postings[t] for t in trigramas_consulta if t in self.postings]
+        if not listas:
+            return []
+
+        # Usar primero los trigramas más raros hasta el límite de entradas
+        listas.sort(key=len)
+        usadas = []
+        total = 0
+        for lista in listas:
+            if usadas and total + len(lista) > self.MAX_POSTINGS:
+                break
+            usadas.append(lista)
+            total += len(lista)
+
+        ids, conteos = np.unique(np.concatenate(usadas), return_counts=True)
+        if len(ids) > self.MAX_CANDIDATOS:
+            mejores = np.argpartition(conteos, -self.MAX_CANDIDATOS)[-self.MAX_CANDIDATOS:]
+            ids = ids[mejores]
+
+        puntuados = [
+            (int(id_nombre), similitud_trigramas(trigramas_consulta, trigramas(self.nombres[id_nombre])))
+            for id_nombre in ids
+        ]
+        puntuados.sort(key=lambda par: (-par[1], self.nombres[par[0]]))
+        return puntuados[:k]
+
@@ -0,0 +1,259 @@
+"""
+Procesamiento por lotes de planillas PDF (sin Streamlit)
+Ejecuta la misma ruta de extracción de la app sobre una carpeta usando todos los núcleos
+
+Uso:
+    lector-planillas-lote CARPETA -o resultado.xlsx --workers 8
+    lector-planillas-lote descargas.zip -o resultado.csv
+"""
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from utils.cache_extraccion import CacheExtraccion, RUTA_CACHE_DEFECTO
+from utils.fuentes import FuentePdf, listar_fuentes
+from utils.metricas import Medicion, activar, emitir, resumen_documento
+from utils.modelo_planillas import TablaPlanillas
+from utils.procesador_planillas import (
+    VERSION_EXTRACTOR,
+    completar_con_bases,
+    construir_resultado,
+    es_cacheable,
+    extraer_datos_planilla,
+)
+
+
+# Estado por proceso worker (se inicializa una sola vez por proceso)
+_CACHE = None
+_PERFILAR = False
+
+
+def _inicializar_worker(ruta_cache=None, perfilar=False):
+    """Configura el proceso worker (abre su propia conexión a la caché)"""
+    global _CACHE, _PERFILAR
+    _CACHE = CacheExtraccion(ruta_cache) if ruta_cache else None
+    _PERFILAR = perfilar
+
+
+def _extraer_ruta(ruta):
+    """
+    Lee un PDF (ruta o FuentePdf) y extrae sus datos (se ejecuta dentro del worker)
+
+    Returns:
+        (nombre, datos, error, métricas de Medicion.como_dict, desde_cache)
+    """
+    fuente = ruta if isinstance(ruta, FuentePdf) else FuentePdf(os.path.basename(ruta), ruta=ruta)
+    nombre = fuente.nombre
+    medicion = Medicion(nombre)
+    datos = None
+    try:
+        with activar(medicion):
+            # Los miembros de un ZIP se descomprimen aquí, uno a la vez
+            with medicion.tramo('leer'):
+                pdf_content = fuente.leer()
+
+            if _CACHE is not None:
+                with medicion.tramo('cache'):
+                    clave_cache = _CACHE.clave(pdf_content, VERSION_EXTRACTOR)
+                    datos = _CACHE.obtener(clave_cache)
+            desde_cache = datos is not None
+
+            if datos is None:
+                with medicion.tramo('extraccion'):
+                    if _PERFILAR:
+                        datos = medicion.perfilar(extraer_datos_planilla, pdf_content)
+                    else:
+                        datos = extraer_datos_planilla(pdf_content)
+                if _CACHE is not None and es_cacheable(datos):
+                    _CACHE.guardar(clave_cache, datos)
+
+        return nombre, datos, None, medicion.como_dict(), desde_cache
+    except Exception as e:
+        return nombre, None, str(e), medicion.como_dict(), False
+
+
+class _BasesPerezosas:
+    """Carga las bases locales una sola vez, solo si algún PDF llega al fallback"""
+
+    def __init__(self):
+        self.bases = None
+
+    def __call__(self):
+        if self.bases is None:
+            try:
+                from utils.validador_base_local import cargar_bases_locales
+                self.bases = cargar_bases_locales()
+            except Exception as e:
+                print(f"⚠️ No se pudieron cargar las bases locales: {e}", file=sys.stderr)
+                self.bases = {}
+        return self.bases
+
+
+def _registrar(resultado, verbose):
+    """Imprime los mensajes de un archivo procesado"""
+    for tipo, mensaje in resultado['mensajes']:
+        if verbose or tipo in ('warning', 'error'):
+            print(mensaje, file=sys.stderr)
+
+
+def procesar_lote(rutas, workers=None, usar_bases=True, ruta_cache=None, verbose=False,
+                  destino_metricas=None, perfilar=False):
+    """
+    Procesa una lista de PDFs en paralelo con un pool de procesos
+
+    La extracción corre en los workers; la consulta a las bases locales
+    (fallback) se hace en el proceso principal, que las carga una sola vez y
+    resuelve los PDFs sin afiliados de todo el lote en una sola búsqueda.
+
+    Args:
+        rutas: Lista de rutas a PDFs o de FuentePdf (p. ej. miembros de un ZIP)
+        workers: Número de procesos (por defecto, todos los núcleos)
+        usar_bases: Si se consulta la base local en el fallback
+        ruta_cache: Ruta de la caché de extracciones (None para no usarla)
+        verbose: Imprimir mensajes por archivo
+        destino_metricas: Archivo .jsonl (o '-' para stderr) donde se escribe una
+            línea de métricas por documento (por defecto LECTOR_METRICAS)
+        perfilar: Perfilar la extracción de cada documento con cProfile
+
+    Returns:
+        TablaPlanillas: Resultado en el mismo orden de `rutas`
+    """
+    workers = workers or os.cpu_count() or 1
+    tabla = TablaPlanillas()
+
+    if not rutas:
+        return tabla
+
+    buscar = None
+    if usar_bases:
+        try:
+            from utils.validador_base_local import buscar_en_base as buscar
+        except ImportError:
+            buscar = None
+    obtener_bases = _BasesPerezosas() if buscar else None
+
+    def construir(extraido):
+        nombre, datos, error, metricas, desde_cache = extraido
+        medicion = Medicion(nombre)
+        medicion.incorporar(metricas)
+        try:
+            if error is not None:
+                return {'archivo': nombre, 'tabla': None, 'mensajes': [('error', f"❌ Error procesando {nombre}: {error}")]}
+            try:
+                with activar(medicion), medicion.tramo('construir_resultado'):
+                    return construir_resultado(nombre, datos, obtener_bases, buscar, diferir_bases=True)
+            except Exception as e:
+                return {'archivo': nombre, 'tabla': None, 'mensajes': [('error', f"❌ Error procesando {nombre}: {str(e)}")]}
+        finally:
+            emitir(resumen_documento(medicion, datos, desde_cache), destino_metricas)
+
+    if workers == 1:
+        _inicializar_worker(ruta_cache, perfilar)
+        resultados = [construir(extraido) for extraido in map(_extraer_ruta, rutas)]
+    else:
+        # Lotes grandes por worker para reducir el costo de comunicación entre procesos
+        chunksize = max(1, len(rutas) // (workers * 4))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker,
+                                 initargs=(ruta_cache, perfilar)) as executor:
+            # executor.map conserva el orden de entrada
+            resultados = [construir(extraido)
+                          for extraido in executor.map(_extraer_ruta, rutas, chunksize=chunksize)]
+
+    # Caso 2b de todo el lote en una sola búsqueda en las bases
+    completar_con_bases(resultados, obtener_bases)
+
+    for resultado in resultados:
+        _registrar(resultado, verbose)
+        if resultado['tabla'] is not None:
+            tabla.extender(resultado['tabla'])
+    return tabla
+
+
+def guardar_resultado(tabla, salida):
+    """Guarda el resultado en CSV, Parquet o XLSX según la extensión de `salida`"""
+    df = tabla.a_dataframe()
+    extension = Path(salida).suffix.lower()
+
+    if extension == '.csv':
+        from utils.exportadores import escribir_csv
+        escribir_csv(df, salida)
+    elif extension == '.parquet':
+        from utils.exportadores import escribir_parquet
+        escribir_parquet(df, salida)
+    elif extension == '.xlsx':
+        from utils.excel_generator import escribir_excel, ordenar_columnas
+        escribir_excel(ordenar_columnas(df), salida)
+    else:
+        raise ValueError(f"Formato de salida no soportado: {extension} (use .csv, .parquet o .xlsx)")
+
+    return df
+
+
+def main(argv=None):
+    """Punto de entrada de consola"""
+    parser = argparse.ArgumentParser(
+        prog='lector-planillas-lote',
+        description='Extrae datos de planillas PDF de carpetas o ZIPs usando todos los núcleos'
+    )
+    parser.add_argument('carpeta', nargs='+',
+                        help='Carpeta, ZIP o PDF de planillas (se aceptan varios)')
+    parser.add_argument('-o', '--salida', default='PLANTILLA_PAGOS_REDIRECCIONAMIENTO.xlsx',
+                        help='Archivo de salida (.csv, .parquet o .xlsx)')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Número de procesos (por defecto: todos los núcleos)')
+    parser.add_argument('-r', '--recursivo', action='store_true',
+                        help='Buscar PDFs también en subcarpetas')
+    parser.add_argument('--sin-bases', action='store_true',
+                        help='No consultar las bases locales en el fallback')
+    parser.add_argument('--cache', default=RUTA_CACHE_DEFECTO,
+                        help='Ruta de la caché de extracciones (SQLite)')
+    parser.add_argument('--sin-cache', action='store_true',
+                        help='No usar la caché de extracciones')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Mostrar mensajes de cada archivo')
+    parser.add_argument('--metricas', default=None,
+                        help="Archivo .jsonl con los tiempos por etapa de cada documento ('-' para stderr)")
+    parser.add_argument('--perfil', action='store_true',
+                        help='Perfilar la extracción de cada documento con cProfile (va en las métricas)')
+    args = parser.parse_args(argv)
+
+    try:
+        rutas = listar_fuentes(args.carpeta, recursivo=args.recursivo)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    if not rutas:
+        print(f"❌ No se encontraron PDFs en {', '.join(args.carpeta)}", file=sys.stderr)
+        return 1
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"🔄 Procesando {len(rutas)} PDF(s) con {workers} proceso(s)...", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    tabla = procesar_lote(
+        rutas,
+        workers=workers,
+        usar_bases=not args.sin_bases,
+        ruta_cache=None if args.sin_cache else args.cache,
+        verbose=args.verbose,
+        destino_metricas=args.metricas,
+        perfilar=args.perfil
+    )
+    duracion = time.perf_counter() - inicio
+
+    if not len(tabla):
+        print("❌ No se pudo extraer datos de los archivos", file=sys.stderr)
+        return 1
+
+    guardar_resultado(tabla, args.salida)
+    print(f"✅ {len(tabla)} fila(s) de {len(rutas)} PDF(s) en {duracion:.1f}s → {args.salida}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
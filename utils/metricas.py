@@ -0,0 +1,210 @@
+"""
+Métricas de tiempo por documento
+Tramos livianos (perf_counter) alrededor de cada etapa de la ruta de un PDF:
+se muestran en el debug de la app y se emiten como una línea JSON por documento
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+
+# Destino de las líneas JSON: ruta de un archivo .jsonl o '-' para stderr (sin definir, no se emiten)
+DESTINO_METRICAS = os.environ.get('LECTOR_METRICAS')
+
+# Funciones que se reportan del perfil de cProfile (las de mayor tiempo propio)
+FUNCIONES_PERFIL = 15
+
+_SEPARADOR = '/'
+
+
+class Medicion:
+    """
+    Tramos de tiempo de un documento
+
+    Los tramos anidados se registran como 'padre/hijo'; un tramo que se
+    repite (p. ej. una vez por página) acumula su tiempo y cuenta las veces.
+    """
+
+    __slots__ = ('documento', 'inicio', 'tramos', 'perfil', '_pila')
+
+    def __init__(self, documento=None):
+        self.documento = documento
+        self.inicio = time.time()
+        # etapa -> [segundos, veces] (en orden de aparición)
+        self.tramos = {}
+        self.perfil = None
+        self._pila = []
+
+    def _nombre(self, etapa):
+        return _SEPARADOR.join(self._pila + [etapa])
+
+    def agregar(self, etapa, segundos, veces=1):
+        """Suma un tiempo medido por fuera (p. ej. el de un backend) dentro del tramo actual"""
+        tramo = self.tramos.setdefault(self._nombre(etapa), [0.0, 0])
+        tramo[0] += segundos
+        tramo[1] += veces
+
+    @contextmanager
+    def tramo(self, etapa):
+        # El tramo padre se registra antes que sus hijos (orden de lectura)
+        tramo = self.tramos.setdefault(self._nombre(etapa), [0.0, 0])
+        self._pila.append(etapa)
+        inicio = time.perf_counter()
+        try:
+            yield self
+        finally:
+            tramo[0] += time.perf_counter() - inicio
+            tramo[1] += 1
+            self._pila.pop()
+
+    def perfilar(self, funcion, *args, **kwargs):
+        """Ejecuta `funcion` con cProfile y guarda sus funciones más costosas"""
+        import cProfile
+
+        perfil = cProfile.Profile()
+        try:
+            return perfil.runcall(funcion, *args, **kwargs)
+        finally:
+            self.perfil = funciones_costosas(perfil)
+
+    def incorporar(self, otra):
+        """Agrega los tramos (y el perfil) de una medición hecha en otro proceso (ver como_dict)"""
+        for tramo in otra.get('tramos', []):
+            nombre = _SEPARADOR.join(self._pila + [tramo['etapa']])
+            actual = self.tramos.setdefault(nombre, [0.0, 0])
+            actual[0] += tramo['segundos']
+            actual[1] += tramo['veces']
+        if otra.get('perfil'):
+            self.perfil = otra['perfil']
+
+    def total(self):
+        """Segundos de los tramos de primer nivel (los anidados ya están incluidos en ellos)"""
+        return sum(segundos for nombre, (segundos, _) in self.tramos.items() if _SEPARADOR not in nombre)
+
+    def como_dict(self):
+        """Tramos y perfil serializables a JSON (para enviarlos entre procesos)"""
+        return {
+            'documento': self.documento,
+            'tramos': [
+                {'etapa': nombre, 'segundos': round(segundos, 6), 'veces': veces}
+                for nombre, (segundos, veces) in self.tramos.items()
+            ],
+            'perfil': self.perfil,
+        }
+
+
+def funciones_costosas(perfil, limite=FUNCIONES_PERFIL):
+    """Funciones de un cProfile.Profile ordenadas por tiempo propio"""
+    import pstats
+
+    estadisticas = pstats.Stats(perfil)
+    funciones = []
+    for (archivo, linea, nombre), (_, llamadas, propio, acumulado, _) in estadisticas.stats.items():
+        funciones.append({
+            'funcion': f"{os.path.basename(archivo)}:{linea}({nombre})",
+            'llamadas': llamadas,
+            'segundos_propios': round(propio, 6),
+            'segundos_acumulados': round(acumulado, 6),
+        })
+    funciones.sort(key=lambda f: f['segundos_propios'], reverse=True)
+    return funciones[:limite]
+
+
+# ==================== Medición activa ====================
+
+_LOCAL = threading.local()
+
+
+def medicion_actual():
+    """Medición del documento que se procesa en este hilo (None si no se está midiendo)"""
+    return getattr(_LOCAL, 'medicion', None)
+
+
+@contextmanager
+def activar(medicion):
+    """Hace que los tramos de este hilo se registren en `medicion`"""
+    anterior = medicion_actual()
+    _LOCAL.medicion = medicion
+    try:
+        yield medicion
+    finally:
+        _LOCAL.medicion = anterior
+
+
+def tramo(etapa):
+    """Tramo en la medición activa (sin costo si no hay ninguna)"""
+    medicion = medicion_actual()
+    return medicion.tramo(etapa) if medicion is not None else nullcontext()
+
+
+def agregar_tramo(etapa, segundos, veces=1):
+    """Suma un tiempo medido por fuera a la medición activa, si la hay"""
+    medicion = medicion_actual()
+    if medicion is not None:
+        medicion.agregar(etapa, segundos, veces)
+
+
+def ejecutar_medido(funcion, *args, etapa='extraccion', perfilar=False, **kwargs):
+    """
+    Ejecuta `funcion` midiendo sus tramos (pensado para correr en un worker)
+
+    Returns:
+        (resultado, dict de Medicion.como_dict) para incorporar en el proceso principal
+    """
+    medicion = Medicion()
+    with activar(medicion), medicion.tramo(etapa):
+        if perfilar:
+            resultado = medicion.perfilar(funcion, *args, **kwargs)
+        else:
+            resultado = funcion(*args, **kwargs)
+    return resultado, medicion.como_dict()
+
+
+# ==================== Registro por documento ====================
+
+def resumen_documento(medicion, datos=None, desde_cache=False):
+    """
+    Registro de un documento: tramos, total, backend usado y resultado del triaje
+
+    Returns:
+        dict serializable a JSON (una línea por documento al emitirlo)
+    """
+    datos = datos or {}
+    extraccion = datos.get('extraccion') or {}
+    triaje = datos.get('triaje') or {}
+    registro = {
+        'documento': medicion.documento,
+        'inicio': datetime.fromtimestamp(medicion.inicio, timezone.utc).isoformat(timespec='milliseconds'),
+        'total_segundos': round(medicion.total(), 6),
+        'desde_cache': desde_cache,
+        'triaje': triaje.get('tipo'),
+        'backend': extraccion.get('backend'),
+        'intentos': extraccion.get('intentos', []),
+        'afiliados': len(datos.get('afiliados') or []),
+    }
+    registro.update(medicion.como_dict())
+    return registro
+
+
+_LOCK_EMISION = threading.Lock()
+
+
+def emitir(registro, destino=None):
+    """Escribe el registro como una línea JSON en `destino` (o LECTOR_METRICAS)"""
+    destino = destino or DESTINO_METRICAS
+    if not destino:
+        return
+    linea = json.dumps(registro, ensure_ascii=False)
+    try:
+        with _LOCK_EMISION:
+            if destino == '-':
+                print(linea, file=sys.stderr, flush=True)
+            else:
+                with open(destino, 'a', encoding='utf-8') as f:
+                    f.write(linea + "\n")
+    except OSError as e:
+        print(f"⚠️ No se pudieron escribir las métricas en {destino}: {e}")
@@ -0,0 +1,119 @@
+"""
+Modelo de datos normalizado de planillas
+Una tabla de cabeceras (una fila por planilla) y una tabla columnar de afiliados;
+solo se combinan al exportar
+"""
+
+
+# Orden de columnas del resultado (igual al de las filas planas históricas)
+COLUMNAS_CABECERA = ["Archivo", "RUC", "RAZON_SOCIAL", "PERIODO", "FECHA_PAGO", "N_PLANILLA", "MONTO"]
+COLUMNAS_AFILIADO = ["MONTO_AFILIADO", "OBSERVACION", "CUSSP", "AFILIADO"]
+COLUMNAS_RESULTADO = COLUMNAS_CABECERA + COLUMNAS_AFILIADO
+
+
+class CabeceraPlanilla:
+    """Datos generales de una planilla (compartidos por todos sus afiliados)"""
+
+    __slots__ = ('archivo', 'ruc', 'razon_social', 'periodo', 'fecha_pago', 'n_planilla', 'monto')
+
+    def __init__(self, archivo, ruc, razon_social, periodo, fecha_pago, n_planilla, monto):
+        self.archivo = archivo
+        self.ruc = ruc
+        self.razon_social = razon_social
+        self.periodo = periodo
+        self.fecha_pago = fecha_pago
+        self.n_planilla = n_planilla
+        self.monto = monto
+
+    def como_tupla(self):
+        return (self.archivo, self.ruc, self.razon_social, self.periodo,
+                self.fecha_pago, self.n_planilla, self.monto)
+
+
+class TablaPlanillas:
+    """
+    Resultado de una o varias planillas en forma normalizada
+
+    Las cabeceras se guardan una sola vez y los afiliados en columnas
+    (listas paralelas) que referencian su cabecera por posición, en lugar
+    de copiar todos los campos de la cabecera en cada fila.
+    """
+
+    __slots__ = ('cabeceras', 'id_cabecera', 'cussp', 'afiliado', 'observacion', 'monto')
+
+    def __init__(self):
+        self.cabeceras = []
+        self.id_cabecera = []
+        self.cussp = []
+        self.afiliado = []
+        self.observacion = []
+        # MONTO de cada afiliado (None si la planilla solo trae el total)
+        self.monto = []
+
+    def __len__(self):
+        """Número de filas del resultado (una por afiliado)"""
+        return len(self.id_cabecera)
+
+    def agregar_cabecera(self, cabecera):
+        """Agrega una cabecera y retorna su identificador"""
+        self.cabeceras.append(cabecera)
+        return len(self.cabeceras) - 1
+
+    def agregar_afiliado(self, id_cabecera, cussp, afiliado, observacion="", monto=None):
+        """Agrega una fila de afiliado asociada a una cabecera"""
+        self.id_cabecera.append(id_cabecera)
+        self.cussp.append(cussp)
+        self.afiliado.append(afiliado)
+        self.observacion.append(observacion)
+        self.monto.append(monto)
+
+    def extender(self, otra):
+        """Agrega al final las planillas de otra tabla (conserva el orden)"""
+        desplazamiento = len(self.cabeceras)
+        self.cabeceras.extend(otra.cabeceras)
+        self.id_cabecera.extend(i + desplazamiento for i in otra.id_cabecera)
+        self.cussp.extend(otra.cussp)
+        self.afiliado.extend(otra.afiliado)
+        self.observacion.extend(otra.observacion)
+        self.monto.extend(otra.monto)
+
+    @classmethod
+    def concatenar(cls, tablas):
+        """Combina varias tablas en una sola, en el orden dado"""
+        combinada = cls()
+        for tabla in tablas:
+            if tabla is not None:
+                combinada.extender(tabla)
+        return combinada
+
+    def a_dataframe(self):
+        """
+        Combina cabeceras y afiliados en un DataFrame con una fila por afiliado
+
+        MONTO es el total de la planilla (Fondo Pensiones + Retenciones) y se
+        deja solo en su primera fila (0.0 en las demás), de modo que la suma
+        de la columna sigue siendo el total. MONTO_AFILIADO es el aporte de
+        cada afiliado si la planilla lo trae (vacío si no).
+        """
+        import numpy as np
+        import pandas as pd
+
+        if not self.id_cabecera:
+            return pd.DataFrame(columns=COLUMNAS_RESULTADO)
+
+        cabeceras = pd.DataFrame.from_records(
+            [cabecera.como_tupla() for cabecera in self.cabeceras],
+            columns=COLUMNAS_CABECERA
+        )
+        ids = np.asarray(self.id_cabecera, dtype=np.int64)
+
+        df = cabeceras.take(ids).reset_index(drop=True)
+        primera_fila = ~pd.Series(ids).duplicated().to_numpy()
+        total_en_primera = np.where(primera_fila, df["MONTO"].astype(float), 0.0)
+
+        df["MONTO"] = total_en_primera
+        df["MONTO_AFILIADO"] = np.array([np.nan if m is None else m for m in self.monto], dtype=float)
+        df["OBSERVACION"] = self.observacion
+        df["CUSSP"] = self.cussp
+        df["AFILIADO"] = self.afiliado
+        return df
@@ -0,0 +1,254 @@
+"""
+Motor de extracción de campos de planillas
+Precompila todos los patrones una sola vez y segmenta el texto en secciones
+(cabecera, tabla de afiliados y totales) en una sola pasada
+"""
+import re
+
+
+NO_DETECTADO = "No detectado"
+
+_FLAGS = re.IGNORECASE | re.MULTILINE | re.DOTALL
+
+# Campos de la cabecera (se buscan solo en la sección de cabecera)
+PATRONES_CABECERA = {
+    "RUC": re.compile(r'RUC[:\s]+(\d{11})', _FLAGS),
+    "RAZON_SOCIAL": re.compile(r'(?:Nombre\s+o\s+)?Raz[oó]n\s+Social[:\s]+([^\n]+?)(?:\s*RUC|$)', _FLAGS),
+    "PERIODO": re.compile(r'Periodo\s+(?:de\s+Devengue)?[:\s]+(\d{4}-\d{2})', _FLAGS),
+    "FECHA_PAGO": re.compile(r'Fecha\s+de\s+Pago[:\s]*\n?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{4})', _FLAGS),
+    "N_PLANILLA": re.compile(r'(?:Número\s+de\s+)?Planilla[:\s]+(\d+)', _FLAGS),
+}
+
+# Totales (se buscan solo en la sección de totales)
+PATRON_TOTAL_FONDO = re.compile(r'Total\s+Fondo\s+Pensiones[\s\n]+S/\.[\s\n]+([\d.]+)', _FLAGS)
+PATRON_RETENCIONES = re.compile(r'Retenciones(?:\s+y)?\s+Retribuciones[\s\n]+S/\.[\s\n]+([\d.]+)', _FLAGS)
+
+# Fila de afiliado: Nro | CUSPP | Nombre | Remuneración | ...
+# (el Nro puede venir pegado al CUSPP: "31220693TVACN0" es Nro 31 y CUSPP 220693TVACN0)
+PATRON_AFILIADO = re.compile(r'^\s*(\d+?)\s*([0-9]{6}[A-Z]{5}\d)\s+([A-Z\s,\.]+?)(?=\s+[SN]\s)')
+
+# Importes de una fila de afiliado (remuneración, aportes y total, después del nombre)
+PATRON_IMPORTE = re.compile(r'(?<![\w.,])-?(?:\d{1,3}(?:,\d{3})+|\d+)\.\d{2}(?![\w.,])')
+
+# Segunda línea del nombre de un afiliado: solo mayúsculas, sin números ni marcas de la tabla
+PATRON_CONTINUACION_NOMBRE = re.compile(r'^[A-ZÑ][A-ZÑ\s,\.]*$')
+_FUERA_DE_NOMBRE = re.compile(r'TOTAL|CUSPP|FONDO|RETENCIONES|P[AÁ]GINA')
+
+# Caso 2: un solo afiliado fuera del formato de tabla
+PATRON_CUSSP_PRIMERO = re.compile(r'^\s*1\s+([0-9]{6}[A-Z]{5}\d)', _FLAGS)
+PATRON_CUSSP_TRAS_ENCABEZADO = re.compile(r'CUSPP[\s\S]*?(\d{6}[A-Z]{5}\d)', _FLAGS)
+PATRON_NOMBRE_TRAS_CUSSP = re.compile(r'[0-9]{6}[A-Z]{5}\d\s+([A-Z\s,\.]+?)(?=\s+S\s|\s+N\s)', _FLAGS)
+
+# Evidencia de la tabla de afiliados en una página: su encabezado o un código CUSPP
+# (sin exigir espacios: algunos lectores pegan el Nro al código, p. ej. "31220693TVACN0")
+PATRON_EVIDENCIA_TABLA = re.compile(r'CUSPP|[0-9]{6}[A-Z]{5}\d')
+
+# Marcas que indican que una página ya aportó la cabecera o el bloque de totales
+MARCAS_PAGINA = {
+    "RUC": PATRONES_CABECERA["RUC"],
+    "PERIODO": PATRONES_CABECERA["PERIODO"],
+    "N_PLANILLA": PATRONES_CABECERA["N_PLANILLA"],
+    "FECHA_PAGO": PATRONES_CABECERA["FECHA_PAGO"],
+    "TOTAL_FONDO": PATRON_TOTAL_FONDO,
+    "RETENCIONES": PATRON_RETENCIONES,
+}
+
+# Marcadores de inicio de sección (se evalúan línea por línea)
+_MARCA_TABLA = re.compile(r'CUSPP', re.IGNORECASE)
+_MARCA_TOTALES = re.compile(r'Total\s+Fondo|Retenciones', re.IGNORECASE)
+_LINEA = re.compile(r'[^\n]+')
+
+
+def segmentar_texto(texto):
+    """
+    Divide el texto en secciones en una sola pasada por sus líneas
+
+    La cabecera va hasta el encabezado de la tabla (o la primera fila de afiliado),
+    la tabla hasta el primer marcador de totales y los totales hasta el final.
+    Las filas de afiliados se reconocen en la misma pasada.
+
+    Returns:
+        dict con 'cabecera', 'tabla', 'totales' (str) y 'afiliados' (lista)
+    """
+    inicio_tabla = None
+    inicio_totales = None
+    afiliados = []
+
+    posicion = 0
+    for linea in texto.split('\n'):
+        linea_limpia = linea.strip()
+
+        if linea_limpia[:1].isdigit():
+            match = PATRON_AFILIADO.match(linea_limpia)
+            if match:
+                afiliados.append({
+                    'nro': match.group(1).strip(),
+                    'cussp': match.group(2).strip(),
+                    'nombre': match.group(3).strip()
+                })
+                if inicio_tabla is None:
+                    inicio_tabla = posicion
+
+        if inicio_tabla is None and _MARCA_TABLA.search(linea):
+            inicio_tabla = posicion
+        if inicio_totales is None and _MARCA_TOTALES.search(linea):
+            inicio_totales = posicion
+
+        posicion += len(linea) + 1
+
+    fin = len(texto)
+    if inicio_totales is None:
+        inicio_totales = fin
+    if inicio_tabla is None or inicio_tabla > inicio_totales:
+        inicio_tabla = inicio_totales
+
+    return {
+        'cabecera': texto[:inicio_tabla],
+        'tabla': texto[inicio_tabla:inicio_totales],
+        'totales': texto[inicio_totales:],
+        'afiliados': afiliados,
+    }
+
+
+def _iterar_lineas(texto):
+    """Recorre las líneas de un texto sin construir la lista completa"""
+    for match in _LINEA.finditer(texto):
+        yield match.group()
+
+
+def iterar_afiliados(texto):
+    """
+    Genera las filas de afiliados encontradas en un texto (una página o varias)
+
+    Cada fila trae sus 'importes' (los montos que siguen al nombre, como
+    texto); si el nombre continúa en la línea siguiente, se une a la fila.
+    """
+    fila = None
+    for linea in _iterar_lineas(texto):
+        linea_limpia = linea.strip()
+        match = PATRON_AFILIADO.match(linea_limpia) if linea_limpia[:1].isdigit() else None
+        if match:
+            if fila:
+                yield fila
+            fila = {
+                'nro': match.group(1).strip(),
+                'cussp': match.group(2).strip(),
+                'nombre': " ".join(match.group(3).split()),
+                'importes': PATRON_IMPORTE.findall(linea_limpia, match.end()),
+            }
+        elif (fila and PATRON_CONTINUACION_NOMBRE.match(linea_limpia)
+              and not _FUERA_DE_NOMBRE.search(linea_limpia)):
+            fila['nombre'] = " ".join((fila['nombre'] + " " + linea_limpia).split())
+        elif fila:
+            yield fila
+            fila = None
+    if fila:
+        yield fila
+
+
+def tiene_totales(texto):
+    """Indica si el texto contiene el inicio del bloque de totales"""
+    return _MARCA_TOTALES.search(texto) is not None
+
+
+def fin_evidencia_tabla(texto):
+    """Posición donde termina la última evidencia de la tabla de afiliados (-1 si no hay)"""
+    fin = -1
+    for match in PATRON_EVIDENCIA_TABLA.finditer(texto):
+        fin = match.end()
+    return fin
+
+
+def inicio_totales(texto):
+    """Posición donde empieza el bloque de totales (Total Fondo Pensiones), o -1"""
+    match = PATRON_TOTAL_FONDO.search(texto)
+    return match.start() if match else -1
+
+
+def marcas_en_pagina(texto_pagina, pendientes):
+    """Retorna cuáles de las marcas `pendientes` aparecen en el texto de una página"""
+    return {marca for marca in pendientes if MARCAS_PAGINA[marca].search(texto_pagina)}
+
+
+def _buscar(patron, seccion, texto):
+    """Busca en la sección; solo si no aparece ahí recurre al texto completo"""
+    match = patron.search(seccion) if seccion else None
+    if match is None and len(seccion) != len(texto):
+        match = patron.search(texto)
+    if match:
+        valor = match.group(1).strip()
+        return valor if valor else NO_DETECTADO
+    return NO_DETECTADO
+
+
+def _limpiar_monto(monto_str):
+    if monto_str == NO_DETECTADO or not monto_str:
+        return 0.0
+    try:
+        return float(monto_str.replace(' ', '').replace('\n', '').strip())
+    except ValueError:
+        return 0.0
+
+
+def _calcular_monto(totales, texto):
+    """
+    MONTO TOTAL = Total Fondo Pensiones + última Retenciones y Retribuciones
+
+    Returns:
+        (monto total, Total Fondo Pensiones)
+    """
+    monto_fondo = _limpiar_monto(_buscar(PATRON_TOTAL_FONDO, totales, texto))
+
+    matches = PATRON_RETENCIONES.findall(totales) if totales else []
+    if not matches:
+        matches = PATRON_RETENCIONES.findall(texto)
+    monto_retenciones = matches[-1] if matches else NO_DETECTADO
+
+    total = monto_fondo + _limpiar_monto(monto_retenciones)
+    return (total if total > 0 else 0.0), monto_fondo
+
+
+def extraer_campos(texto, afiliados=None):
+    """
+    Extrae cabecera, monto y afiliados de una planilla buscando cada campo
+    únicamente en su sección
+
+    Args:
+        texto: Texto de la planilla
+        afiliados: Filas ya extraídas página por página (opcional); si se
+            pasan, reemplazan a las detectadas en `texto`
+
+    Returns:
+        dict con 'cabecera' (RUC, RAZON_SOCIAL, PERIODO sin limpiar, FECHA_PAGO,
+        N_PLANILLA, MONTO), 'total_fondo' (Total Fondo Pensiones, 0.0 si no
+        aparece), 'afiliados' y 'afiliado_unico' (Caso 2, o None)
+    """
+    secciones = segmentar_texto(texto)
+    if afiliados is not None:
+        secciones['afiliados'] = afiliados
+    cabecera_txt = secciones['cabecera']
+
+    cabecera = {
+        campo: _buscar(patron, cabecera_txt, texto)
+        for campo, patron in PATRONES_CABECERA.items()
+    }
+    cabecera["MONTO"], total_fondo = _calcular_monto(secciones['totales'], texto)
+
+    afiliado_unico = None
+    if not secciones['afiliados']:
+        # Caso 2: No se encontró tabla de afiliados, buscar un único CUSSP/AFILIADO
+        tabla = secciones['tabla']
+        cussp_value = _buscar(PATRON_CUSSP_PRIMERO, tabla, texto)
+        if cussp_value == NO_DETECTADO:
+            cussp_value = _buscar(PATRON_CUSSP_TRAS_ENCABEZADO, tabla, texto)
+        afiliado_name = _buscar(PATRON_NOMBRE_TRAS_CUSSP, tabla, texto)
+
+        if cussp_value != NO_DETECTADO and afiliado_name != NO_DETECTADO:
+            afiliado_unico = {'cussp': cussp_value, 'nombre': afiliado_name}
+
+    return {
+        'cabecera': cabecera,
+        'total_fondo': total_fondo,
+        'afiliados': secciones['afiliados'],
+        'afiliado_unico': afiliado_unico,
+    }
@@ -0,0 +1,238 @@
+"""
+OCR local (sin servicios externos) para planillas escaneadas
+Rasteriza solo las páginas sin capa de texto y las reconoce con Tesseract,
+varias páginas en paralelo y con el motor cargado una sola vez por hilo
+"""
+import importlib.util
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+# Resolución: se busca que el lado mayor de la página tenga ~3300 px
+# (A4 a 280 dpi), acotado para no perder legibilidad ni desperdiciar memoria
+PIXELES_OBJETIVO = 3300
+DPI_MINIMO = 150
+DPI_MAXIMO = 300
+
+# Modo de segmentación de Tesseract: 6 = un bloque uniforme (conserva las filas de la tabla)
+CONFIG_TESSERACT = os.environ.get('LECTOR_OCR_CONFIG', '--psm 6')
+
+IDIOMAS_PREFERIDOS = ('spa', 'eng')
+
+
+def _numero_hilos():
+    """Páginas que se reconocen a la vez (variable de entorno LECTOR_OCR_WORKERS)"""
+    return int(os.environ.get('LECTOR_OCR_WORKERS', 0)) or min(4, os.cpu_count() or 1)
+
+
+def _ruta_tessdata():
+    return os.environ.get('LECTOR_TESSDATA') or os.environ.get('TESSDATA_PREFIX')
+
+
+# ==================== Motor OCR ====================
+
+_DISPONIBLE = None
+_IDIOMA = None
+
+
+def _elegir_idioma(disponibles):
+    for idioma in IDIOMAS_PREFERIDOS:
+        if idioma in disponibles:
+            return idioma
+    return None
+
+
+def ocr_disponible():
+    """
+    Indica si hay un motor OCR local utilizable (se verifica una sola vez por proceso)
+
+    Usa tesserocr (Tesseract como biblioteca) si está instalado y si no
+    pytesseract (ejecutable tesseract). Se desactiva con LECTOR_OCR=0.
+    """
+    global _DISPONIBLE, _IDIOMA
+    if _DISPONIBLE is not None:
+        return _DISPONIBLE
+
+    _DISPONIBLE = False
+    if os.environ.get('LECTOR_OCR', '1') == '0':
+        return False
+
+    try:
+        import tesserocr
+        ruta = _ruta_tessdata()
+        _, idiomas = tesserocr.get_languages(ruta) if ruta else tesserocr.get_languages()
+        _IDIOMA = _elegir_idioma(idiomas)
+    except Exception:
+        try:
+            import pytesseract
+            _IDIOMA = _elegir_idioma(pytesseract.get_languages(config=''))
+        except Exception:
+            _IDIOMA = None
+
+    _DISPONIBLE = _IDIOMA is not None and _hay_rasterizador()
+    if not _DISPONIBLE:
+        logger.info("ℹ️ OCR local no disponible (instala tesserocr o pytesseract con datos 'spa' o 'eng')")
+    return _DISPONIBLE
+
+
+class _MotorTesseract:
+    """Motor de un hilo: con tesserocr la API queda cargada entre páginas"""
+
+    def __init__(self, idioma):
+        self.api = None
+        try:
+            import tesserocr
+            ruta = _ruta_tessdata()
+            psm = tesserocr.PSM.SINGLE_BLOCK if '--psm 6' in CONFIG_TESSERACT else tesserocr.PSM.AUTO
+            if ruta:
+                self.api = tesserocr.PyTessBaseAPI(path=ruta, lang=idioma, psm=psm)
+            else:
+                self.api = tesserocr.PyTessBaseAPI(lang=idioma, psm=psm)
+        except Exception:
+            import pytesseract
+            # Tesseract en paralelo por página: un hilo de OpenMP por proceso
+            os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+            self.pytesseract = pytesseract
+        self.idioma = idioma
+
+    def reconocer(self, imagen):
+        if self.api is not None:
+            self.api.SetImage(imagen)
+            return self.api.GetUTF8Text()
+        return self.pytesseract.image_to_string(imagen, lang=self.idioma, config=CONFIG_TESSERACT)
+
+
+_LOCAL = threading.local()
+
+
+def _motor():
+    """Motor OCR del hilo actual (se crea la primera vez)"""
+    motor = getattr(_LOCAL, 'motor', None)
+    if motor is None:
+        motor = _MotorTesseract(_IDIOMA)
+        _LOCAL.motor = motor
+    return motor
+
+
+_POOL = None
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool_hilos():
+    """Pool de hilos del proceso actual (los hilos conservan su motor entre documentos)"""
+    global _POOL, _POOL_PID
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != os.getpid():
+            _POOL = ThreadPoolExecutor(max_workers=_numero_hilos(), thread_name_prefix='ocr')
+            _POOL_PID = os.getpid()
+        return _POOL
+
+
+# ==================== Rasterización ====================
+
+def _hay_rasterizador():
+    """Indica si hay pypdfium2 o pdf2image, sin importarlos"""
+    return any(importlib.util.find_spec(modulo) is not None for modulo in ('pypdfium2', 'pdf2image'))
+
+
+def calcular_dpi(ancho_pt, alto_pt):
+    """DPI para que el lado mayor de la página quede cerca de PIXELES_OBJETIVO"""
+    lado_pulgadas = max(ancho_pt, alto_pt, 1) / 72
+    return int(min(DPI_MAXIMO, max(DPI_MINIMO, PIXELES_OBJETIVO / lado_pulgadas)))
+
+
+class _DocumentoRaster:
+    """PDF abierto una sola vez para rasterizar varias de sus páginas"""
+
+    def __init__(self, pdf_content):
+        self.pdf_content = pdf_content
+        self.lock = threading.Lock()
+        try:
+            import pypdfium2
+            self.pdf = pypdfium2.PdfDocument(pdf_content)
+        except ImportError:
+            self.pdf = None
+
+    def __len__(self):
+        if self.pdf is not None:
+            return len(self.pdf)
+        from pdf2image import pdfinfo_from_bytes
+        return pdfinfo_from_bytes(self.pdf_content)['Pages']
+
+    def imagen(self, indice):
+        """Imagen en escala de grises de la página `indice` a un DPI según su tamaño"""
+        if self.pdf is not None:
+            # pdfium no admite renderizar el mismo documento desde varios hilos
+            with self.lock:
+                pagina = self.pdf[indice]
+                dpi = calcular_dpi(*pagina.get_size())
+                imagen = pagina.render(scale=dpi / 72, grayscale=True).to_pil()
+                pagina.close()
+            return imagen
+
+        from pdf2image import convert_from_bytes
+        from PyPDF2 import PdfReader
+        import io
+        caja = PdfReader(io.BytesIO(self.pdf_content)).pages[indice].mediabox
+        dpi = calcular_dpi(float(caja.width), float(caja.height))
+        return convert_from_bytes(
+            self.pdf_content, dpi=dpi, first_page=indice + 1, last_page=indice + 1, grayscale=True
+        )[0]
+
+    def cerrar(self):
+        if self.pdf is not None:
+            self.pdf.close()
+
+
+def _ocr_pagina(documento, indice):
+    return _motor().reconocer(documento.imagen(indice)) or ""
+
+
+# ==================== API ====================
+
+def ocr_pagina(pdf_content, indice):
+    """Texto OCR de una sola página (para páginas sin texto dentro de un PDF con texto)"""
+    if not ocr_disponible():
+        return ""
+    documento = _DocumentoRaster(pdf_content)
+    try:
+        return _pool_hilos().submit(_ocr_pagina, documento, indice).result()
+    finally:
+        documento.cerrar()
+
+
+def textos_ocr(pdf_content, desde=0):
+    """
+    Genera el texto OCR de cada página, en orden, desde la página `desde`
+
+    Reconoce varias páginas en paralelo, adelantándose como máximo una
+    tanda de páginas; si quien consume el generador se detiene, las
+    páginas pendientes se cancelan.
+    """
+    if not ocr_disponible():
+        return
+
+    documento = _DocumentoRaster(pdf_content)
+    pool = _pool_hilos()
+    adelanto = _numero_hilos()
+    pendientes = []
+    try:
+        total = len(documento)
+        siguiente = desde
+        while siguiente < total or pendientes:
+            while siguiente < total and len(pendientes) < adelanto:
+                pendientes.append(pool.submit(_ocr_pagina, documento, siguiente))
+                siguiente += 1
+            yield pendientes.pop(0).result()
+    finally:
+        for futuro in pendientes:
+            futuro.cancel()
+        for futuro in pendientes:
+            if not futuro.cancelled():
+                futuro.exception()
+        documento.cerrar()
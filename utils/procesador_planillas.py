@@ -0,0 +1,574 @@
+"""
+Procesamiento de planillas PDF sin dependencia de Streamlit
+Contiene la ruta de extracción usada por la app y por el procesamiento por lotes
+"""
+import io
+import logging
+import os
+
+from utils.extractores import ESTADISTICAS, backends_registrados, registrar_backend
+from utils.metricas import agregar_tramo, tramo
+from utils.modelo_planillas import CabeceraPlanilla, TablaPlanillas
+from utils.tabla_afiliados import extraer_tabla_afiliados
+from utils.triaje import ESCANEADO, NO_PLANILLA, LecturaPdf, clasificar_pdf
+from utils.motor_campos import (
+    MARCAS_PAGINA,
+    extraer_campos,
+    fin_evidencia_tabla,
+    inicio_totales,
+    iterar_afiliados,
+    marcas_en_pagina,
+    tiene_totales,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Tabla de afiliados por coordenadas de palabras (todas las columnas y MONTO por
+# afiliado), solo si las filas del texto plano no cuadran con el Total Fondo
+# Pensiones; LECTOR_TABLA_COORDENADAS=0 deja solo la lectura del texto plano
+TABLA_POR_COORDENADAS = os.environ.get('LECTOR_TABLA_COORDENADAS', '1') != '0'
+
+# Versión de la lógica de extracción: cambiarla invalida la caché de extracciones
+VERSION_EXTRACTOR = "10" if TABLA_POR_COORDENADAS else "10-texto"
+
+class _ControlPaginas:
+    """
+    Decide página por página si hace falta seguir leyendo
+
+    Solo se detiene con evidencia positiva de que no falta nada: la cabecera
+    (RUC, Periodo, Planilla, Fecha de Pago) completa, la tabla de afiliados
+    ya vista (encabezado CUSPP o códigos CUSPP) y, después de ella, el bloque
+    de totales (Total Fondo Pensiones y Retenciones). Si en una página siguen
+    apareciendo afiliados después de los totales, o si la planilla no tiene
+    tabla, se leen todas las páginas.
+    """
+
+    def __init__(self):
+        self.pendientes = set(MARCAS_PAGINA)
+        self.tabla_vista = False
+        self.totales_tras_tabla = False
+        self.leidas = 0
+
+    def continuar(self, texto):
+        self.leidas += 1
+        if texto:
+            if self.pendientes:
+                self.pendientes -= marcas_en_pagina(texto, self.pendientes)
+            fin_tabla = fin_evidencia_tabla(texto)
+            if fin_tabla >= 0:
+                self.tabla_vista = True
+                self.totales_tras_tabla = False
+            if self.tabla_vista and inicio_totales(texto) > fin_tabla:
+                self.totales_tras_tabla = True
+
+        return bool(self.pendientes) or not self.totales_tras_tabla
+
+
+def _textos_pypdf2(pdf_content, desde=0, lectura=None):
+    """
+    Texto de cada página con PyPDF2 (extrae texto directo si está incrustado)
+
+    Reutiliza el PdfReader y los textos que ya leyó el triaje (`lectura`)
+    """
+    if lectura is not None and lectura.reader is not None:
+        reader = lectura.reader
+        textos = lectura.textos
+    else:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(io.BytesIO(pdf_content))
+        textos = {}
+    for idx in range(desde, len(reader.pages)):
+        texto = textos.get(idx)
+        yield texto if texto is not None else reader.pages[idx].extract_text() or ""
+
+
+def _textos_pdfplumber(pdf_content, desde=0):
+    """Texto de cada página con pdfplumber (alternativa robusta)"""
+    import pdfplumber
+
+    with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
+        for pagina in pdf.pages[desde:]:
+            yield pagina.extract_text() or ""
+            # Liberar los objetos de layout de la página ya leída
+            if hasattr(pagina, 'flush_cache'):
+                pagina.flush_cache()
+
+
+def _textos_ocr(pdf_content, desde=0):
+    """Texto de cada página con OCR local (para PDFs escaneados)"""
+    from utils.ocr_local import textos_ocr
+
+    yield from textos_ocr(pdf_content, desde)
+
+
+registrar_backend('pypdf2', _textos_pypdf2, usa_lectura=True)
+registrar_backend('pdfplumber', _textos_pdfplumber)
+registrar_backend('ocr_local', _textos_ocr, ocr=True)
+
+
+def _etapas_extraccion(usar_ocr, solo_ocr=False, diseno=None):
+    """
+    Backends en el orden en que se prueban: los de texto según lo aprendido
+    para el diseño del documento y después el OCR, solo si hay un motor local
+    disponible. Con `solo_ocr` (PDF escaneado según el triaje) se omiten los de texto
+    """
+    etapas = ESTADISTICAS.ordenar(diseno, backends_registrados(ocr=False))
+    if usar_ocr:
+        from utils.ocr_local import ocr_disponible
+        if ocr_disponible():
+            ocr = backends_registrados(ocr=True)
+            if solo_ocr:
+                return ocr
+            etapas.extend(ocr)
+    return etapas
+
+
+def _completar_con_ocr(pdf_content, indice, texto):
+    """Si una página de un PDF con texto no tiene capa de texto, la reconoce con OCR"""
+    if texto.strip():
+        return texto
+    from utils.ocr_local import ocr_pagina
+    return ocr_pagina(pdf_content, indice)
+
+
+def iterar_paginas_texto(pdf_content, usar_ocr=True, solo_ocr=False, diseno=None, intentos=None, lectura=None):
+    """
+    Genera el texto de las páginas del PDF una por una (sin tope de páginas)
+
+    Prueba los backends registrados (PyPDF2 y pdfplumber, en el orden que
+    mejor funcionó para el `diseno` del documento) hasta que uno produzca más
+    de 50 caracteres, y si ninguno lo logra, OCR local (solo si hay un motor
+    instalado). Las páginas de cada etapa se retienen solo hasta superar ese
+    umbral; si una etapa falla a mitad del documento, la siguiente continúa
+    desde esa página. En un PDF con texto, las páginas sin capa de texto se
+    reconocen con OCR.
+
+    Cada etapa queda registrada en las estadísticas de backends y, si se pasa
+    la lista `intentos`, se agrega a ella como dict con 'backend', 'segundos',
+    'exito' y 'error'. Con `lectura` (LecturaPdf de clasificar_pdf) no se
+    vuelve a abrir el PDF ni a extraer las páginas que el triaje ya leyó.
+    """
+    etapas = _etapas_extraccion(usar_ocr, solo_ocr, diseno)
+    usar_ocr = any(etapa.ocr for etapa in etapas)
+    control = _ControlPaginas()
+    emitidas = 0
+
+    for numero, etapa in enumerate(etapas):
+        ultima = numero == len(etapas) - 1
+        if emitidas:
+            # La etapa anterior falló después de emitir páginas: continuar desde la siguiente
+            desde = emitidas
+        else:
+            # La etapa anterior no produjo texto útil: empezar de nuevo
+            desde = 0
+            control = _ControlPaginas()
+
+        # Mientras no se supere el umbral las páginas se retienen (salvo en la última etapa)
+        pendientes = []
+        caracteres = 0 if (not emitidas and not ultima) else 51
+        ocr_por_pagina = usar_ocr and not etapa.ocr
+        medicion = {'segundos': 0.0}
+        producidos = 0
+        error = None
+
+        try:
+            for texto in etapa.textos(pdf_content, desde, medicion, lectura):
+                producidos += len(texto.strip())
+                seguir = control.continuar(texto)
+                if caracteres <= 50:
+                    pendientes.append(texto)
+                    caracteres += len(texto.strip())
+                    if caracteres > 50:
+                        for texto_pendiente in pendientes:
+                            if ocr_por_pagina:
+                                texto_pendiente = _completar_con_ocr(pdf_content, emitidas, texto_pendiente)
+                            yield texto_pendiente
+                            emitidas += 1
+                        pendientes = []
+                else:
+                    if ocr_por_pagina:
+                        texto = _completar_con_ocr(pdf_content, emitidas, texto)
+                    yield texto
+                    emitidas += 1
+                if not seguir:
+                    break
+            if caracteres > 50:
+                return
+        except Exception as e_etapa:
+            error = str(e_etapa)
+            if ultima:
+                return
+        finally:
+            exito = error is None and producidos > 50
+            ESTADISTICAS.registrar(diseno, etapa.nombre, exito, medicion['segundos'])
+            if intentos is not None:
+                intentos.append({
+                    'backend': etapa.nombre,
+                    'segundos': round(medicion['segundos'], 4),
+                    'exito': exito,
+                    'error': error,
+                })
+
+
+def iterar_afiliados_pdf(pdf_content, retenido=None, solo_ocr=False, diseno=None, intentos=None, lectura=None):
+    """
+    Genera las filas de afiliados del PDF a medida que se lee cada página
+
+    La memoria usada no depende del número de páginas: solo se mantiene el
+    texto de la página actual. Si se pasa la lista `retenido`, se le agregan
+    las páginas que necesita extraer_campos (la primera, las de totales y las
+    que no tienen filas); `solo_ocr`, `diseno`, `intentos` y `lectura` se
+    pasan a iterar_paginas_texto.
+    """
+    paginas = iterar_paginas_texto(
+        pdf_content, solo_ocr=solo_ocr, diseno=diseno, intentos=intentos, lectura=lectura
+    )
+    for idx, texto_pagina in enumerate(paginas):
+        if not texto_pagina:
+            continue
+        with tramo('afiliados_texto'):
+            filas = list(iterar_afiliados(texto_pagina))
+        if retenido is not None and (idx == 0 or not filas or tiene_totales(texto_pagina)):
+            retenido.append(texto_pagina + "\n")
+        yield from filas
+
+
+def extraer_texto_pdf(pdf_content):
+    """Extrae texto del PDF usando PyPDF2 o pdfplumber (página por página)"""
+    try:
+        texto_completo = "".join(texto + "\n" for texto in iterar_paginas_texto(pdf_content) if texto)
+        if texto_completo and len(texto_completo.strip()) > 50:
+            return texto_completo
+        return ""
+    except Exception as e:
+        logger.warning("⚠️ Error extrayendo texto: %s", e)
+        return ""
+
+
+def limpiar_periodo(periodo_str):
+    """Elimina guiones del período: '2012-12' -> '201212'"""
+    if periodo_str == "No detectado" or not periodo_str:
+        return "No detectado"
+    return periodo_str.replace('-', '').replace(' ', '')
+
+
+def _conciliar_con_totales(afiliados, total_fondo):
+    """
+    Asigna a cada fila leída del texto su último importe (la columna de total)
+    si la suma de esos importes cuadra con el Total Fondo Pensiones
+
+    Returns:
+        True si cuadran (las filas ya traen 'monto'); False si no
+    """
+    if not afiliados or total_fondo <= 0 or not all(fila.get('importes') for fila in afiliados):
+        return False
+    montos = [float(fila['importes'][-1].replace(',', '')) for fila in afiliados]
+    if abs(sum(montos) - total_fondo) > 0.005:
+        return False
+    for fila, monto in zip(afiliados, montos):
+        fila['monto'] = monto
+    return True
+
+
+def _afiliados_por_coordenadas(pdf_content, afiliados):
+    """
+    Reemplaza las filas leídas del texto plano por las de la tabla por
+    coordenadas (nombres completos y columnas de montos), salvo que esta
+    encuentre menos afiliados
+    """
+    try:
+        tabla = extraer_tabla_afiliados(pdf_content)
+    except Exception as e:
+        logger.warning("⚠️ Error leyendo la tabla por coordenadas: %s", e)
+        return afiliados
+    return tabla if tabla and len(tabla) >= len(afiliados) else afiliados
+
+
+def extraer_datos_planilla(pdf_content):
+    """
+    Extrae texto, cabecera y afiliados de un PDF de planilla (sin consultar bases)
+
+    Returns:
+        dict serializable a JSON con 'texto' (páginas de cabecera y totales),
+        'cabecera' (None si no hubo texto),
+        'afiliados' (tabla del PDF; con 'monto' si sus importes cuadran con
+        los totales o si se leyó por coordenadas, que agregan 'columnas'), 'afiliado_unico' (Caso 2a, o None),
+        'triaje' (ver utils.triaje.clasificar_pdf) y 'extraccion' (backend
+        usado y cada intento con su tiempo)
+    """
+    datos = {'texto': '', 'cabecera': None, 'afiliados': [], 'afiliado_unico': None}
+
+    # Triaje: descartar lo que no es planilla y mandar los escaneados directo a OCR
+    with tramo('triaje'):
+        lectura = LecturaPdf()
+        triaje = clasificar_pdf(pdf_content, lectura)
+    datos['triaje'] = triaje
+    if triaje['tipo'] == NO_PLANILLA:
+        return datos
+
+    # Recorrer las páginas en streaming: los afiliados se extraen por página y
+    # solo se conserva el texto de las páginas con cabecera, totales o sin tabla
+    retenido = []
+    intentos = []
+    datos['extraccion'] = {'backend': None, 'intentos': intentos}
+    afiliados = list(iterar_afiliados_pdf(
+        pdf_content,
+        retenido=retenido,
+        solo_ocr=triaje['tipo'] == ESCANEADO,
+        diseno=triaje.get('diseno'),
+        intentos=intentos,
+        lectura=lectura
+    ))
+    caracteres = sum(len(texto_pagina.strip()) for texto_pagina in retenido)
+
+    for intento in intentos:
+        agregar_tramo(f"texto:{intento['backend']}", intento['segundos'])
+    exitosos = [intento['backend'] for intento in intentos if intento['exito']]
+    datos['extraccion']['backend'] = exitosos[-1] if exitosos else None
+
+    if caracteres <= 50 and not afiliados:
+        # Sin texto ni OCR disponible: no guardar en caché, para reintentar con OCR
+        from utils.ocr_local import ocr_disponible
+        datos['ocr_pendiente'] = not ocr_disponible()
+        return datos
+
+    texto = "".join(retenido)
+    datos['texto'] = texto
+
+    # Una sola pasada: segmentar y extraer cada campo de su sección
+    with tramo('campos'):
+        campos = extraer_campos(texto, afiliados=afiliados)
+    cabecera = campos['cabecera']
+    cabecera['PERIODO'] = limpiar_periodo(cabecera['PERIODO'])
+
+    afiliados = campos['afiliados']
+    afiliado_unico = campos['afiliado_unico']
+    conciliados = _conciliar_con_totales(afiliados, campos['total_fondo'])
+    texto_por_ocr = datos['extraccion']['backend'] not in {b.nombre for b in backends_registrados(ocr=False)}
+    if (TABLA_POR_COORDENADAS and not conciliados and not texto_por_ocr
+            and (afiliados or 'CUSPP' in texto.upper())):
+        with tramo('tabla_coordenadas'):
+            afiliados = _afiliados_por_coordenadas(pdf_content, afiliados)
+        if afiliados:
+            afiliado_unico = None
+    for fila in afiliados:
+        fila.pop('importes', None)
+
+    datos['cabecera'] = cabecera
+    datos['afiliados'] = afiliados
+    datos['afiliado_unico'] = afiliado_unico
+
+    return datos
+
+
+def es_cacheable(datos):
+    """Indica si una extracción se puede guardar en la caché de extracciones"""
+    return not datos.get('ocr_pendiente')
+
+
+def procesar_planilla(nombre_archivo, pdf_content, obtener_bases=None, buscar_en_base=None, cache=None):
+    """
+    Procesa un PDF de planilla completo (texto, cabecera, afiliados y fallback a bases)
+
+    Args:
+        nombre_archivo: Nombre del archivo (columna "Archivo")
+        pdf_content: Bytes del PDF
+        obtener_bases: Función sin argumentos que retorna las bases locales (opcional)
+        buscar_en_base: Función de búsqueda en bases locales (opcional)
+        cache: CacheExtraccion para reutilizar extracciones de PDFs repetidos (opcional)
+
+    Returns:
+        dict con 'tabla' (TablaPlanillas), 'mensajes' (lista de tuplas
+        (tipo, texto) con tipo en success/info/warning/error), 'debug' y 'desde_cache'
+    """
+    # Reutilizar la extracción si el mismo PDF ya fue procesado
+    datos = None
+    if cache is not None:
+        with tramo('cache'):
+            clave_cache = cache.clave(pdf_content, VERSION_EXTRACTOR)
+            datos = cache.obtener(clave_cache)
+
+    desde_cache = datos is not None
+    if datos is None:
+        with tramo('extraccion'):
+            datos = extraer_datos_planilla(pdf_content)
+        if cache is not None and es_cacheable(datos):
+            cache.guardar(clave_cache, datos)
+
+    with tramo('construir_resultado'):
+        resultado = construir_resultado(nombre_archivo, datos, obtener_bases, buscar_en_base)
+    resultado['desde_cache'] = desde_cache
+    return resultado
+
+
+def construir_resultado(nombre_archivo, datos, obtener_bases=None, buscar_en_base=None, diferir_bases=False):
+    """
+    Construye las filas de salida a partir de los datos extraídos de un PDF
+
+    Se separa de la extracción para que esta pueda correr en otro proceso
+    mientras la consulta a las bases locales (Caso 2b) se hace donde estén cargadas.
+
+    Args:
+        nombre_archivo: Nombre del archivo (columna "Archivo")
+        datos: Resultado de extraer_datos_planilla
+        obtener_bases: Función sin argumentos que retorna las bases locales (opcional)
+        buscar_en_base: Función de búsqueda en bases locales (opcional)
+        diferir_bases: Si el Caso 2b queda pendiente ('pendiente_base') para
+            resolverlo junto con el de otros PDFs en completar_con_bases
+
+    Returns:
+        dict con el mismo formato que procesar_planilla
+    """
+    tabla = TablaPlanillas()
+    resultado = {'archivo': nombre_archivo, 'tabla': tabla, 'mensajes': [], 'debug': None, 'desde_cache': False}
+    mensajes = resultado['mensajes']
+
+    triaje = datos.get('triaje') or {}
+    if triaje.get('tipo') == NO_PLANILLA:
+        mensajes.append(('warning', f"⚠️ {nombre_archivo} no parece una planilla ({triaje['motivo']}); se omitió"))
+        return resultado
+
+    cabecera = datos['cabecera']
+    if cabecera is None:
+        if triaje.get('tipo') == ESCANEADO and datos.get('ocr_pendiente'):
+            mensajes.append(('warning', f"⚠️ {nombre_archivo} es un PDF escaneado y no hay OCR local disponible"))
+        else:
+            mensajes.append(('warning', f"⚠️ No se extrajo texto de {nombre_archivo}"))
+        return resultado
+
+    mensajes.append(('success', f"✅ Texto extraído de {nombre_archivo}"))
+
+    ruc_val = cabecera['RUC']
+    periodo_val = cabecera['PERIODO']
+    afiliados = datos['afiliados']
+
+    resultado['debug'] = {
+        'ruc': ruc_val,
+        'periodo': periodo_val,
+        'monto': cabecera['MONTO'],
+        'afiliados': afiliados,
+    }
+
+    # Una sola cabecera por planilla, compartida por todos sus afiliados
+    # (al exportar, el MONTO total queda solo en la primera fila y el aporte
+    # de cada afiliado, si la tabla lo trae, en MONTO_AFILIADO)
+    id_cabecera = tabla.agregar_cabecera(CabeceraPlanilla(
+        archivo=nombre_archivo,
+        ruc=ruc_val,
+        razon_social=cabecera['RAZON_SOCIAL'],
+        periodo=periodo_val,
+        fecha_pago=cabecera['FECHA_PAGO'],
+        n_planilla=cabecera['N_PLANILLA'],
+        monto=cabecera['MONTO'],
+    ))
+
+    if afiliados:
+        # Caso 1: Se encontraron afiliados en el PDF
+        # OBSERVACION vacío porque se encontraron datos en el PDF
+        mensajes.append(('info', f"✅ Se encontraron {len(afiliados)} afiliado(s) en {nombre_archivo}"))
+
+        for afiliado in afiliados:
+            tabla.agregar_afiliado(id_cabecera, afiliado['cussp'], afiliado['nombre'],
+                                   monto=afiliado.get('monto'))
+        return resultado
+
+    if datos['afiliado_unico']:
+        # Caso 2a: CUSSP y AFILIADO encontrados en el PDF
+        tabla.agregar_afiliado(id_cabecera, datos['afiliado_unico']['cussp'], datos['afiliado_unico']['nombre'])
+        mensajes.append(('info', f"✅ Se extrajo 1 afiliado de {nombre_archivo}"))
+        return resultado
+
+    # Caso 2b: NO se encontraron CUSSP y AFILIADO en el PDF
+    # FALLBACK: Buscar en la base local
+    pendiente = (id_cabecera, ruc_val, periodo_val)
+    if diferir_bases and obtener_bases and buscar_en_base:
+        resultado['pendiente_base'] = pendiente
+        return resultado
+
+    with tramo('cargar_bases'):
+        bases_locales = obtener_bases() if (obtener_bases and buscar_en_base) else None
+
+    validacion = None
+    error = None
+    if bases_locales:
+        try:
+            # Buscar todos los registros que coincidan con DOCUMENTO y PERIODO
+            with tramo('buscar_en_base'):
+                validacion = buscar_en_base(
+                    ruc=ruc_val,
+                    documento=ruc_val,
+                    periodo=periodo_val,
+                    cussp="",
+                    afiliado_pdf="",
+                    bases=bases_locales
+                )
+        except Exception as e:
+            error = e
+
+    _agregar_desde_base(resultado, pendiente, bases_locales, validacion, error)
+    return resultado
+
+
+def completar_con_bases(resultados, obtener_bases):
+    """
+    Resuelve con una sola búsqueda por lote (buscar_en_base_lote) el Caso 2b
+    de todos los resultados construidos con diferir_bases=True
+
+    Args:
+        resultados: Resultados de construir_resultado (los None se ignoran)
+        obtener_bases: Función sin argumentos que retorna las bases locales
+    """
+    pendientes = [resultado for resultado in resultados if resultado and resultado.get('pendiente_base')]
+    if not pendientes:
+        return
+
+    bases_locales = None
+    validaciones = [None] * len(pendientes)
+    error = None
+    try:
+        with tramo('cargar_bases'):
+            bases_locales = obtener_bases() if obtener_bases else None
+        if bases_locales:
+            from utils.validador_base_local import buscar_en_base_lote
+
+            claves = [resultado['pendiente_base'][1:] for resultado in pendientes]
+            with tramo('buscar_en_base_lote'):
+                validaciones = buscar_en_base_lote(claves, bases_locales)
+    except Exception as e:
+        error = e
+
+    for resultado, validacion in zip(pendientes, validaciones):
+        _agregar_desde_base(resultado, resultado.pop('pendiente_base'), bases_locales, validacion, error)
+
+
+def _agregar_desde_base(resultado, pendiente, bases_locales, validacion, error=None):
+    """Agrega las filas del Caso 2b según la búsqueda en las bases locales"""
+    tabla = resultado['tabla']
+    mensajes = resultado['mensajes']
+    nombre_archivo = resultado['archivo']
+    id_cabecera = pendiente[0]
+
+    if not bases_locales:
+        # Sin bases locales disponibles
+        tabla.agregar_afiliado(id_cabecera, "No detectado", "No detectado",
+                               "No se encontró en PDF y bases locales no disponibles")
+        mensajes.append(('warning', f"⚠️ No se encontraron datos en {nombre_archivo}"))
+        return
+
+    if error is not None:
+        tabla.agregar_afiliado(id_cabecera, "No detectado", "No detectado",
+                               f"Error consultando bases: {str(error)}")
+        mensajes.append(('warning', f"⚠️ Error al buscar en bases para {nombre_archivo}"))
+        return
+
+    if validacion['encontrado'] and validacion.get('afiliados'):
+        # Se encontraron múltiples afiliados en la base local
+        for aff in validacion['afiliados']:
+            tabla.agregar_afiliado(id_cabecera, aff['cussp'], aff['afiliado'], aff['observacion'])
+        mensajes.append(('info', f"✅ Se obtuvieron {len(validacion['afiliados'])} afiliado(s) de la base local para {nombre_archivo}"))
+    else:
+        # No se encontró en bases
+        tabla.agregar_afiliado(id_cabecera, "No detectado", "No detectado",
+                               "No se encontró en PDF ni en bases locales")
+        mensajes.append(('warning', f"⚠️ No se pudieron extraer datos de {nombre_archivo}"))
@@ -0,0 +1,311 @@
+"""
+Extracción de la tabla de afiliados por coordenadas de palabras (pdfplumber)
+Ubica la tabla una vez por página (del encabezado con CUSPP hasta el bloque de
+totales), recorta esa región y arma cada fila con todas sus columnas en una
+sola pasada, incluidos los nombres que continúan en una segunda línea
+"""
+import io
+import re
+import unicodedata
+
+
+# Tolerancias en puntos
+TOLERANCIA_LINEA = 3
+TOLERANCIA_PALABRA = 1.5
+SEPARACION_ENCABEZADO = 4
+
+# CUSPP, opcionalmente con el Nro pegado delante (como en PATRON_AFILIADO)
+_CUSSP = re.compile(r'^(\d*?)([0-9]{6}[A-Z]{5}\d)$')
+_NUMERO = re.compile(r'^-?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?$')
+_INDICADOR = re.compile(r'^[SN]$')
+
+# Sobre el texto de la línea sin espacios
+_INICIO_FILA = re.compile(r'^\d+[0-9]{6}[A-Z]{5}\d')
+_MARCA_ENCABEZADO = 'CUSPP'
+_MARCAS_TOTALES = ('TOTALFONDO', 'RETENCIONES')
+
+# Columnas que forman el MONTO del afiliado (por nombre de encabezado, sin tildes)
+_COLUMNA_TOTAL = re.compile(r'\bTOTAL\b')
+_COLUMNA_APORTE = re.compile(r'\bAPORTES?\b')
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return texto.upper()
+
+
+def _agrupar_lineas(objetos, clave_texto):
+    """
+    Agrupa caracteres o palabras en líneas según su posición vertical
+
+    Returns:
+        list de (top, bottom, objetos ordenados por x0)
+    """
+    lineas = []
+    for objeto in sorted(objetos, key=lambda o: (o['top'], o['x0'])):
+        if lineas and objeto['top'] - lineas[-1][0] <= TOLERANCIA_LINEA:
+            linea = lineas[-1]
+            linea[2].append(objeto)
+            if objeto['bottom'] > linea[1]:
+                lineas[-1] = (linea[0], objeto['bottom'], linea[2])
+        elif clave_texto(objeto).strip():
+            lineas.append((objeto['top'], objeto['bottom'], [objeto]))
+    return [(top, bottom, sorted(objs, key=lambda o: o['x0'])) for top, bottom, objs in lineas]
+
+
+def _texto_compacto(caracteres):
+    return _normalizar("".join(c['text'] for c in caracteres if not c['text'].isspace()))
+
+
+def ubicar_tabla(pagina):
+    """
+    Región vertical de la tabla de afiliados en una página, usando solo los caracteres
+
+    Empieza en el encabezado (línea con CUSPP) o, en las páginas de
+    continuación, en la primera fila de afiliado, y termina en el bloque de
+    totales o al final de la página.
+
+    Returns:
+        (top, bottom, hay_totales) o None si la página no tiene tabla
+    """
+    inicio = None
+    for top, bottom, caracteres in _agrupar_lineas(pagina.chars, lambda c: c['text']):
+        texto = _texto_compacto(caracteres)
+        if inicio is None:
+            if _MARCA_ENCABEZADO in texto or _INICIO_FILA.match(texto):
+                inicio = top
+            continue
+        if any(marca in texto for marca in _MARCAS_TOTALES):
+            return inicio, top, True
+    if inicio is None:
+        return None
+    return inicio, pagina.height, False
+
+
+def _columnas_encabezado(lineas):
+    """
+    Columnas de la tabla a partir de las palabras del encabezado
+
+    Las palabras que se superponen horizontalmente (encabezados de dos
+    líneas) o están separadas por un espacio forman una sola columna.
+
+    Returns:
+        list de dicts con 'nombre', 'x0' y 'x1', de izquierda a derecha
+    """
+    palabras = sorted((p for _, _, ps in lineas for p in ps), key=lambda p: p['x0'])
+    grupos = []
+    for palabra in palabras:
+        if grupos and palabra['x0'] <= grupos[-1]['x1'] + SEPARACION_ENCABEZADO:
+            grupo = grupos[-1]
+            grupo['x1'] = max(grupo['x1'], palabra['x1'])
+            grupo['palabras'].append(palabra)
+        else:
+            grupos.append({'x0': palabra['x0'], 'x1': palabra['x1'], 'palabras': [palabra]})
+
+    columnas = []
+    for grupo in grupos:
+        ordenadas = sorted(grupo['palabras'], key=lambda p: (round(p['top']), p['x0']))
+        columnas.append({
+            'nombre': " ".join(p['text'] for p in ordenadas),
+            'x0': grupo['x0'],
+            'x1': grupo['x1'],
+        })
+    return columnas
+
+
+def _columna_de(palabra, columnas, libres):
+    """Índice de la columna libre que más se superpone con la palabra (o la más cercana)"""
+    mejor = None
+    mejor_puntaje = None
+    centro = (palabra['x0'] + palabra['x1']) / 2
+    for indice in libres:
+        columna = columnas[indice]
+        superposicion = min(palabra['x1'], columna['x1']) - max(palabra['x0'], columna['x0'])
+        distancia = abs(centro - (columna['x0'] + columna['x1']) / 2)
+        puntaje = (-superposicion, distancia) if superposicion > 0 else (0, distancia)
+        if mejor_puntaje is None or puntaje < mejor_puntaje:
+            mejor, mejor_puntaje = indice, puntaje
+    return mejor
+
+
+def _a_numero(valor):
+    try:
+        return float(valor.replace(',', ''))
+    except (AttributeError, ValueError):
+        return None
+
+
+def monto_afiliado(columnas):
+    """
+    MONTO de un afiliado a partir de sus columnas: la columna de total si
+    existe, si no la suma de las columnas de aportes (None si no hay ninguna)
+    """
+    total = None
+    aportes = []
+    for nombre, valor in columnas.items():
+        nombre_normalizado = _normalizar(nombre)
+        numero = _a_numero(valor)
+        if numero is None:
+            continue
+        if _COLUMNA_TOTAL.search(nombre_normalizado):
+            total = numero
+        elif _COLUMNA_APORTE.search(nombre_normalizado):
+            aportes.append(numero)
+    if total is not None:
+        return total
+    return round(sum(aportes), 2) if aportes else None
+
+
+class _LectorTabla:
+    """Arma las filas de afiliados página por página (conserva las columnas entre páginas)"""
+
+    def __init__(self):
+        self.columnas = None
+        self.indice_nombre = None
+        self.afiliados = []
+        self.fila = None
+        self.fin_fila = None
+        self.alto_linea = None
+
+    def _fijar_columnas(self, columnas):
+        self.columnas = columnas
+        self.indice_nombre = None
+        for indice, columna in enumerate(columnas):
+            nombre = _normalizar(columna['nombre'])
+            if 'NOMBRE' in nombre or 'APELLIDO' in nombre or 'AFILIADO' in nombre:
+                self.indice_nombre = indice
+                break
+
+    def _nueva_fila(self, palabras):
+        """Fila que empieza en esta línea: Nro, CUSPP, nombre y el resto por columnas"""
+        posicion, cussp = next(
+            (i, coincidencia) for i, coincidencia in enumerate(_CUSSP.match(p['text']) for p in palabras)
+            if coincidencia
+        )
+        nro = cussp.group(1)
+        if not nro and posicion > 0 and palabras[0]['text'].isdigit():
+            nro = palabras[0]['text']
+
+        # El nombre llega hasta el primer indicador (S/N) o número, como en el texto plano
+        resto = palabras[posicion + 1:]
+        fin_nombre = next(
+            (i for i, p in enumerate(resto) if _INDICADOR.match(p['text']) or _NUMERO.match(p['text'])),
+            len(resto)
+        )
+        nombre = [p['text'] for p in resto[:fin_nombre]]
+        x_nombre = resto[0]['x0'] if fin_nombre else None
+
+        columnas = {}
+        if self.columnas:
+            # Las columnas de la izquierda (Nro, CUSPP, nombre) ya están asignadas
+            ultima_asignada = self.indice_nombre
+            if ultima_asignada is None:
+                ultima_asignada = _columna_de(palabras[posicion], self.columnas, range(len(self.columnas)))
+            libres = list(range(ultima_asignada + 1, len(self.columnas)))
+            for palabra in resto[fin_nombre:]:
+                if not libres:
+                    break
+                indice = _columna_de(palabra, self.columnas, libres)
+                # Las columnas a la izquierda de la elegida quedan vacías
+                libres = [i for i in libres if i > indice]
+                columnas[self.columnas[indice]['nombre']] = palabra['text']
+
+        self.fila = {
+            'nro': nro,
+            'cussp': cussp.group(2),
+            'nombre': nombre,
+            'x_nombre': x_nombre,
+            'columnas': columnas,
+        }
+        self.afiliados.append(self.fila)
+
+    def _continuacion(self, palabras):
+        """
+        Segunda línea del nombre: debe empezar alineada con el nombre de la
+        fila; retorna False si la línea no es continuación (pie de página, etc.)
+        """
+        if abs(palabras[0]['x0'] - self.fila['x_nombre']) > SEPARACION_ENCABEZADO:
+            return False
+        limite = None
+        if self.columnas and self.indice_nombre is not None and self.indice_nombre + 1 < len(self.columnas):
+            limite = self.columnas[self.indice_nombre + 1]['x0']
+        for palabra in palabras:
+            if limite is not None and palabra['x0'] >= limite:
+                break
+            if _INDICADOR.match(palabra['text']) or _NUMERO.match(palabra['text']):
+                break
+            self.fila['nombre'].append(palabra['text'])
+        return True
+
+    def leer_pagina(self, pagina):
+        """Procesa una página; retorna True si en ella termina la tabla (bloque de totales)"""
+        region = ubicar_tabla(pagina)
+        if region is None:
+            return False
+        top, bottom, hay_totales = region
+
+        recorte = pagina.within_bbox((0, top, pagina.width, bottom))
+        palabras = recorte.extract_words(x_tolerance=TOLERANCIA_PALABRA, y_tolerance=TOLERANCIA_LINEA)
+        lineas = _agrupar_lineas(palabras, lambda p: p['text'])
+
+        encabezado = []
+        self.fila = None
+        filas_en_pagina = False
+        for top_linea, bottom_linea, palabras_linea in lineas:
+            es_fila = any(_CUSSP.match(p['text']) for p in palabras_linea)
+            if es_fila:
+                if encabezado:
+                    self._fijar_columnas(_columnas_encabezado(encabezado))
+                    encabezado = []
+                self._nueva_fila(palabras_linea)
+                filas_en_pagina = True
+                self.alto_linea = self.alto_linea or (bottom_linea - top_linea)
+                self.fin_fila = bottom_linea
+            elif not filas_en_pagina:
+                encabezado.append((top_linea, bottom_linea, palabras_linea))
+            elif (self.fila is not None
+                  and self.fila['x_nombre'] is not None
+                  and top_linea - self.fin_fila <= 1.5 * (self.alto_linea or TOLERANCIA_LINEA)
+                  and self._continuacion(palabras_linea)):
+                self.fin_fila = bottom_linea
+            else:
+                # Subtotal, pie de página u otra línea que no es fila: se omite
+                # (la región ya termina en el bloque de totales)
+                self.fila = None
+        return hay_totales
+
+    def resultado(self):
+        afiliados = []
+        for fila in self.afiliados:
+            afiliados.append({
+                'nro': fila['nro'],
+                'cussp': fila['cussp'],
+                'nombre': " ".join(fila['nombre']).strip(),
+                'columnas': fila['columnas'],
+                'monto': monto_afiliado(fila['columnas']),
+            })
+        return afiliados
+
+
+def extraer_tabla_afiliados(pdf_content):
+    """
+    Filas de la tabla de afiliados con todas sus columnas
+
+    Lee página por página hasta el bloque de totales; en cada página solo se
+    agrupan en palabras los caracteres de la región de la tabla.
+
+    Returns:
+        list de dicts con 'nro', 'cussp', 'nombre' (unido si ocupa dos líneas),
+        'columnas' ({encabezado: texto}) y 'monto' (float o None, ver monto_afiliado)
+    """
+    import pdfplumber
+
+    lector = _LectorTabla()
+    with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
+        for pagina in pdf.pages:
+            fin = lector.leer_pagina(pagina)
+            if hasattr(pagina, 'flush_cache'):
+                pagina.flush_cache()
+            if fin:
+                break
+    return lector.resultado()
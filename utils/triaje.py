@@ -0,0 +1,159 @@
+"""
+Triaje rápido de PDFs antes de la extracción
+Decide en pocos milisegundos si un PDF va por la ruta de texto, por OCR
+o si se rechaza porque no parece una planilla
+"""
+import io
+import re
+import unicodedata
+
+
+TEXTO = "texto"
+ESCANEADO = "escaneado"
+NO_PLANILLA = "no_planilla"
+INVALIDO = "invalido"
+
+# Páginas iniciales que se inspeccionan en busca de capa de texto
+PAGINAS_A_INSPECCIONAR = 3
+
+# Palabras que identifican una planilla (se buscan sin tildes y en mayúsculas)
+PALABRAS_CLAVE = ("PLANILLA", "CUSPP", "PERIODO DE DEVENGUE")
+
+# Con menos caracteres la primera página no basta para rechazar el documento
+MIN_CARACTERES_SONDEO = 50
+
+_OPERADORES_TEXTO = re.compile(rb'\bBT\b.*?(?:Tj|TJ|\'|")', re.DOTALL)
+_ESPACIOS = re.compile(r'\s+')
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return _ESPACIOS.sub(' ', texto.upper())
+
+
+def _recursos(pagina):
+    try:
+        return pagina.get('/Resources').get_object() or {}
+    except Exception:
+        return {}
+
+
+def _inspeccionar_pagina(pagina):
+    """Retorna (tiene_fuentes, tiene_operadores_texto, tiene_imagenes, tiene_formularios)"""
+    recursos = _recursos(pagina)
+    tiene_fuentes = bool(recursos.get('/Font'))
+
+    tiene_imagenes = False
+    tiene_formularios = False
+    xobjetos = recursos.get('/XObject')
+    if xobjetos:
+        for referencia in xobjetos.get_object().values():
+            subtipo = referencia.get_object().get('/Subtype')
+            if subtipo == '/Image':
+                tiene_imagenes = True
+            elif subtipo == '/Form':
+                tiene_formularios = True
+
+    try:
+        contenido = pagina.get_contents()
+        datos = contenido.get_data() if contenido is not None else b''
+    except Exception:
+        datos = b''
+    tiene_operadores = _OPERADORES_TEXTO.search(datos) is not None
+
+    return tiene_fuentes, tiene_operadores, tiene_imagenes, tiene_formularios
+
+
+class LecturaPdf:
+    """
+    Lo que el triaje ya leyó del PDF, para que la extracción no lo repita:
+    el PdfReader abierto y el texto extraído de cada página sondeada
+    """
+
+    __slots__ = ('reader', 'textos')
+
+    def __init__(self):
+        self.reader = None
+        self.textos = {}
+
+
+def diseno_documento(reader):
+    """
+    Identificador del diseño del documento: software que lo generó
+    (Producer/Creator, normalmente propio de cada AFP) y tamaño de la primera página
+    """
+    try:
+        metadatos = reader.metadata or {}
+        productor = str(metadatos.get('/Producer') or '').strip()
+        creador = str(metadatos.get('/Creator') or '').strip()
+    except Exception:
+        productor = creador = ''
+    try:
+        caja = reader.pages[0].mediabox
+        tamano = f"{round(float(caja.width))}x{round(float(caja.height))}"
+    except Exception:
+        tamano = ''
+    return f"{productor}|{creador}|{tamano}"
+
+
+def clasificar_pdf(pdf_content, lectura=None):
+    """
+    Clasifica un PDF inspeccionando su estructura y la primera página con texto
+
+    Si se pasa `lectura` (LecturaPdf), se guardan en ella el PdfReader y el
+    texto extraído para reutilizarlos en la extracción.
+
+    Returns:
+        dict serializable a JSON con 'tipo' (texto, escaneado, no_planilla o
+        invalido), 'paginas', 'motivo', 'palabras' (palabras clave encontradas)
+        y 'diseno' (emisor y tamaño de página, ver diseno_documento)
+    """
+    triaje = {'tipo': TEXTO, 'paginas': 0, 'motivo': '', 'palabras': [], 'diseno': None}
+    try:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(io.BytesIO(pdf_content))
+        paginas = reader.pages
+        triaje['paginas'] = len(paginas)
+        if lectura is not None:
+            lectura.reader = reader
+    except Exception as e:
+        triaje.update(tipo=INVALIDO, motivo=f"PDF ilegible: {e}")
+        return triaje
+
+    if not triaje['paginas']:
+        triaje.update(tipo=INVALIDO, motivo="PDF sin páginas")
+        return triaje
+
+    triaje['diseno'] = diseno_documento(reader)
+
+    try:
+        pagina_texto = None
+        alguna_imagen = False
+        dudoso = False
+        for indice, pagina in enumerate(paginas[:PAGINAS_A_INSPECCIONAR]):
+            tiene_fuentes, tiene_operadores, tiene_imagenes, tiene_formularios = _inspeccionar_pagina(pagina)
+            alguna_imagen = alguna_imagen or tiene_imagenes
+            # El texto puede estar dentro de formularios (XObject); ante la duda, ruta de texto
+            dudoso = dudoso or tiene_formularios
+            if tiene_fuentes and tiene_operadores:
+                pagina_texto = pagina
+                break
+
+        if pagina_texto is None:
+            if alguna_imagen and not dudoso:
+                triaje.update(tipo=ESCANEADO, motivo="sin capa de texto")
+            return triaje
+
+        # Sondeo de palabras clave solo en la primera página con texto
+        texto = pagina_texto.extract_text() or ""
+        if lectura is not None:
+            lectura.textos[indice] = texto
+        texto = _normalizar(texto)
+        triaje['palabras'] = [palabra for palabra in PALABRAS_CLAVE if palabra in texto]
+        if len(texto.strip()) >= MIN_CARACTERES_SONDEO and not triaje['palabras']:
+            triaje.update(tipo=NO_PLANILLA, motivo="no contiene Planilla, CUSPP ni Periodo de Devengue")
+    except Exception as e:
+        # Si la inspección falla, la extracción completa decide
+        triaje['motivo'] = f"triaje incompleto: {e}"
+
+    return triaje
@@ -1,12 +1,22 @@
 """
 Módulo para leer y validar datos desde archivos Excel locales o GitHub
 """
-import pandas as pd
 import os
+import hashlib
+import json
 from difflib import SequenceMatcher
-from pathlib import Path
 import io
-import requests
+import threading
+from collections import OrderedDict
+
+from utils.cache_extraccion import CARPETA_CACHE_DEFECTO
+from utils.indices_bases import (
+    normalizar_nombre,
+    normalizar_nombres,
+    obtener_indice,
+    similitud_trigramas,
+    trigramas,
+)
 
 # URLs de GitHub (cambia estas URLs según tu repositorio)
 GITHUB_RAW_URL = "https://raw.githubusercontent.com"
@@ -44,6 +54,9 @@ def obtener_rutas_bases():
 def descargar_desde_github(url_github):
     """Descarga un archivo Excel desde GitHub y lo retorna como DataFrame"""
     try:
+        import pandas as pd
+        import requests
+
         response = requests.get(url_github, timeout=10)
         response.raise_for_status()
         return pd.read_excel(io.BytesIO(response.content))
@@ -52,7 +65,10 @@ def descargar_desde_github(url_github):
         return None
 
 
-BASE_REDIRECCIONAMIENTO, BASE_PRESUNTA = obtener_rutas_bases()
+# Rutas de las bases: se buscan en disco cada vez que se cargan (ver rutas_bases);
+# asignarlas fija otras rutas
+BASE_REDIRECCIONAMIENTO = None
+BASE_PRESUNTA = None
 
 # URLs de GitHub - Configura estas variables en Streamlit Cloud Secrets
 # En Streamlit Cloud: Settings → Secrets → Añade:
@@ -69,108 +85,228 @@ GITHUB_PRES_DEFAULT = os.environ.get(
 )
 
 # Rutas locales como fallback final (solo si GitHub falla)
-if not BASE_REDIRECCIONAMIENTO:
-    BASE_REDIRECCIONAMIENTO = r"C:\Users\USUARIO\Desktop\LECTOR DE PAGOS\LECTOR-PAGOS\DETALLE AFILIADOS REDIRECCIONAMIENTO.xlsx"
-if not BASE_PRESUNTA:
-    BASE_PRESUNTA = r"C:\Users\USUARIO\Desktop\LECTOR DE PAGOS\LECTOR-PAGOS\DETALLE AFILIADOS PRESUNTA.xlsx"
+RUTA_REDI_RESPALDO = r"C:\Users\USUARIO\Desktop\LECTOR DE PAGOS\LECTOR-PAGOS\DETALLE AFILIADOS REDIRECCIONAMIENTO.xlsx"
+RUTA_PRES_RESPALDO = r"C:\Users\USUARIO\Desktop\LECTOR DE PAGOS\LECTOR-PAGOS\DETALLE AFILIADOS PRESUNTA.xlsx"
 
 
-def cargar_bases_locales():
+def rutas_bases():
     """
-    Carga los archivos Excel de bases locales de forma optimizada
-    Intenta cargar desde rutas LOCALES PRIMERO (más rápido), luego GitHub como fallback
+    Rutas (REDIRECCIONAMIENTO, PRESUNTA) de las bases
+    Se buscan en disco en cada llamada (no al importar el módulo), para que una
+    recarga encuentre los archivos agregados después de arrancar; las rutas
+    asignadas a BASE_REDIRECCIONAMIENTO o BASE_PRESUNTA tienen prioridad
     """
-    bases = {}
-    
-    # ========== REDIRECCIONAMIENTO ==========
-    df_redi = None
+    redi_path = pres_path = None
+    if not BASE_REDIRECCIONAMIENTO or not BASE_PRESUNTA:
+        redi_path, pres_path = obtener_rutas_bases()
+    return (
+        BASE_REDIRECCIONAMIENTO or redi_path or RUTA_REDI_RESPALDO,
+        BASE_PRESUNTA or pres_path or RUTA_PRES_RESPALDO,
+    )
+
+
+# Snapshots columnar de las bases ya limpias e indexadas (arranque rápido)
+CARPETA_SNAPSHOTS = os.path.join(CARPETA_CACHE_DEFECTO, 'bases')
+# Cambiarla cuando cambie preparar_base (obliga a reconstruir los snapshots)
+VERSION_SNAPSHOT = 2
+
+
+def _hash_archivo(ruta):
+    """SHA-256 de un archivo leído por bloques"""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _hay_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _rutas_snapshot(nombre):
+    """Rutas del snapshot y de sus metadatos para una base"""
+    formato = 'feather' if _hay_pyarrow() else 'pkl'
+    datos = os.path.join(CARPETA_SNAPSHOTS, f"{nombre}.{formato}")
+    meta = os.path.join(CARPETA_SNAPSHOTS, f"{nombre}.json")
+    return datos, meta, formato
+
+
+def cargar_snapshot(nombre, ruta_origen):
+    """
+    Retorna el DataFrame del snapshot si el archivo origen no cambió, o None
+
+    Se reutiliza si coinciden mtime y tamaño; si el mtime cambió pero el
+    SHA-256 del contenido es el mismo, también se reutiliza.
+    """
+    ruta_datos, ruta_meta, formato = _rutas_snapshot(nombre)
+    if not (os.path.exists(ruta_datos) and os.path.exists(ruta_meta)):
+        return None
+
+    try:
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        estado = os.stat(ruta_origen)
+        if meta.get('formato') != formato or meta.get('origen') != os.path.abspath(ruta_origen):
+            return None
+        if meta.get('version') != VERSION_SNAPSHOT:
+            return None
+
+        if meta.get('mtime_ns') != estado.st_mtime_ns or meta.get('tamano') != estado.st_size:
+            if meta.get('sha256') != _hash_archivo(ruta_origen):
+                return None
+            # Mismo contenido con otra fecha: actualizar metadatos y reutilizar
+            meta['mtime_ns'] = estado.st_mtime_ns
+            meta['tamano'] = estado.st_size
+            _escribir_atomico(ruta_meta, json.dumps(meta).encode('utf-8'))
+
+        import pandas as pd
+
+        if formato == 'feather':
+            df = pd.read_feather(ruta_datos)
+        else:
+            df = pd.read_pickle(ruta_datos)
+        df.set_index('_doc_per', drop=False, inplace=True)
+        obtener_indice(df)
+        return df
+    except Exception as e:
+        print(f"⚠️ Snapshot de {nombre} inválido, se reconstruye: {e}")
+        return None
+
+
+def guardar_snapshot(nombre, ruta_origen, df):
+    """Guarda el DataFrame limpio e indexado junto con la firma del archivo origen"""
+    try:
+        os.makedirs(CARPETA_SNAPSHOTS, exist_ok=True)
+        ruta_datos, ruta_meta, formato = _rutas_snapshot(nombre)
+        estado = os.stat(ruta_origen)
+        meta = {
+            'origen': os.path.abspath(ruta_origen),
+            'mtime_ns': estado.st_mtime_ns,
+            'tamano': estado.st_size,
+            'sha256': _hash_archivo(ruta_origen),
+            'formato': formato,
+            'version': VERSION_SNAPSHOT,
+        }
+
+        temporal = f"{ruta_datos}.{os.getpid()}.tmp"
+        if formato == 'feather':
+            df.reset_index(drop=True).to_feather(temporal)
+        else:
+            df.reset_index(drop=True).to_pickle(temporal)
+        os.replace(temporal, ruta_datos)
+        _escribir_atomico(ruta_meta, json.dumps(meta).encode('utf-8'))
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el snapshot de {nombre}: {e}")
+
+
+def _escribir_atomico(ruta, contenido):
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def preparar_base(df):
+    """Limpia las columnas clave y crea el índice compuesto DOCUMENTO|PERIODO"""
+    # Limpiar espacios en blanco de forma más eficiente
+    df['DOCUMENTO'] = df['DOCUMENTO'].astype(str).str.strip()
+    df['PERIODO'] = df['PERIODO'].astype(str).str.strip()
+    df['CUSSP'] = df['CUSSP'].astype(str).str.strip()
+    df['AFILIADO'] = df['AFILIADO'].astype(str).str.strip()
+
+    # Nombres normalizados una sola vez (tildes, puntuación y orden de tokens)
+    df['_afiliado_norm'] = normalizar_nombres(df['AFILIADO'])
     
+    # Crear índice compuesto para búsquedas rápidas
+    # (ordenado de forma estable para que cada clave ocupe un rango contiguo)
+    df['_doc_per'] = df['DOCUMENTO'] + '|' + df['PERIODO']
+    df = df.sort_values('_doc_per', kind='stable')
+    df.set_index('_doc_per', drop=False, inplace=True)
+    obtener_indice(df)
+    return df
+
+
+def _cargar_base(nombre, ruta_local, url_github):
+    """
+    Carga una base: snapshot local, Excel local o GitHub (en ese orden)
+    Retorna el DataFrame limpio e indexado, o None
+    """
+    df = None
+    desde_excel_local = False
+
     # Intentar PRIMERO desde rutas locales (es lo más rápido y confiable)
-    if BASE_REDIRECCIONAMIENTO and os.path.exists(BASE_REDIRECCIONAMIENTO):
+    if ruta_local and os.path.exists(ruta_local):
+        df = cargar_snapshot(nombre, ruta_local)
+        if df is not None:
+            print(f"⚡ {nombre} cargado desde snapshot")
+            return df
+
         try:
-            df_redi = pd.read_excel(BASE_REDIRECCIONAMIENTO, dtype={
+            import pandas as pd
+
+            df = pd.read_excel(ruta_local, dtype={
                 'DOCUMENTO': str,
                 'PERIODO': str,
                 'CUSSP': str,
                 'AFILIADO': str
             })
-            print(f"✅ REDIRECCIONAMIENTO cargado localmente")
+            desde_excel_local = True
+            print(f"✅ {nombre} cargado localmente")
         except Exception as e:
-            print(f"⚠️ Error cargando REDIRECCIONAMIENTO localmente: {e}")
-    
+            print(f"⚠️ Error cargando {nombre} localmente: {e}")
+
     # Si falló localmente, intentar desde GitHub (solo si tenemos URL)
-    if df_redi is None and GITHUB_REDI_DEFAULT:
-        print(f"📥 Intentando cargar REDIRECCIONAMIENTO desde GitHub...")
-        df_redi = descargar_desde_github(GITHUB_REDI_DEFAULT)
-        if df_redi is not None:
-            print(f"✅ REDIRECCIONAMIENTO cargado desde GitHub")
+    if df is None and url_github:
+        print(f"📥 Intentando cargar {nombre} desde GitHub...")
+        df = descargar_desde_github(url_github)
+        if df is not None:
+            print(f"✅ {nombre} cargado desde GitHub")
         else:
-            print(f"⚠️ No se pudo cargar REDIRECCIONAMIENTO de GitHub")
-    
-    # Procesar REDIRECCIONAMIENTO si se cargó
+            print(f"⚠️ No se pudo cargar {nombre} de GitHub")
+
+    if df is None:
+        print(f"❌ No se pudo cargar {nombre} de ninguna fuente")
+        return None
+
+    try:
+        df = preparar_base(df)
+    except Exception as e:
+        print(f"❌ Error procesando {nombre}: {e}")
+        return None
+
+    if desde_excel_local:
+        guardar_snapshot(nombre, ruta_local, df)
+    return df
+
+
+def cargar_bases_locales():
+    """
+    Carga los archivos Excel de bases locales de forma optimizada
+    Usa un snapshot columnar (Feather) de las bases ya limpias si el Excel no cambió;
+    si no, intenta rutas LOCALES PRIMERO (más rápido), luego GitHub como fallback
+    """
+    bases = {}
+    MEMO_BUSQUEDAS.limpiar()
+    ruta_redi, ruta_pres = rutas_bases()
+
+    # ========== REDIRECCIONAMIENTO ==========
+    df_redi = _cargar_base('REDIRECCIONAMIENTO', ruta_redi, GITHUB_REDI_DEFAULT)
     if df_redi is not None:
-        try:
-            # Limpiar espacios en blanco de forma más eficiente
-            df_redi['DOCUMENTO'] = df_redi['DOCUMENTO'].astype(str).str.strip()
-            df_redi['PERIODO'] = df_redi['PERIODO'].astype(str).str.strip()
-            df_redi['CUSSP'] = df_redi['CUSSP'].astype(str).str.strip()
-            df_redi['AFILIADO'] = df_redi['AFILIADO'].astype(str).str.strip()
-            
-            # Crear índice compuesto para búsquedas rápidas
-            df_redi['_doc_per'] = df_redi['DOCUMENTO'] + '|' + df_redi['PERIODO']
-            df_redi.set_index('_doc_per', drop=False, inplace=True)
-            
-            bases['REDIRECCIONAMIENTO'] = df_redi
-            print(f"📊 REDIRECCIONAMIENTO: {len(df_redi)} registros cargados")
-        except Exception as e:
-            print(f"❌ Error procesando REDIRECCIONAMIENTO: {e}")
-    else:
-        print("❌ No se pudo cargar REDIRECCIONAMIENTO de ninguna fuente")
-    
+        bases['REDIRECCIONAMIENTO'] = df_redi
+        print(f"📊 REDIRECCIONAMIENTO: {len(df_redi)} registros cargados")
+
     # ========== PRESUNTA ==========
-    df_pres = None
-    
-    # Intentar PRIMERO desde rutas locales (es lo más rápido y confiable)
-    if BASE_PRESUNTA and os.path.exists(BASE_PRESUNTA):
-        try:
-            df_pres = pd.read_excel(BASE_PRESUNTA, dtype={
-                'DOCUMENTO': str,
-                'PERIODO': str,
-                'CUSSP': str,
-                'AFILIADO': str
-            })
-            print(f"✅ PRESUNTA cargado localmente")
-        except Exception as e:
-            print(f"⚠️ Error cargando PRESUNTA localmente: {e}")
-    
-    # Si falló localmente, intentar desde GitHub (solo si tenemos URL)
-    if df_pres is None and GITHUB_PRES_DEFAULT:
-        print(f"📥 Intentando cargar PRESUNTA desde GitHub...")
-        df_pres = descargar_desde_github(GITHUB_PRES_DEFAULT)
-        if df_pres is not None:
-            print(f"✅ PRESUNTA cargado desde GitHub")
-        else:
-            print(f"⚠️ No se pudo cargar PRESUNTA de GitHub")
-    
-    # Procesar PRESUNTA si se cargó
+    df_pres = _cargar_base('PRESUNTA', ruta_pres, GITHUB_PRES_DEFAULT)
     if df_pres is not None:
-        try:
-            df_pres['DOCUMENTO'] = df_pres['DOCUMENTO'].astype(str).str.strip()
-            df_pres['PERIODO'] = df_pres['PERIODO'].astype(str).str.strip()
-            df_pres['CUSSP'] = df_pres['CUSSP'].astype(str).str.strip()
-            df_pres['AFILIADO'] = df_pres['AFILIADO'].astype(str).str.strip()
-            
-            # Crear índice compuesto para búsquedas rápidas
-            df_pres['_doc_per'] = df_pres['DOCUMENTO'] + '|' + df_pres['PERIODO']
-            df_pres.set_index('_doc_per', drop=False, inplace=True)
-            
-            bases['PRESUNTA'] = df_pres
-            print(f"📊 PRESUNTA: {len(df_pres)} registros cargados")
-        except Exception as e:
-            print(f"❌ Error procesando PRESUNTA: {e}")
-    else:
-        print("❌ No se pudo cargar PRESUNTA de ninguna fuente")
-    
+        bases['PRESUNTA'] = df_pres
+        print(f"📊 PRESUNTA: {len(df_pres)} registros cargados")
+
     return bases
 
 
@@ -181,6 +317,78 @@ def calcular_similitud(str1, str2):
     return SequenceMatcher(None, str1.upper(), str2.upper()).ratio()
 
 
+class _MemoBusquedas:
+    """Memo LRU de búsquedas en bases con contadores de aciertos y fallos"""
+
+    def __init__(self, max_entradas=4096):
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            resultado = self.entradas.get(clave)
+            if resultado is None:
+                self.fallos += 1
+                return None
+            self.entradas.move_to_end(clave)
+            self.aciertos += 1
+            return resultado
+
+    def guardar(self, clave, resultado):
+        with self._lock:
+            self.entradas[clave] = resultado
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.max_entradas:
+                self.entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self.entradas.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+
+MEMO_BUSQUEDAS = _MemoBusquedas()
+
+# Orden de consulta de las bases
+ORDEN_BASES = ('REDIRECCIONAMIENTO', 'PRESUNTA')
+
+# Similitud mínima para aceptar a un afiliado encontrado solo por su nombre
+UMBRAL_SIMILITUD_NOMBRE = 0.85
+
+
+def estadisticas_busqueda():
+    """Retorna aciertos, fallos y entradas del memo de búsquedas"""
+    return {
+        'aciertos': MEMO_BUSQUEDAS.aciertos,
+        'fallos': MEMO_BUSQUEDAS.fallos,
+        'entradas': len(MEMO_BUSQUEDAS.entradas),
+    }
+
+
+def _copiar_resultado(resultado):
+    """Copia un resultado memoizado para que el llamador pueda modificarlo"""
+    copia = dict(resultado)
+    if 'afiliados' in copia:
+        copia['afiliados'] = [dict(aff) for aff in copia['afiliados']]
+    return copia
+
+
+def _afiliados_de_base(indice, posiciones, origen):
+    return [
+        {
+            'cussp': str(indice.cussp[i]).strip(),
+            'afiliado': str(indice.afiliado[i]).strip(),
+            'origen': origen,
+            'observacion': f"Datos de base local ({origen})"
+        }
+        for i in posiciones
+    ]
+
+
 def buscar_en_base(ruc, documento, periodo, cussp, afiliado_pdf, bases):
     """
     Busca datos en las bases locales y valida de forma optimizada
@@ -207,118 +415,81 @@ def buscar_en_base(ruc, documento, periodo, cussp, afiliado_pdf, bases):
     cussp_busca = str(cussp).strip() if cussp and cussp != "No detectado" else ""
     afiliado_busca = str(afiliado_pdf).strip() if afiliado_pdf and afiliado_pdf != "No detectado" else ""
     
-    es_fallback = not cussp_busca and not afiliado_busca
-    
-    # Clave de búsqueda rápida usando índice
+    # Clave de búsqueda usando el índice hash DOCUMENTO|PERIODO
     clave_busca = f"{documento_busca}|{periodo_busca}"
     
-    # Buscar en REDIRECCIONAMIENTO primero
-    if 'REDIRECCIONAMIENTO' in bases:
-        df = bases['REDIRECCIONAMIENTO']
+    # Las claves repetidas se resuelven desde el memo LRU
+    indices = [(origen, obtener_indice(bases[origen])) for origen in ORDEN_BASES if origen in bases]
+    clave_memo = (tuple(indice.serie for _, indice in indices), clave_busca, cussp_busca, afiliado_busca)
+    resultado = MEMO_BUSQUEDAS.obtener(clave_memo)
+    if resultado is None:
+        resultado = _buscar_en_indices(indices, clave_busca, cussp_busca, afiliado_busca)
+        MEMO_BUSQUEDAS.guardar(clave_memo, resultado)
+    return _copiar_resultado(resultado)
+
+
+def _buscar_en_indices(indices, clave_busca, cussp_busca, afiliado_busca):
+    """Búsqueda sin memo: REDIRECCIONAMIENTO primero, luego PRESUNTA"""
+    es_fallback = not cussp_busca and not afiliado_busca
+    
+    for origen, indice in indices:
+        # Búsqueda O(1) en el índice (filtrando también por CUSSP si lo tenemos)
+        posiciones = indice.posiciones(clave_busca, cussp_busca)
+        if not posiciones:
+            continue
         
-        # Búsqueda rápida usando el índice
-        try:
-            resultados_filtro = df.loc[[clave_busca]] if clave_busca in df.index else df[df['_doc_per'] == clave_busca]
-        except:
-            resultados_filtro = df[df['_doc_per'] == clave_busca]
+        if es_fallback:
+            # Modo fallback: retornar TODOS los afiliados encontrados
+            return {'encontrado': True, 'afiliados': _afiliados_de_base(indice, posiciones, origen)}
         
-        # Si tenemos CUSSP, filtrar también por eso
-        if cussp_busca and not resultados_filtro.empty:
-            resultados_filtro = resultados_filtro[resultados_filtro['CUSSP'] == cussp_busca]
+        # Modo validación: retornar un solo resultado (la fila cuyo nombre
+        # normalizado se parece más al del PDF)
+        nombre_pdf = normalizar_nombre(afiliado_busca)
+        i = _mejor_posicion_por_nombre(indice, posiciones, nombre_pdf)
+        afiliado_base = str(indice.afiliado[i]).strip()
+        cussp_base = str(indice.cussp[i]).strip()
         
-        if not resultados_filtro.empty:
-            if es_fallback:
-                # Modo fallback: retornar TODOS los afiliados encontrados
-                afiliados = []
-                for _, fila in resultados_filtro.iterrows():
-                    afiliados.append({
-                        'cussp': str(fila['CUSSP']).strip(),
-                        'afiliado': str(fila['AFILIADO']).strip(),
-                        'origen': 'REDIRECCIONAMIENTO',
-                        'observacion': f"Datos de base local (REDIRECCIONAMIENTO)"
-                    })
-                return {'encontrado': True, 'afiliados': afiliados}
-            else:
-                # Modo validación: retornar un solo resultado
-                fila = resultados_filtro.iloc[0]
-                afiliado_base = str(fila['AFILIADO']).strip()
-                cussp_base = str(fila['CUSSP']).strip()
-                
-                resultado = {
-                    'encontrado': True,
-                    'origen': 'REDIRECCIONAMIENTO',
-                    'afiliado_base': afiliado_base,
-                    'cussp': cussp_base,
-                    'similitud': 0,
-                    'observacion': ''
-                }
-                
-                # Calcular similitud
-                similitud = calcular_similitud(afiliado_busca, afiliado_base)
-                resultado['similitud'] = round(similitud, 2)
-                
-                # Crear observación si no coincide
-                if similitud < 0.95:
-                    resultado['observacion'] = f"⚠️ Nombre no coincide exactamente. Base: {afiliado_base} | PDF: {afiliado_busca} (Similitud: {similitud*100:.1f}%)"
-                else:
-                    resultado['observacion'] = '✅ Validado'
-                
-                return resultado
-    
-    # Buscar en PRESUNTA si no encontró en REDIRECCIONAMIENTO
-    if 'PRESUNTA' in bases:
-        df = bases['PRESUNTA']
+        resultado = {
+            'encontrado': True,
+            'origen': origen,
+            'afiliado_base': afiliado_base,
+            'cussp': cussp_base,
+            'similitud': 0,
+            'observacion': ''
+        }
         
-        # Búsqueda rápida usando el índice
-        try:
-            resultados_filtro = df.loc[[clave_busca]] if clave_busca in df.index else df[df['_doc_per'] == clave_busca]
-        except:
-            resultados_filtro = df[df['_doc_per'] == clave_busca]
+        # Calcular similitud sobre nombres normalizados
+        similitud = calcular_similitud(nombre_pdf, indice.nombre_norm[i])
+        resultado['similitud'] = round(similitud, 2)
         
-        # Si tenemos CUSSP, filtrar también por eso
-        if cussp_busca and not resultados_filtro.empty:
-            resultados_filtro = resultados_filtro[resultados_filtro['CUSSP'] == cussp_busca]
+        # Crear observación si no coincide
+        if similitud < 0.95:
+            resultado['observacion'] = f"⚠️ Nombre no coincide exactamente. Base: {afiliado_base} | PDF: {afiliado_busca} (Similitud: {similitud*100:.1f}%)"
+        else:
+            resultado['observacion'] = '✅ Validado'
         
-        if not resultados_filtro.empty:
-            if es_fallback:
-                # Modo fallback: retornar TODOS los afiliados encontrados
-                afiliados = []
-                for _, fila in resultados_filtro.iterrows():
-                    afiliados.append({
-                        'cussp': str(fila['CUSSP']).strip(),
-                        'afiliado': str(fila['AFILIADO']).strip(),
-                        'origen': 'PRESUNTA',
-                        'observacion': f"Datos de base local (PRESUNTA)"
-                    })
-                return {'encontrado': True, 'afiliados': afiliados}
-            else:
-                # Modo validación: retornar un solo resultado
-                fila = resultados_filtro.iloc[0]
-                afiliado_base = str(fila['AFILIADO']).strip()
-                cussp_base = str(fila['CUSSP']).strip()
-                
-                resultado = {
-                    'encontrado': True,
-                    'origen': 'PRESUNTA',
-                    'afiliado_base': afiliado_base,
-                    'cussp': cussp_base,
-                    'similitud': 0,
-                    'observacion': ''
-                }
-                
-                similitud = calcular_similitud(afiliado_busca, afiliado_base)
-                resultado['similitud'] = round(similitud, 2)
-                
-                if similitud < 0.95:
-                    resultado['observacion'] = f"⚠️ Nombre no coincide exactamente. Base: {afiliado_base} | PDF: {afiliado_busca} (Similitud: {similitud*100:.1f}%)"
-                else:
-                    resultado['observacion'] = '✅ Validado'
-                
-                return resultado
+        return resultado
     
     # Si no encontró en ninguna base
     if es_fallback:
         return {'encontrado': False, 'afiliados': []}
+
+    # Modo validación: el DOCUMENTO|PERIODO no está, buscar al afiliado solo por su nombre
+    candidatos = _candidatos_por_nombre(indices, afiliado_busca, 1) if afiliado_busca else []
+    if candidatos and candidatos[0]['similitud'] >= UMBRAL_SIMILITUD_NOMBRE:
+        candidato = candidatos[0]
+        return {
+            'encontrado': True,
+            'origen': candidato['origen'],
+            'afiliado_base': candidato['afiliado'],
+            'cussp': candidato['cussp'],
+            'similitud': candidato['similitud'],
+            'observacion': (
+                f"⚠️ Encontrado solo por nombre en {candidato['origen']}: {candidato['afiliado']} "
+                f"(documento {candidato['documento']}, periodo {candidato['periodo']}, "
+                f"similitud {candidato['similitud']*100:.1f}%)"
+            )
+        }
     else:
         return {
             'encontrado': False,
@@ -328,3 +499,147 @@ def buscar_en_base(ruc, documento, periodo, cussp, afiliado_pdf, bases):
             'similitud': 0,
             'observacion': "⚠️ No encontrado en bases locales"
         }
+
+
+def _mejor_posicion_por_nombre(indice, posiciones, nombre_pdf):
+    """Entre varias filas de la misma clave, elige la del nombre más parecido"""
+    if not nombre_pdf or len(posiciones) == 1:
+        return posiciones[0]
+    trigramas_pdf = None
+    mejor, mejor_similitud = posiciones[0], -1.0
+    for i in posiciones:
+        nombre_base = indice.nombre_norm[i]
+        if nombre_base == nombre_pdf:
+            return i
+        if trigramas_pdf is None:
+            trigramas_pdf = trigramas(nombre_pdf)
+        similitud = similitud_trigramas(trigramas_pdf, trigramas(nombre_base))
+        if similitud > mejor_similitud:
+            mejor, mejor_similitud = i, similitud
+    return mejor
+
+
+def buscar_afiliado_por_nombre(nombre, bases, k=5):
+    """
+    Busca en las bases los afiliados cuyo nombre se parece más a `nombre`
+
+    Útil para nombres leídos por OCR: tolera tildes, puntuación, orden de
+    los nombres y errores de algunos caracteres.
+
+    Args:
+        nombre: Nombre a buscar (sin normalizar)
+        bases: Diccionario con DataFrames cargados
+        k: Número máximo de candidatos
+
+    Returns:
+        list: Hasta k dicts con 'afiliado', 'cussp', 'documento', 'periodo',
+        'origen', 'registros' (filas con ese nombre) y 'similitud' (0-1),
+        ordenados de mayor a menor similitud
+    """
+    if not bases or not normalizar_nombre(nombre):
+        return []
+
+    indices = [(origen, obtener_indice(bases[origen])) for origen in ORDEN_BASES if origen in bases]
+    return _candidatos_por_nombre(indices, nombre, k)
+
+
+def _candidatos_por_nombre(indices, nombre, k):
+    """Mejores candidatos por nombre (índice de trigramas) en los índices de las bases"""
+    candidatos = []
+    for origen, indice in indices:
+        indice_nombres = indice.indice_nombres
+        for id_nombre, similitud in indice_nombres.buscar(nombre, k):
+            i = indice_nombres.primera_fila[id_nombre]
+            documento, _, periodo = str(indice.claves[i]).partition('|')
+            candidatos.append({
+                'afiliado': str(indice.afiliado[i]).strip(),
+                'cussp': str(indice.cussp[i]).strip(),
+                'documento': documento,
+                'periodo': periodo,
+                'origen': origen,
+                'registros': int(indice_nombres.filas_por_nombre[id_nombre]),
+                'similitud': round(similitud, 2),
+            })
+
+    candidatos.sort(key=lambda c: -c['similitud'])
+    return candidatos[:k]
+
+
+def historial_afiliado(cussp, bases):
+    """
+    Retorna todas las apariciones de un CUSSP en REDIRECCIONAMIENTO y PRESUNTA
+
+    Usa el índice secundario CUSSP → filas construido al cargar las bases,
+    sin recorrer los DataFrames.
+
+    Args:
+        cussp: CUSSP del afiliado
+        bases: Diccionario con DataFrames cargados
+
+    Returns:
+        list: dicts con 'origen', 'documento', 'periodo', 'cussp' y 'afiliado',
+        ordenados por periodo y documento
+    """
+    cussp_busca = str(cussp).strip() if cussp else ""
+    if not bases or not cussp_busca:
+        return []
+
+    historial = []
+    for origen in ORDEN_BASES:
+        if origen not in bases:
+            continue
+        indice = obtener_indice(bases[origen])
+        for i in indice.posiciones_cussp(cussp_busca):
+            documento, _, periodo = str(indice.claves[i]).partition('|')
+            historial.append({
+                'origen': origen,
+                'documento': documento,
+                'periodo': periodo,
+                'cussp': cussp_busca,
+                'afiliado': str(indice.afiliado[i]).strip(),
+            })
+
+    historial.sort(key=lambda fila: (fila['periodo'], fila['documento']))
+    return historial
+
+
+def buscar_en_base_lote(claves, bases):
+    """
+    Resuelve muchas claves DOCUMENTO/PERIODO a la vez (modo fallback)
+
+    Args:
+        claves: Lista de tuplas (documento, periodo)
+        bases: Diccionario con DataFrames cargados
+
+    Returns:
+        list: Un dict {'encontrado', 'afiliados'} por clave, en el mismo orden
+    """
+    claves = list(claves)
+    if not claves:
+        return []
+    if not bases:
+        return [{'encontrado': False, 'afiliados': []} for _ in claves]
+
+    import pandas as pd
+
+    # Claves únicas: cada una se resuelve una sola vez
+    textos = pd.Series([f"{str(doc).strip()}|{str(per).strip()}" for doc, per in claves])
+    unicas = pd.Series(textos.unique())
+    resueltas = {}
+    pendientes = unicas
+
+    for origen in ORDEN_BASES:
+        if origen not in bases or pendientes.empty:
+            continue
+        indice = obtener_indice(bases[origen])
+        rangos = pendientes.map(indice.rangos)
+        encontradas = rangos.notna()
+        for clave, rango in zip(pendientes[encontradas], rangos[encontradas]):
+            resueltas[clave] = {
+                'encontrado': True,
+                'afiliados': _afiliados_de_base(indice, range(*rango), origen)
+            }
+        pendientes = pendientes[~encontradas]
+
+    no_encontrado = {'encontrado': False, 'afiliados': []}
+    return [_copiar_resultado(resueltas.get(clave, no_encontrado)) for clave in textos]